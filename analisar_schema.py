@@ -1,71 +1,369 @@
-import pandas as pd
+"""
+Perfil de estrutura dos relatórios (Sigeo x Balancete): para cada planilha/CSV, o cabeçalho
+e uma amostra das primeiras linhas, com tipo inferido por coluna, taxa de nulos e padrões
+de moeda/data; compara com um baseline salvo para apontar mudanças de schema (drift).
+
+Lê só o começo de cada arquivo: .xlsx pelo openpyxl em modo read-only (sem carregar a
+planilha inteira) e .csv pelo motor C do pandas, com o separador detectado num trecho do
+arquivo. Os arquivos são perfilados em paralelo (um por processo) e cada perfil fica em
+cache com chave no hash do conteúdo: rodar de novo numa pasta sem mudanças não relê nada.
+
+Uso:
+    python analisar_schema.py                                   # os dois relatórios de sempre
+    python analisar_schema.py exports/ "Relatório Sigeo .xlsx" --amostra 2000 --workers 8
+    python analisar_schema.py exports/ --salvar-baseline schema_base.json
+    python analisar_schema.py exports/ --baseline schema_base.json   # exit 1 se o schema mudou
+"""
+import argparse
+import csv
+import datetime
+import json
 import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from arquivos import entradas_inexistentes, hash_arquivo, listar_arquivos
+
+DIR_CACHE = os.path.join(".cache_cism", "perfis")
+
+# Mude quando a classificação mudar: invalida todo o cache
+VERSAO_PERFIL = 1
+
+EXTENSOES = ('.xlsx', '.xlsm', '.xls', '.csv')
+ARQUIVOS_PADRAO = ["Relatório Sigeo .xlsx", "Balancete prestação de contas - todos os projetos_Sigeo.xlsx"]
+
+# Linhas iniciais onde o cabeçalho é procurado (relatórios do Sigeo têm título antes dele)
+LINHAS_CABECALHO = 20
+# Tipo com menos que isto dos valores não nulos: a coluna é "misto"
+PREDOMINANCIA = 0.9
+# Aumento da taxa de nulos (em pontos) que conta como drift
+LIMIAR_NULOS = 0.2
+
+_NULOS = {'', '#N/A', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null', '-'}
+_BOOLEANOS = {'verdadeiro', 'falso', 'true', 'false', 'sim', 'não', 'nao'}
+
+# (tipo, padrão, regex) para valores em texto, na ordem em que são testados
+_PADROES_TEXTO = [
+    ("moeda", "R$ 1.234,56", re.compile(r"^-?\(?-?R\$\s*-?[\d.]*\d(,\d{1,2})?\)?$")),
+    ("decimal", "1.234,56", re.compile(r"^-?(\d{1,3}(\.\d{3})+|\d+),\d+$")),
+    ("decimal", "1234.56", re.compile(r"^-?\d+\.\d+$")),
+    ("codigo", "0123 (zeros à esquerda)", re.compile(r"^0\d+$")),
+    ("inteiro", "1234", re.compile(r"^-?\d+$")),
+    ("data", "dd/mm/aaaa", re.compile(r"^\d{2}/\d{2}/\d{4}$")),
+    ("data", "aaaa-mm-dd", re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?$")),
+    ("data", "mm/aaaa", re.compile(r"^(0[1-9]|1[0-2])/\d{4}$")),
+    ("data", "aaaa-mm", re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")),
+]
+
+
+# --- Classificação de valores ---
+def classificar(valor):
+    """(tipo, padrão) de uma célula; None para células vazias."""
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return "booleano", "booleano"
+    if isinstance(valor, int):
+        return "inteiro", "número"
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return None
+        return ("inteiro" if valor.is_integer() else "decimal"), "número"
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return "data", "data do Excel"
+    if isinstance(valor, datetime.time):
+        return "texto", "hora"
+
+    texto = str(valor).strip()
+    if texto in _NULOS:
+        return None
+    if texto.lower() in _BOOLEANOS:
+        return "booleano", "texto"
+    for tipo, padrao, regex in _PADROES_TEXTO:
+        if regex.match(texto):
+            return tipo, padrao
+    return "texto", "texto"
+
+
+def inferir_tipo(tipos):
+    """Tipo da coluna a partir da contagem de tipos dos valores não nulos."""
+    if not tipos:
+        return "vazio"
+    # Números e moeda misturados (ex.: Sigeo com parte das células como texto "R$") são uma coisa só
+    if set(tipos) <= {"inteiro", "decimal", "moeda"}:
+        return next(t for t in ("moeda", "decimal", "inteiro") if t in tipos)
+    tipo, n = tipos.most_common(1)[0]
+    return tipo if n >= PREDOMINANCIA * sum(tipos.values()) else "misto"
 
-def analisar_estrutura_arquivo(filepath):
+
+def _linha_cabecalho(linhas):
+    """Índice da linha de cabeçalho: a primeira, entre as iniciais, com mais células de texto preenchidas."""
+    melhor, n_melhor = 0, 0
+    for i, linha in enumerate(linhas[:LINHAS_CABECALHO]):
+        preenchidas = [v for v in linha if classificar(v) is not None]
+        if len(preenchidas) > n_melhor and all(isinstance(v, str) for v in preenchidas):
+            melhor, n_melhor = i, len(preenchidas)
+    return melhor
+
+
+def perfilar_linhas(linhas, amostra=None):
     """
-    Lê as primeiras 100 linhas de um arquivo (Excel ou CSV) e exibe 
-    os nomes das colunas e seus tipos de dados inferidos.
+    Perfil de uma tabela já lida (lista de linhas, cabeçalho incluso): linha do cabeçalho e,
+    por coluna, tipo inferido, taxa de nulos, contagem de tipos/padrões e exemplos.
+    `amostra` limita as linhas de dados usadas (contadas a partir do cabeçalho).
     """
-    if not os.path.exists(filepath):
-        print(f"X ERRO: Arquivo não encontrado em:\n{filepath}\n")
-        return
+    i_cab = _linha_cabecalho(linhas)
+    cabecalho = list(linhas[i_cab]) if linhas else []
+    dados = linhas[i_cab + 1:][:amostra]
+    largura = max([len(cabecalho)] + [len(l) for l in dados])
+
+    colunas = []
+    for j in range(largura):
+        nome = cabecalho[j] if j < len(cabecalho) else None
+        nome = str(nome).strip() if classificar(nome) is not None else f"Unnamed: {j}"
+        tipos, padroes, exemplos, nulos = Counter(), Counter(), [], 0
+        for linha in dados:
+            valor = linha[j] if j < len(linha) else None
+            classe = classificar(valor)
+            if classe is None:
+                nulos += 1
+                continue
+            tipos[classe[0]] += 1
+            padroes[classe[1]] += 1
+            if len(exemplos) < 3 and str(valor) not in exemplos:
+                exemplos.append(str(valor))
+        # Colunas sem nome e sem nenhum valor na amostra (formatação do Excel além dos dados)
+        if nome.startswith("Unnamed: ") and not tipos:
+            continue
+        colunas.append({
+            'coluna': nome,
+            'posicao': j,
+            'tipo': inferir_tipo(tipos),
+            'nulos': round(nulos / len(dados), 4) if dados else 0.0,
+            'tipos': dict(tipos.most_common()),
+            'padroes': dict(padroes.most_common()),
+            'exemplos': exemplos,
+        })
+    return {'linha_cabecalho': i_cab + 1, 'linhas_amostra': len(dados), 'colunas': colunas}
+
+
+# --- Leitura (só o começo de cada arquivo) ---
+def _amostra_excel(caminho, amostra):
+    """{aba: (linhas lidas, total de linhas declarado)} com openpyxl read-only (streaming do XML)."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        abas = {}
+        for ws in wb.worksheets:
+            linhas = []
+            for linha in ws.iter_rows(values_only=True):
+                linhas.append(linha)
+                if len(linhas) >= amostra + LINHAS_CABECALHO:
+                    break
+            abas[ws.title] = (linhas, ws.max_row)
+        return abas
+    finally:
+        wb.close()
+
+
+def _amostra_xls(caminho, amostra):
+    """Formato antigo (.xls): o openpyxl não lê; vai pelo pandas (precisa do xlrd)."""
+    import pandas as pd
+
+    planilhas = pd.read_excel(caminho, sheet_name=None, header=None, nrows=amostra + LINHAS_CABECALHO)
+    return {aba: (df.astype(object).where(df.notna(), None).values.tolist(), None) for aba, df in planilhas.items()}
+
+
+def _amostra_csv(caminho, amostra):
+    """Separador detectado num trecho do arquivo; leitura pelo motor C do pandas, tudo como texto."""
+    import pandas as pd
 
+    with open(caminho, "rb") as f:
+        bruto = f.read(64 * 1024)
+    encoding = "utf-8-sig"
     try:
-        filename = os.path.basename(filepath)
-        print(f"--- 🔍 Analisando Arquivo: {filename} ---")
-
-        if filepath.endswith('.csv'):
-            # Tenta autodetectar o separador (comum ser ',' ou ';')
-            # Lê apenas 100 linhas para ser rápido
-            df = pd.read_csv(filepath, sep=None, engine='python', nrows=100)
-        
-        elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
-            # Lê apenas a primeira aba (sheet_name=0) e 100 linhas
-            df = pd.read_excel(filepath, sheet_name=0, nrows=100)
-            print(f"(Lendo a primeira aba do Excel...)\n")
-        
+        trecho = bruto.decode(encoding)
+    except UnicodeDecodeError as e:
+        # Caractere cortado no fim do trecho ainda é UTF-8; erro no meio é export do Windows (latin-1)
+        encoding = encoding if e.start >= len(bruto) - 3 else "latin-1"
+        trecho = bruto[:e.start].decode(encoding) if encoding != "latin-1" else bruto.decode(encoding)
+    try:
+        sep = csv.Sniffer().sniff(trecho, delimiters=";,\t|").delimiter
+    except csv.Error:
+        sep = ","
+    df = pd.read_csv(caminho, sep=sep, engine="c", header=None, dtype=str, keep_default_na=False,
+                     nrows=amostra + LINHAS_CABECALHO, encoding=encoding, on_bad_lines="skip")
+    return {None: (df.values.tolist(), None)}, sep
+
+
+def perfilar_arquivo(caminho, amostra=1000):
+    """Perfil de todas as abas de um arquivo (um CSV tem uma "aba" sem nome)."""
+    inicio = time.perf_counter()
+    perfil = {'arquivo': os.path.basename(caminho), 'tamanho': os.path.getsize(caminho), 'amostra': amostra}
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        abas, perfil['separador'] = _amostra_csv(caminho, amostra)
+    elif extensao == ".xls":
+        abas = _amostra_xls(caminho, amostra)
+    else:
+        abas = _amostra_excel(caminho, amostra)
+
+    perfil['abas'] = []
+    for aba, (linhas, total) in abas.items():
+        perfil['abas'].append({'aba': aba, 'linhas_total': total, **perfilar_linhas(linhas, amostra)})
+    perfil['segundos'] = round(time.perf_counter() - inicio, 3)
+    return perfil
+
+
+# --- Cache por hash de conteúdo ---
+def _caminho_cache(hash_conteudo, amostra, dir_cache):
+    return os.path.join(dir_cache, f"{hash_conteudo[:32]}_a{amostra}_v{VERSAO_PERFIL}.json")
+
+
+def _perfilar_tarefa(caminho, amostra, destino):
+    """Roda no worker: perfila um arquivo e grava o resultado no cache (escrita atômica)."""
+    perfil = perfilar_arquivo(caminho, amostra)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(perfil, f, ensure_ascii=False)
+    os.replace(tmp, destino)
+    return perfil
+
+
+def perfilar(entradas, amostra=1000, workers=None, dir_cache=DIR_CACHE):
+    """Perfis de todos os arquivos em `entradas` (diretórios, globs ou caminhos), na ordem dos caminhos."""
+    os.makedirs(dir_cache, exist_ok=True)
+    for entrada in entradas_inexistentes(entradas):
+        print(f"X '{entrada}' não encontrado.")
+    arquivos = listar_arquivos(entradas, EXTENSOES)
+    perfis, pendentes = {}, []
+    for caminho in arquivos:
+        destino = _caminho_cache(hash_arquivo(caminho), amostra, dir_cache)
+        if os.path.exists(destino):
+            with open(destino, encoding="utf-8") as f:
+                perfis[caminho] = dict(json.load(f), arquivo=os.path.basename(caminho), cache=True)
         else:
-            print(f"X ERRO: Formato de arquivo não suportado '{filename}'.")
-            print("Por favor, use arquivos .csv, .xlsx ou .xls.\n")
-            return
-
-        # A informação principal que precisamos:
-        print("Estrutura das Colunas e Tipos (d-types):")
-        print(df.dtypes)
-        print("-" * 40 + "\n")
-
-    except Exception as e:
-        print(f"X ERRO Inesperado ao processar o arquivo {filename}:")
-        print(f"{e}\n")
-        print("Verifique se o arquivo não está corrompido ou se o formato é válido.\n")
-
-# --- Início do Script ---
-
-print("=" * 50)
-print("Analisador de Estrutura de Relatórios (Sigeo x Balancete)")
-print("=" * 50)
-print("Por favor, cole o CAMINHO COMPLETO de cada arquivo abaixo.")
-print(r"Exemplo Windows: C:\Usuarios\SeuNome\Downloads\relatorio_sigeo.xlsx")
-print(r"Exemplo Mac/Linux: /home/seu_nome/documentos/relatorio_sigeo.csv")
-print("\n")
-
-# 1. Pedir o caminho do Relatório Consolidado (Sigeo)
-path_sigeo = "Relatório Sigeo .xlsx"
-
-# 2. Pedir o caminho do Balancete (Detalhado)
-path_balancete = "Balancete prestação de contas - todos os projetos_Sigeo.xlsx"
-
-print("\n" + "=" * 50 + "\n")
-
-# Analisar os arquivos
-if path_sigeo:
-    analisar_estrutura_arquivo(path_sigeo)
-else:
-    print("Nenhum caminho fornecido para o Relatório Sigeo.\n")
-
-if path_balancete:
-    analisar_estrutura_arquivo(path_balancete)
-else:
-    print("Nenhum caminho fornecido para o Balancete.\n")
-
-print("Análise concluída. Copie e cole os resultados acima para mim.")
\ No newline at end of file
+            pendentes.append((caminho, amostra, destino))
+
+    print(f"{len(arquivos)} arquivo(s): {len(perfis)} em cache, {len(pendentes)} para perfilar.")
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(_perfilar_tarefa, *t): t[0] for t in pendentes}
+            for futuro in as_completed(futuros):
+                caminho = futuros[futuro]
+                try:
+                    perfis[caminho] = futuro.result()
+                except Exception as e:
+                    perfis[caminho] = {'arquivo': os.path.basename(caminho), 'erro': f"{type(e).__name__}: {e}"}
+    return [perfis[c] for c in arquivos]
+
+
+# --- Drift em relação ao baseline ---
+def familia(arquivo, aba):
+    """
+    Chave do schema no baseline: nome do arquivo com os dígitos trocados por '#' (exports
+    mensais como 'balancete_2024-03.xlsx' e 'balancete_2024-04.xlsx' são o mesmo schema) + aba.
+    """
+    nome = re.sub(r"\d+", "#", os.path.splitext(arquivo)[0])
+    return f"{nome} [{aba}]" if aba is not None else nome
+
+
+def montar_baseline(perfis):
+    """Schemas dos perfis no formato do baseline (o último arquivo de cada família vale)."""
+    schemas = {}
+    for perfil in perfis:
+        for aba in perfil.get('abas', []):
+            schemas[familia(perfil['arquivo'], aba['aba'])] = {
+                'arquivo': perfil['arquivo'],
+                'linha_cabecalho': aba['linha_cabecalho'],
+                'colunas': {c['coluna']: {k: c[k] for k in ('posicao', 'tipo', 'nulos')} for c in aba['colunas']},
+            }
+    return {'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'), 'versao': VERSAO_PERFIL, 'schemas': schemas}
+
+
+def comparar(perfis, baseline, limiar_nulos=LIMIAR_NULOS):
+    """Lista de mudanças (texto) de cada arquivo/aba em relação ao schema da sua família no baseline."""
+    mudancas = []
+    for perfil in perfis:
+        for aba in perfil.get('abas', []):
+            chave = familia(perfil['arquivo'], aba['aba'])
+            base = baseline['schemas'].get(chave)
+            if base is None:
+                continue
+            onde = f"{perfil['arquivo']}" + (f" [{aba['aba']}]" if aba['aba'] is not None else "")
+            if aba['linha_cabecalho'] != base['linha_cabecalho']:
+                mudancas.append(f"{onde}: cabeçalho na linha {aba['linha_cabecalho']} (era {base['linha_cabecalho']})")
+            atuais = {c['coluna']: c for c in aba['colunas']}
+            for nome in base['colunas'].keys() - atuais.keys():
+                mudancas.append(f"{onde}: coluna removida '{nome}'")
+            for nome in atuais.keys() - base['colunas'].keys():
+                mudancas.append(f"{onde}: coluna nova '{nome}' ({atuais[nome]['tipo']})")
+            for nome in atuais.keys() & base['colunas'].keys():
+                antes, agora = base['colunas'][nome], atuais[nome]
+                if agora['tipo'] != antes['tipo'] and "vazio" not in (agora['tipo'], antes['tipo']):
+                    mudancas.append(f"{onde}: '{nome}' mudou de tipo: {antes['tipo']} -> {agora['tipo']}")
+                if agora['nulos'] - antes['nulos'] > limiar_nulos:
+                    mudancas.append(f"{onde}: '{nome}' com mais nulos: {antes['nulos']:.0%} -> {agora['nulos']:.0%}")
+                if agora['posicao'] != antes['posicao']:
+                    mudancas.append(f"{onde}: '{nome}' mudou de posição: {antes['posicao'] + 1} -> {agora['posicao'] + 1}")
+    return sorted(mudancas)
+
+
+def imprimir_perfil(perfil):
+    if 'erro' in perfil:
+        print(f"X ERRO ao processar o arquivo {perfil['arquivo']}:\n{perfil['erro']}\n")
+        return
+    for aba in perfil['abas']:
+        titulo = perfil['arquivo'] + (f" [{aba['aba']}]" if aba['aba'] is not None else f" (separador '{perfil.get('separador')}')")
+        total = f" de {aba['linhas_total']}" if aba['linhas_total'] else ""
+        origem = "cache" if perfil.get('cache') else f"{perfil['segundos']:.2f}s"
+        print(f"--- 🔍 {titulo}: cabeçalho na linha {aba['linha_cabecalho']}, "
+              f"{aba['linhas_amostra']}{total} linhas na amostra ({origem}) ---")
+        for c in aba['colunas']:
+            padroes = ", ".join(f"{p} {n}" for p, n in list(c['padroes'].items())[:3])
+            print(f"  {c['coluna'][:32]:<32} {c['tipo']:<8} nulos {c['nulos']:>5.0%}   {padroes}")
+        print()
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil de schema de relatórios Sigeo/balancetes (.xlsx/.csv), com detecção de drift.")
+    parser.add_argument("entradas", nargs="*", default=ARQUIVOS_PADRAO, help="Diretórios, globs ou arquivos")
+    parser.add_argument("--amostra", type=int, default=1000, help="Linhas de dados lidas por aba")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--cache", default=DIR_CACHE, help="Diretório do cache por hash de conteúdo")
+    parser.add_argument("--baseline", default=None, help="JSON de baseline para comparar (exit 1 se houver drift)")
+    parser.add_argument("--salvar-baseline", default=None, help="Grava os schemas atuais como baseline neste JSON")
+    parser.add_argument("--limiar-nulos", type=float, default=LIMIAR_NULOS, help="Aumento de nulos que conta como drift")
+    parser.add_argument("--saida", default=None, help="JSON com os perfis completos")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    perfis = perfilar(args.entradas, amostra=args.amostra, workers=args.workers, dir_cache=args.cache)
+    print(f"Perfis prontos em {time.perf_counter() - inicio:.2f}s.\n")
+    for perfil in perfis:
+        imprimir_perfil(perfil)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(perfis, f, ensure_ascii=False, indent=2)
+        print(f"Perfis salvos em '{args.saida}'.")
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, "w", encoding="utf-8") as f:
+            json.dump(montar_baseline(perfis), f, ensure_ascii=False, indent=2)
+        print(f"Baseline salvo em '{args.salvar_baseline}'.")
+
+    mudancas = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            mudancas = comparar(perfis, json.load(f), args.limiar_nulos)
+        print(f"\n{len(mudancas)} mudança(s) de schema em relação a '{args.baseline}'" + (":" if mudancas else "."))
+        for m in mudancas:
+            print(f"  X {m}")
+    # Entrada não encontrada também falha: um caminho errado não pode passar por "sem drift"
+    faltando = entradas_inexistentes(args.entradas)
+    sys.exit(1 if mudancas or faltando or any('erro' in p for p in perfis) else 0)
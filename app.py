@@ -1,14 +1,30 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import gspread
 from streamlit_cookies_manager import EncryptedCookieManager
+import functools
+import os
+import uuid
 from datetime import datetime
+# Só o necessário para a tela de login. A pilha de análise (pandas, Plotly, camada de dados)
+# é importada depois da autenticação e aquecida em segundo plano pelo aquecimento.py
+import aquecimento
+import instrumentacao
 
 # --- Configuração da Página ---
 st.set_page_config(layout="wide", page_title="Dashboard CISM (Gestão Financeira)")
 
+# --- Instrumentação (spans por estágio; desligada por padrão) ---
+# [instrumentacao] ativo = true, log = "caminho.jsonl", chave_admin = "..." no secrets.toml
+config_instr = st.secrets.get("instrumentacao", {})
+instrumentacao.configurar(ativo=config_instr.get("ativo"), arquivo_log=config_instr.get("log"))
+
+def id_sessao():
+    # Identifica a sessão nos logs JSON (percentis por sessão/entre sessões)
+    if '_sessao' not in st.session_state:
+        st.session_state['_sessao'] = uuid.uuid4().hex[:12]
+    return st.session_state['_sessao']
+
+execucao_atual = instrumentacao.iniciar("rerun", sessao=id_sessao())
+
 # --- Configuração de Cookies ---
 try:
     cookies = EncryptedCookieManager(
@@ -102,125 +118,324 @@ def check_password():
     return False
 
 if not check_password():
+    # Enquanto o usuário digita, a thread de aquecimento importa pandas/Plotly (sem ler dados)
+    aquecimento.iniciar()
     st.stop()
-    
+
+# --- Pilha de análise (só depois do login) ---
+# Primeira sessão do processo: o Plotly aquece em paralelo com a carga dos dados
+aquecimento.iniciar()
+with instrumentacao.span("app.importar"):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    import cliente_sheets
+    import snapshot_local
+    import atualizador
+    import cache_compartilhado
+    import cache_figuras
+    import conciliacao
+    import consultas
+    import conversores
+    import cubo
+    import esquema
+    import indice_filtros
+    import orcamento
+    import serie_temporal
+    import validar_parser
+
 def logout():
     cookies['logged_in'] = 'False'
     cookies.save()
     st.rerun()
 
 # --- Carregamento de Dados (Aba CISM) ---
-@st.cache_data(ttl=600)
-def load_data():
-    try:
-        creds = st.secrets["gcp_service_account"]
-        sheet_id = st.secrets["sheets_config"]["sheet_id"]
-        try: sheet_name = st.secrets["sheets_config"]["sheet_name"]
-        except: sheet_name = "CISM"
-
-        gc = gspread.service_account_from_dict(creds)
-        sh = gc.open_by_key(sheet_id)
-        
-        try: ws = sh.worksheet(sheet_name)
-        except gspread.exceptions.WorksheetNotFound: ws = sh.worksheet("CISM")
-
-        data = ws.get_all_values()
-        if len(data) < 2: return pd.DataFrame()
-            
-        header = data[0]
-        rows = data[1:]
-        df = pd.DataFrame(rows, columns=header)
-        
-        # --- LIMPEZA DOS NOMES DAS COLUNAS (Espaços invisíveis) ---
-        df.columns = [c.strip() for c in df.columns]
-
-        # Verifica 'Fonte'
-        if 'Fonte' not in df.columns:
-            st.error(f"Coluna 'Fonte' não encontrada. Colunas: {list(df.columns)}")
-            return pd.DataFrame()
-
-        # Limpeza Numérica
-        def clean_currency(x):
-            if isinstance(x, str):
-                x = x.replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
-            return pd.to_numeric(x, errors='coerce')
-
-        if 'Valor' in df.columns:
-            df['Valor_Num'] = df['Valor'].apply(clean_currency)
-        else:
-            df['Valor_Num'] = 0.0
-
-        # Data
-        if 'Data' in df.columns:
-            df['Data_dt'] = pd.to_datetime(df['Data'], dayfirst=True, errors='coerce')
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
+def preparar_frames(df_raw, df_rel_raw=None):
+    """
+    DataFrames brutos -> frames publicados no cache compartilhado entre réplicas:
+    frame tipado, cubo (cubo.py) e a aba de relatório achatada pelo validar_parser.
+    """
+    # Marcas da sincronização (snapshot_local.sincronizar) seguem no frame tipado e no cache
+    sync = {k: v for k, v in df_raw.attrs.items() if k in ('sync', 'sync_base', 'linhas_inalteradas')}
+    with instrumentacao.span("esquema.preparar_dados", linhas=len(df_raw)):
+        df = esquema.preparar_dados(df_raw)
+    df.attrs.update(sync)
+    with instrumentacao.span("cubo.construir") as s:
+        cubo_df = cubo.construir_cubo(df)
+        s.anotar(linhas=len(cubo_df))
+    relatorio = pd.DataFrame()
+    if df_rel_raw is not None and not df_rel_raw.empty:
+        df_rel_raw.columns = [str(c).strip() for c in df_rel_raw.columns]
+        with instrumentacao.span("parser.relatorio", linhas=len(df_rel_raw)):
+            relatorio = validar_parser.processar_dataframe(validar_parser.normalizar_nulos(df_rel_raw))
+    return {'df': df, 'cubo': cubo_df, 'relatorio': relatorio, 'conciliacao': conciliar_com_sigeo(relatorio)}
+
+@functools.lru_cache(maxsize=1)
+def ler_sigeo(caminho, aba, mtime):
+    # `mtime` na chave: relê só quando o arquivo do Sigeo muda
+    return conciliacao.ler_sigeo(caminho, aba)
+
+def conciliar_com_sigeo(relatorio):
+    """
+    Divergências entre o relatório achatado e o consolidado do Sigeo ([conciliacao] sigeo
+    nos secrets). Vazio se não configurado; erro de leitura vai em attrs['erro'] (não derruba a carga).
+    """
+    config = st.secrets.get("conciliacao", {})
+    if not config.get("sigeo") or relatorio.empty:
         return pd.DataFrame()
+    try:
+        with instrumentacao.span("conciliacao.ler_sigeo"):
+            sigeo = ler_sigeo(config["sigeo"], config.get("aba", 0), os.path.getmtime(config["sigeo"]))
+        with instrumentacao.span("conciliacao.conciliar", linhas=len(relatorio) + len(sigeo)):
+            return conciliacao.conciliar(relatorio, sigeo, tolerancia=config.get("tolerancia", 0))
+    except (OSError, ValueError) as e:
+        vazio = pd.DataFrame()
+        vazio.attrs['erro'] = f"{type(e).__name__}: {e}"
+        return vazio
+
+def montar_serie_temporal(df, cubo_df, anterior=None):
+    """
+    Série temporal do gráfico de evolução (serie_temporal.py). Se o dataset anterior veio do
+    snapshot que esta sincronização estendeu, só o delta do rabo relido é aplicado; senão, monta do cubo.
+    """
+    k = df.attrs.get('linhas_inalteradas')
+    if (anterior is not None and k is not None and 'serie' in anterior
+            and df.attrs.get('sync_base') is not None
+            and anterior['df'].attrs.get('sync') == df.attrs['sync_base']
+            and len(anterior['df']) >= k):
+        velho = anterior['df']
+        with instrumentacao.span("serie_temporal.atualizar", linhas=len(velho) - k + len(df) - k):
+            return anterior['serie'].atualizar(cubo.construir_cubo(velho.iloc[k:]), cubo.construir_cubo(df.iloc[k:]))
+    with instrumentacao.span("serie_temporal.montar", linhas=len(cubo_df)):
+        return serie_temporal.SerieTemporal(cubo_df)
+
+def montar_dataset(frames, versao, anterior=None):
+    """
+    Frames (recém-preparados ou mapeados do cache compartilhado) -> dataset servido a todas
+    as sessões do processo: + índice (indice_filtros.py), série temporal (serie_temporal.py)
+    e backend de consultas (consultas.py). `anterior` = dataset que está no ar, se houver.
+    `versao` é a chave dos caches de figura/fatia (a mesma em todas as réplicas).
+    """
+    df, cubo_df = frames['df'], frames['cubo']
+    with instrumentacao.span("indice.construir", linhas=len(df)):
+        indice = indice_filtros.IndiceFiltros(df, cubo.DIMENSOES)
+    serie = montar_serie_temporal(df, cubo_df, anterior)
+    # DuckDB sobre Parquet (com histórico, se configurado) ou o pandas em memória de sempre
+    with instrumentacao.span("consultas.backend"):
+        backend = consultas.criar_backend(df, cubo_df, indice, versao, st.secrets.get("consultas", {}), serie)
+    return {
+        'df': df,
+        'cubo': cubo_df,
+        'indice': indice,
+        'serie': serie,
+        'consultas': backend,
+        'relatorio': frames['relatorio'],
+        'conciliacao': frames.get('conciliacao', pd.DataFrame()),
+        'versao': versao,
+    }
 
-df = load_data()
+def buscar_no_sheets():
+    """Sincronização incremental com o Google Sheets -> frames. Só a réplica com a trava chama."""
+    creds = st.secrets.get("gcp_service_account", {})
+    config = st.secrets.get("sheets_config", {})
+    sheet_name = config.get("sheet_name", "CISM")
+    report_name = config.get("sheet_name_report")
+
+    # Cliente/planilha reaproveitados pelo processo (cliente_sheets.py)
+    with instrumentacao.span("sheets.conectar"):
+        fonte = cliente_sheets.obter_fonte(creds, config.get("sheet_id"))
+        aba = fonte.escolher_aba(sheet_name)
+    extras = [cliente_sheets.citar_aba(report_name)] if report_name in fonte.abas else []
+
+    # Baixa só o que mudou/foi adicionado desde o último snapshot; relatório na mesma requisição
+    with instrumentacao.span("sheets.sincronizar") as s:
+        df_raw, valores_extras = snapshot_local.sincronizar(fonte, aba, faixas_extras=extras)
+        s.anotar(linhas=len(df_raw))
+    df_rel_raw = None
+    if valores_extras:
+        snapshot_local.gravar_linhas(valores_extras[0], snapshot_local.ARQUIVO_RELATORIO)
+        df_rel_raw = snapshot_local.linhas_para_dataframe(valores_extras[0])
+    return preparar_frames(df_raw, df_rel_raw)
+
+@instrumentacao.execucao("carga.sheets")
+def carregar_do_sheets(cache, anterior=None):
+    """
+    Roda no atualizador (thread de fundo): mapeia a versão que outra réplica acabou de
+    publicar ou, se não houver mais nova, busca no Sheets e publica (cache_compartilhado.py).
+    """
+    frames, meta = cache.carregar(buscar_no_sheets)
+    return montar_dataset(frames, meta['versao'], anterior), meta['carregado_em']
+
+@instrumentacao.execucao("carga.snapshot")
+def carregar_do_snapshot(cache):
+    """Carga inicial sem rede: versão publicada pelas réplicas ou, sem ela, o snapshot local (o atualizador revalida)."""
+    with instrumentacao.span("compartilhado.abrir"):
+        publicada = cache.abrir_atual()
+    if publicada is not None:
+        frames, meta = publicada
+        return montar_dataset(frames, meta['versao']), meta['carregado_em']
+
+    with instrumentacao.span("snapshot.ler"):
+        header, df_linhas, meta = snapshot_local.ler_snapshot()
+    if header is None:
+        return None
+    df_rel_raw = snapshot_local.carregar_snapshot(snapshot_local.ARQUIVO_RELATORIO)
+    df_raw = snapshot_local.montar_dataframe(header, df_linhas)
+    df_raw.attrs['sync'] = meta.get('ultima_sync')
+    frames = preparar_frames(df_raw, df_rel_raw)
+    # Versão = instante da sincronização: qualquer versão publicada depois é mais nova
+    return montar_dataset(frames, int(meta.get('ultima_sync', 0) * 1e9)), meta.get('ultima_sync', 0)
+
+@st.cache_resource
+def get_atualizador():
+    # Um por processo: serve o último dataset bom e recarrega em segundo plano antes de expirar.
+    # Entre processos/réplicas, o cache em disco garante uma busca no Sheets por atualização.
+    cache = cache_compartilhado.CacheCompartilhado(
+        st.secrets.get("cache_compartilhado", {}).get("dir", cache_compartilhado.DIR_PADRAO))
+    # A recarga recebe o dataset no ar: a série temporal só aplica o delta da sincronização
+    atual = atualizador.Atualizador(lambda: carregar_do_sheets(cache, atual.dados), lambda: carregar_do_snapshot(cache),
+                                    intervalo=600)
+    return atual
+
+@st.cache_resource
+def get_cache_figuras():
+    # Compartilhado entre sessões: mesma seleção de filtros = mesma figura, montada uma vez
+    limite_mb = st.secrets.get("cache_figuras", {}).get("limite_mb", 64)
+    return cache_figuras.CacheFiguras(limite_bytes=int(limite_mb * 2**20))
+
+# Limites de payload por widget (orcamento.py), ajustáveis em [orcamento.<widget>] no secrets.toml
+ORCAMENTOS = orcamento.carregar_orcamentos(st.secrets.get("orcamento", {}))
+
+def formatar_idade(segundos):
+    if segundos < 60:
+        return f"{segundos:.0f} s"
+    if segundos < 3600:
+        return f"{segundos / 60:.0f} min"
+    return f"{segundos / 3600:.1f} h"
+
+atualiz = get_atualizador()
+with instrumentacao.span("dados.obter"):
+    dados = atualiz.obter()
 
 # --- BARRA SUPERIOR (Compacta) ---
-# Título na esquerda, Botão Sair na direita
-c_top1, c_top2 = st.columns([6, 1])
+# Título + estado dos dados na esquerda, Atualizar e Sair na direita
+c_top1, c_top2, c_top3 = st.columns([5, 1, 1])
 with c_top1:
     st.markdown("### 📊 Dashboard Financeiro CISM")
+    if dados is not None:
+        status_dados = f"Dados de {formatar_idade(atualiz.idade)} atrás"
+        if atualiz.duracao is not None:
+            status_dados += f" · última atualização levou {atualiz.duracao:.1f} s"
+        if atualiz.atualizando:
+            status_dados += " · ⏳ atualizando…"
+        if atualiz.erro:
+            status_dados += f" · ⚠️ última atualização falhou: {atualiz.erro}"
+        if getattr(dados['consultas'], 'erro_backend', None):
+            status_dados += f" · ⚠️ {dados['consultas'].erro_backend}"
+        st.caption(status_dados)
 with c_top2:
+    if st.button("🔄 Atualizar", key="refresh_btn", disabled=atualiz.atualizando):
+        # Não bloqueia: a sessão segue com os dados atuais e as outras sessões nem percebem
+        atualiz.atualizar_agora()
+        st.toast("Atualização iniciada em segundo plano.")
+with c_top3:
     if st.button("Sair", key="logout_btn"):
         logout()
 
-if df.empty:
-    st.warning("Dados não carregados.")
+if dados is None:
+    st.error(f"Erro ao carregar dados: {atualiz.erro}")
     st.stop()
 
+df = dados['df']
+
+falhas_parse = {col: n for col, n in df.attrs.get('falhas_parse', {}).items() if n}
+if falhas_parse:
+    st.caption("⚠️ Valores não convertidos: " + ", ".join(f"{col}: {n}" for col, n in falhas_parse.items()))
+
 # --- FILTROS (Linha única, muito compacta) ---
-with st.container():
+backend = dados['consultas']
+
+# Fragmentos que leem os filtros. Todo gráfico depende das quatro dimensões (qualquer filtro
+# muda a fatia), então mudar um filtro reroda todos eles; ficam de fora a conciliação (não usa
+# filtros) e a tabela fechada. Login, CSS, cabeçalho e os próprios filtros só rodam de novo
+# num rerun completo (ex.: botão Atualizar).
+FRAGMENTOS_FILTRADOS = ['kpis', 'sankey', 'top_fontes', 'composicao', 'evolucao', 'tabela']
+
+def ao_mudar_filtro():
+    # Tabela fechada não mostra nada: só recalcula quando o expander for aberto
+    tabela_aberta = st.session_state.get('tabela_aberta')
+    st.rerun([frag for frag in FRAGMENTOS_FILTRADOS if frag != 'tabela' or tabela_aberta])
+
+def filtros_atuais():
+    return {dim: st.session_state.get(f"filtro_{dim}", []) for dim in cubo.DIMENSOES}
+
+def fatia_atual(dados):
+    """Consulta do backend para os filtros da sessão; criada uma vez por combinação e compartilhada pelos fragmentos."""
+    filtros = filtros_atuais()
+    chave = (dados['versao'], cache_figuras.normalizar_filtros(filtros))
+    memo = st.session_state.get('_fatia')
+    if memo is None or memo[0] != chave:
+        with instrumentacao.span("consulta.fatia"):
+            memo = (chave, dados['consultas'].fatia(filtros))
+        st.session_state['_fatia'] = memo
+    return memo[1]
+
+def rotulos_filtro(dim):
+    """format_func do multiselect: 'valor (registros · total)', tudo vindo do índice/backend."""
+    resumo = backend.resumo(dim)
+    totais = conversores.formatar_reais(pd.Series([total for _n, total in resumo.values()], dtype="Int64"))
+    rotulos = {v: f"{v} ({n} · {t})" for (v, (n, _total)), t in zip(resumo.items(), totais)}
+    return lambda v: rotulos.get(v, str(v))
+
+with st.container(), instrumentacao.span("filtros.widgets"):
     c1, c2, c3, c4 = st.columns(4)
-    fontes_lst = sorted(list(df['Fonte'].astype(str).unique()))
-    projetos_lst = sorted(list(df['Projeto'].astype(str).unique()))
-    anos_lst = sorted(list(df['ano'].astype(str).unique()))
-    
-    # Filtros com label_visibility="collapsed" para economizar altura se precisar, 
-    # mas mantive labels curtos para clareza
-    sel_anos = c1.multiselect("Ano", options=anos_lst, placeholder="Todos")
-    sel_fontes = c2.multiselect("Fonte Pagadora", options=fontes_lst, placeholder="Todas")
-    sel_projs = c3.multiselect("Projeto", options=projetos_lst, placeholder="Todos")
-    
-    # Status (se existir)
-    status_lst = sorted(list(df['status'].astype(str).unique())) if 'status' in df.columns else []
-    sel_status = c4.multiselect("Status", options=status_lst, placeholder="Todos")
-
-# Aplica Filtros
-df_ok = df.copy()
-if sel_fontes: df_ok = df_ok[df_ok['Fonte'].isin(sel_fontes)]
-if sel_projs: df_ok = df_ok[df_ok['Projeto'].isin(sel_projs)]
-if sel_anos: df_ok = df_ok[df_ok['ano'].isin(sel_anos)]
-if sel_status: df_ok = df_ok[df_ok['status'].isin(sel_status)]
+    # Opções já ordenadas saem das categorias do schema (sem varrer as linhas)
+    rotulos_dim = {'ano': ("Ano", "Todos"), 'Fonte': ("Fonte Pagadora", "Todas"),
+                   'Projeto': ("Projeto", "Todos"), 'status': ("Status", "Todos")}
+    for col, dim in zip((c1, c2, c3, c4), cubo.DIMENSOES):
+        rotulo, vazio = rotulos_dim[dim]
+        col.multiselect(
+            rotulo, options=backend.opcoes(dim), placeholder=vazio,
+            format_func=rotulos_filtro(dim), key=f"filtro_{dim}",
+            on_change=ao_mudar_filtro,
+        )
 
 st.markdown("---") 
 
+def instrumentado(nome):
+    """Fragmento medido: span do rerun completo ou, num rerun só do fragmento, uma execução própria."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with instrumentacao.execucao(f"fragmento.{nome}", sessao=id_sessao()):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
 # --- LINHA 1: KPIs (Cards) ---
-# Cálculo
-val_total = df_ok['Valor_Num'].sum()
-qtd_proj = df_ok['Projeto'].nunique()
-# Fonte que mais pagou no filtro
-top_fonte_nome = "-"
-if not df_ok.empty:
-    grp_fonte = df_ok.groupby('Fonte')['Valor_Num'].sum()
-    if not grp_fonte.empty:
-        top_fonte_nome = f"{grp_fonte.idxmax()} ({grp_fonte.max()/val_total:.0%})"
-
-k1, k2, k3, k4 = st.columns(4)
-k1.metric("Total Executado", f"R$ {val_total:,.2f}".replace(",", "_").replace(".", ",").replace("_", "."))
-k2.metric("Projetos Ativos", qtd_proj)
-k3.metric("Fonte Principal (%)", top_fonte_nome)
-k4.metric("Registros", len(df_ok))
+@st.fragment(key='kpis')
+@instrumentado('kpis')
+def secao_kpis(dados):
+    # Cálculo (Fonte que mais pagou no filtro incluída)
+    val_total, qtd_proj, top_fonte_nome, qtd_registros = fatia_atual(dados).kpis()
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Total Executado", conversores.formatar_reais(val_total))
+    k2.metric("Projetos Ativos", qtd_proj)
+    k3.metric("Fonte Principal (%)", top_fonte_nome)
+    k4.metric("Registros", qtd_registros)
+
+secao_kpis(dados)
 
 # --- GRÁFICOS (Layout Otimizado) ---
 st.markdown("#### 🔄 Fluxos e Distribuição dos Recursos")
 
+def em_reais(df_val):
+    """Centavos -> reais só na hora de desenhar: 'Reais' (eixo) e 'Valor (R$)' (hover formatado)."""
+    return df_val.assign(Reais=df_val['Valor'] / 100, **{'Valor (R$)': conversores.formatar_reais(df_val['Valor'])})
+
+hover_reais = {'Reais': False, 'Valor (R$)': True}
+
 # Configuração Padrão Plotly (Remove fundo para fundir com card)
 pc = {'displayModeBar': False}
 layout_transparent = {
@@ -230,61 +445,193 @@ layout_transparent = {
     'font': {'family': "Arial, sans-serif"}
 }
 
+def figura_sankey(consulta, fator=1.0):
+    # Prepara dados: top-K fontes/projetos + "Outros" (orçamento de nós do Sankey)
+    orc = ORCAMENTOS['sankey']
+    df_sk = orcamento.top_k(consulta.somar_por(['Fonte', 'Projeto']),
+                            orcamento.escalar_limites({'Fonte': orc['fontes'], 'Projeto': orc['projetos']}, fator))
+
+    # [CORREÇÃO] Filtro de Ruído: Remove fluxos muito pequenos que causam sobreposição de texto
+    # Remove conexões que representam menos de 0.1% do total filtrado para limpar o gráfico
+    limit_val = df_sk['Valor'].sum() * 0.001 
+    df_sk = em_reais(df_sk[df_sk['Valor'] > limit_val])
+
+    nodes = list(pd.concat([df_sk['Fonte'], df_sk['Projeto']]).unique())
+    node_map = {n: i for i, n in enumerate(nodes)}
+
+    # Cores dos Nós (Azul para Fonte, Verde para Projeto); set: consulta O(1) por nó
+    fontes = set(df_sk['Fonte'])
+    node_colors = ['#1f77b4' if n in fontes else '#2ca02c' for n in nodes]
+
+    # [CORREÇÃO] Cores dos Links: Cinza semitransparente para ser visível no branco
+    # Antes estava automático (branco/transparente que sumia)
+
+    fig_sk = go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=30, # [CORREÇÃO] Maior espaçamento vertical para evitar texto encavalado
+            thickness=20,
+            line=dict(color="black", width=0.5),
+            label=nodes,
+            color=node_colors
+        ),
+        link=dict(
+            source=df_sk['Fonte'].map(node_map),
+            target=df_sk['Projeto'].map(node_map),
+            value=df_sk['Reais'],
+            customdata=df_sk['Valor (R$)'],
+            color='rgba(150, 150, 150, 0.5)', # [CORREÇÃO] Cor cinza visível
+            hovertemplate='De: %{source.label}<br>Para: %{target.label}<br>Valor: %{customdata}<extra></extra>'
+        ),
+        textfont=dict(size=11, color="rgba(0,0,0,1)") # [CORREÇÃO] Texto preto forçado para legibilidade
+    )])
+
+    fig_sk.update_layout(height=500, **layout_transparent)
+    return fig_sk
+
+def figura_top_fontes(consulta, fator=1.0):
+    limites = orcamento.escalar_limites({'Fonte': ORCAMENTOS['top_fontes']['barras']}, fator)
+    df_bar_src = em_reais(orcamento.top_k(consulta.somar_por(['Fonte']), limites))
+    # Maior barra no topo, "Outros" sempre por último (embaixo)
+    ordem = orcamento.ordem_com_outros(df_bar_src, 'Fonte')[::-1]
+    fig_src = px.bar(df_bar_src, x='Reais', y='Fonte', orientation='h', text_auto='.2s', hover_data=hover_reais,
+                     category_orders={'Fonte': ordem})
+    fig_src.update_layout(height=500, xaxis_title=None, yaxis_title=None, **layout_transparent)
+    fig_src.update_traces(marker_color='#3366CC')
+    return fig_src
+
+def figura_composicao(consulta, fator=1.0):
+    # Gráfico de barras empilhadas: Eixo X = Projeto, Cor = Fonte
+    orc = ORCAMENTOS['composicao']
+    limites = orcamento.escalar_limites({'Projeto': orc['projetos'], 'Fonte': orc['fontes']}, fator)
+    df_comp = em_reais(orcamento.top_k(consulta.somar_por(['Projeto', 'Fonte']), limites))
+    # Ordena projetos pelo valor total (reaproveita df_comp, sem novo groupby nas linhas); "Outros" no fim
+    order_proj = orcamento.ordem_com_outros(df_comp, 'Projeto')
+
+    fig_comp = px.bar(
+        df_comp, x='Projeto', y='Reais', color='Fonte',
+        category_orders={'Projeto': order_proj},
+        labels={'Reais': 'Valor (R$)'}, hover_data=hover_reais
+    )
+    # Move legenda para o topo para não bater nos nomes dos projetos (eixo X rotacionado)
+    fig_comp.update_layout(
+        height=400, 
+        legend=dict(orientation="h", y=1.2, x=0, xanchor='left'), 
+        **layout_transparent
+    )
+    return fig_comp
+
+# Visões do gráfico de evolução: coluna da série temporal (serie_temporal.py) e como sobe de granularidade
+VISOES_EVOLUCAO = {
+    "Mensal": ('Valor', 'sum'),
+    "Acumulado": ('Acumulado', 'last'),
+    "Móvel 3m": ('Movel_3m', 'last'),
+    "Móvel 12m": ('Movel_12m', 'last'),
+    "Ano a ano": ('Ano_anterior', 'sum'),
+}
+
+def figura_evolucao(consulta, visao="Mensal", fator=1.0):
+    coluna, agregacao = VISOES_EVOLUCAO[visao]
+    serie = consulta.serie_mensal()
+    # Mês, trimestre ou ano: a mais fina que caiba no orçamento de pontos
+    # Ano a ano: duas barras por período, metade dos períodos no mesmo orçamento de pontos
+    ano_a_ano = visao == "Ano a ano"
+    agregacoes = {'Valor': 'sum', coluna: agregacao} if ano_a_ano else {coluna: agregacao}
+    pontos = orcamento.escalar_limites({'pontos': ORCAMENTOS['evolucao']['pontos']}, fator)['pontos']
+    max_pontos = pontos // (2 if ano_a_ano else 1)
+    df_time, granularidade = orcamento.ajustar_granularidade(serie, max_pontos, agregacoes)
+    titulo = f"Por {granularidade.lower()}"
+    if ano_a_ano:
+        # Período contra o mesmo período do ano anterior; variação sobre as somas do período
+        df_time = df_time.assign(Variacao=(df_time['Valor'] - df_time['Ano_anterior'])
+                                 / df_time['Ano_anterior'].abs().where(df_time['Ano_anterior'] != 0))
+        atual = em_reais(df_time)
+        anterior = em_reais(df_time[['Mes', 'Ano_anterior', 'Variacao']].rename(columns={'Ano_anterior': 'Valor'}))
+        fig_line = go.Figure([
+            go.Bar(x=anterior['Mes'], y=anterior['Reais'], name="Ano anterior", marker_color="#b0b7c3",
+                   customdata=anterior[['Valor (R$)']], hovertemplate="%{customdata[0]}<extra>Ano anterior</extra>"),
+            go.Bar(x=atual['Mes'], y=atual['Reais'], name="Período", customdata=atual[['Valor (R$)', 'Variacao']],
+                   hovertemplate="%{customdata[0]} (%{customdata[1]:+.1%})<extra>Período</extra>"),
+        ])
+        fig_line.update_layout(barmode='group', legend=dict(orientation='h', y=1.1))
+        titulo += " · contra o mesmo período do ano anterior"
+    else:
+        fig_line = px.area(em_reais(df_time[['Mes', coluna]].rename(columns={coluna: 'Valor'})), x='Mes', y='Reais',
+                           hover_data=hover_reais)
+    fig_line.update_layout(height=400, xaxis_title=None, yaxis_title=None,
+                           title=dict(text=titulo, font=dict(size=12)), **layout_transparent)
+    return fig_line
+
+def figura_em_cache(nome, dados, construir, variante=None):
+    """
+    (figura, bytes, pontos) do cache compartilhado; só consulta o backend e monta a figura na falta.
+    Figura None = fatia vazia.
+    `construir(consulta, fator)` é remontada com menos categorias/pontos enquanto passar do
+    orçamento de bytes do widget. `variante` (ex.: a visão escolhida) entra na chave junto com os filtros.
+    """
+    def montar():
+        consulta = fatia_atual(dados)
+        if consulta.vazia():
+            return None
+        return orcamento.dentro_do_orcamento(lambda fator: construir(consulta, fator), ORCAMENTOS[nome]['bytes'])
+    chave = nome if variante is None else f"{nome}.{variante}"
+    with instrumentacao.span(f"figura.{nome}"):
+        return get_cache_figuras().obter(chave, dados['versao'], filtros_atuais(), montar)
+
+def mostrar_payload():
+    # Relatório de payload por widget: abra o dashboard com ?payload=1
+    return st.query_params.get("payload") == "1"
+
+def desenhar(nome, fig, tamanho, pontos):
+    with instrumentacao.span("st.plotly_chart", bytes=tamanho):
+        st.plotly_chart(fig, use_container_width=True, config=pc)
+    if mostrar_payload():
+        st.caption(orcamento.resumo_payload(tamanho, pontos, ORCAMENTOS[nome]['bytes']))
+
+@st.fragment(key='sankey')
+@instrumentado('sankey')
+def grafico_sankey(dados):
+    fig_sk, tamanho, pontos = figura_em_cache('sankey', dados, figura_sankey)
+    if fig_sk is None:
+        st.info("Sem dados.")
+    else:
+        desenhar('sankey', fig_sk, tamanho, pontos)
+
+@st.fragment(key='top_fontes')
+@instrumentado('top_fontes')
+def grafico_top_fontes(dados):
+    fig_src, tamanho, pontos = figura_em_cache('top_fontes', dados, figura_top_fontes)
+    if fig_src is not None:
+        desenhar('top_fontes', fig_src, tamanho, pontos)
+
+@st.fragment(key='composicao')
+@instrumentado('composicao')
+def grafico_composicao(dados):
+    fig_comp, tamanho, pontos = figura_em_cache('composicao', dados, figura_composicao)
+    if fig_comp is not None:
+        desenhar('composicao', fig_comp, tamanho, pontos)
+
+@st.fragment(key='evolucao')
+@instrumentado('evolucao')
+def grafico_evolucao(dados):
+    if not dados['consultas'].tem_coluna('Data_dt'):
+        return
+    # Trocar a visão reroda só este fragmento (e cada visão fica no cache de figuras)
+    visao = st.radio("Visão", list(VISOES_EVOLUCAO), horizontal=True, key="evolucao_visao",
+                     label_visibility="collapsed")
+    fig_line, tamanho, pontos = figura_em_cache('evolucao', dados, lambda consulta, fator: figura_evolucao(consulta, visao, fator), visao)
+    if fig_line is not None:
+        desenhar('evolucao', fig_line, tamanho, pontos)
+
 # LINHA 2: Sankey (Esquerda) + Barra de Top Fontes (Direita)
 r2_col1, r2_col2 = st.columns([2, 1])
 
 with r2_col1:
     st.markdown("##### 🔀 Fluxo Financeiro: Fonte ➝ Projeto")
-    
-    if not df_ok.empty:
-        # Prepara dados
-        df_sk = df_ok.groupby(['Fonte', 'Projeto'])['Valor_Num'].sum().reset_index()
-        
-        # [CORREÇÃO] Filtro de Ruído: Remove fluxos muito pequenos que causam sobreposição de texto
-        # Remove conexões que representam menos de 0.1% do total filtrado para limpar o gráfico
-        limit_val = df_sk['Valor_Num'].sum() * 0.001 
-        df_sk = df_sk[df_sk['Valor_Num'] > limit_val]
-
-        nodes = list(pd.concat([df_sk['Fonte'], df_sk['Projeto']]).unique())
-        node_map = {n: i for i, n in enumerate(nodes)}
-        
-        # Cores dos Nós (Azul para Fonte, Verde para Projeto)
-        node_colors = ['#1f77b4' if n in df_sk['Fonte'].values else '#2ca02c' for n in nodes]
-        
-        # [CORREÇÃO] Cores dos Links: Cinza semitransparente para ser visível no branco
-        # Antes estava automático (branco/transparente que sumia)
-        
-        fig_sk = go.Figure(data=[go.Sankey(
-            node=dict(
-                pad=30, # [CORREÇÃO] Maior espaçamento vertical para evitar texto encavalado
-                thickness=20,
-                line=dict(color="black", width=0.5),
-                label=nodes,
-                color=node_colors
-            ),
-            link=dict(
-                source=df_sk['Fonte'].map(node_map),
-                target=df_sk['Projeto'].map(node_map),
-                value=df_sk['Valor_Num'],
-                color='rgba(150, 150, 150, 0.5)', # [CORREÇÃO] Cor cinza visível
-                hovertemplate='De: %{source.label}<br>Para: %{target.label}<br>Valor: R$ %{value:,.2f}<extra></extra>'
-            ),
-            textfont=dict(size=11, color="rgba(0,0,0,1)") # [CORREÇÃO] Texto preto forçado para legibilidade
-        )])
-
-        fig_sk.update_layout(height=500, **layout_transparent)
-        st.plotly_chart(fig_sk, use_container_width=True, config=pc)
-    else:
-        st.info("Sem dados.")
+    grafico_sankey(dados)
 
 with r2_col2:
     st.markdown("**Top Fontes de Recurso**")
-    if not df_ok.empty:
-        df_bar_src = df_ok.groupby('Fonte')['Valor_Num'].sum().reset_index().sort_values('Valor_Num', ascending=True)
-        fig_src = px.bar(df_bar_src, x='Valor_Num', y='Fonte', orientation='h', text_auto='.2s')
-        fig_src.update_layout(height=500, xaxis_title=None, yaxis_title=None, **layout_transparent)
-        fig_src.update_traces(marker_color='#3366CC')
-        st.plotly_chart(fig_src, use_container_width=True, config=pc)
+    grafico_top_fontes(dados)
 
 # LINHA 3: Composição por Projeto (Novo!) + Evolução
 st.markdown("#### 📊 Análise por Projeto")
@@ -292,38 +639,170 @@ r3_col1, r3_col2 = st.columns([1.5, 1])
 
 with r3_col1:
     st.markdown("**Composição de Custo: Qual Fonte paga cada Projeto?**")
-    if not df_ok.empty:
-        # Gráfico de barras empilhadas: Eixo X = Projeto, Cor = Fonte
-        df_comp = df_ok.groupby(['Projeto', 'Fonte'])['Valor_Num'].sum().reset_index()
-        # Ordena projetos pelo valor total
-        order_proj = df_ok.groupby('Projeto')['Valor_Num'].sum().sort_values(ascending=False).index
-        
-        fig_comp = px.bar(
-            df_comp, x='Projeto', y='Valor_Num', color='Fonte',
-            category_orders={'Projeto': order_proj},
-            labels={'Valor_Num': 'Valor (R$)'}
-        )
-        # Move legenda para o topo para não bater nos nomes dos projetos (eixo X rotacionado)
-        fig_comp.update_layout(
-            height=400, 
-            legend=dict(orientation="h", y=1.2, x=0, xanchor='left'), 
-            **layout_transparent
-        )
-        st.plotly_chart(fig_comp, use_container_width=True, config=pc)
+    grafico_composicao(dados)
 
 with r3_col2:
-    st.markdown("**Desembolso no Tempo (Mês)**")
-    if not df_ok.empty and 'Data_dt' in df_ok.columns:
-        df_time = df_ok.groupby(pd.Grouper(key='Data_dt', freq='M'))['Valor_Num'].sum().reset_index()
-        fig_line = px.area(df_time, x='Data_dt', y='Valor_Num')
-        fig_line.update_layout(height=400, xaxis_title=None, yaxis_title=None, **layout_transparent)
-        st.plotly_chart(fig_line, use_container_width=True, config=pc)
+    st.markdown("**Desembolso no Tempo**")
+    grafico_evolucao(dados)
+
+def formatar_pagina(df_pag):
+    if 'Valor_Cent' in df_pag.columns:
+        return df_pag.assign(Valor_Cent=conversores.formatar_reais(df_pag['Valor_Cent']))
+    return df_pag
+
+def linhas_por_pagina_tabela(dados, colunas, orc, amostra=50):
+    """Tamanho de página medido nas primeiras linhas da seleção; recalculado só quando filtros/colunas mudam."""
+    chave = (dados['versao'], cache_figuras.normalizar_filtros(filtros_atuais()), tuple(colunas))
+    memo = st.session_state.get('_tabela_linhas')
+    if memo is None or memo[0] != chave:
+        df_amostra, _total = dados['consultas'].pagina(filtros_atuais(), 0, min(amostra, orc['linhas']), colunas)
+        memo = (chave, orcamento.linhas_por_pagina(formatar_pagina(df_amostra), orc['linhas'], orc['bytes']))
+        st.session_state['_tabela_linhas'] = memo
+    return memo[1]
 
 # Detalhes finais (escondidos)
-with st.expander("📋 Ver Tabela de Dados Completa"):
-    st.dataframe(
-        df_ok,
-        use_container_width=True,
-        hide_index=True,
-        column_config={"Valor_Num": st.column_config.NumberColumn("Valor", format="R$ %.2f")}
+@st.fragment(key='tabela')
+@instrumentado('tabela')
+def tabela_detalhes(dados):
+    if not st.session_state.get('tabela_aberta'):
+        return
+    orc = ORCAMENTOS['tabela']
+    colunas_df = dados['consultas'].colunas
+
+    # Paginada e só com as colunas escolhidas: o navegador recebe uma página, não o resultado inteiro
+    c_cols, c_pag = st.columns([4, 1])
+    colunas = c_cols.multiselect("Colunas", options=colunas_df, default=colunas_df, key="tabela_colunas") or colunas_df
+    # Linhas por página dentro do orçamento de bytes (colunas largas = páginas menores)
+    n_linhas = linhas_por_pagina_tabela(dados, colunas, orc)
+    n_paginas = max((dados['consultas'].contar(filtros_atuais()) - 1) // n_linhas + 1, 1)
+    # Filtro mais restrito pode deixar a página atual fora do intervalo
+    if st.session_state.get("tabela_pagina", 1) > n_paginas:
+        st.session_state["tabela_pagina"] = n_paginas
+    pagina = c_pag.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas, key="tabela_pagina")
+
+    # Só as linhas/colunas da página (take no índice ou LIMIT/OFFSET no DuckDB)
+    with instrumentacao.span("tabela.pagina") as s:
+        df_pag, total = dados['consultas'].pagina(filtros_atuais(), (pagina - 1) * n_linhas, n_linhas, colunas)
+        s.anotar(linhas=len(df_pag))
+    df_pag = formatar_pagina(df_pag)
+    tamanho = orcamento.bytes_tabela(df_pag)
+
+    with instrumentacao.span("st.dataframe", linhas=len(df_pag), bytes=tamanho):
+        st.dataframe(
+            df_pag,
+            use_container_width=True,
+            hide_index=True,
+            column_config={"Valor_Cent": st.column_config.TextColumn("Valor (R$)")}
+        )
+    inicio = (pagina - 1) * n_linhas
+    legenda = f"Linhas {inicio + 1 if len(df_pag) else 0}–{inicio + len(df_pag)} de {total}"
+    if mostrar_payload():
+        legenda += " · " + orcamento.resumo_payload(tamanho, len(df_pag), orc['bytes'], unidade="linhas")
+    st.caption(legenda)
+
+# Só monta a tabela (e a envia ao navegador) com o expander aberto; abrir reroda só ela
+with st.expander("📋 Ver Tabela de Dados Completa", key="tabela_aberta", on_change=lambda: st.rerun('tabela')):
+    tabela_detalhes(dados)
+
+if not dados['relatorio'].empty:
+    with st.expander("📑 Relatório (aba de relatório achatada)"):
+        st.dataframe(
+            dados['relatorio'].assign(**{
+                col: conversores.formatar_reais(dados['relatorio'][col])
+                for col in validar_parser.COLS_MONETARIAS if col in dados['relatorio'].columns
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+# Conciliação Sigeo x Balancete (só com [conciliacao] sigeo configurado); abrir reroda só ela
+@st.fragment(key='conciliacao')
+@instrumentado('conciliacao')
+def tabela_conciliacao(dados):
+    if not st.session_state.get('conciliacao_aberta'):
+        return
+    divergencias = dados['conciliacao']
+    if 'erro' in divergencias.attrs:
+        st.error(f"Não foi possível ler o relatório do Sigeo: {divergencias.attrs['erro']}")
+        return
+    resumo = divergencias.attrs.get('resumo')
+    if not resumo:
+        st.info("Sem relatório achatado para conciliar.")
+        return
+    st.caption(
+        f"Chave: {', '.join(resumo['chaves'])} · {resumo['chaves_comparadas']} chaves, "
+        f"{resumo['conciliadas']} conciliadas · "
+        + " · ".join(f"{s}: {resumo[s]}" for s in conciliacao.SITUACOES if resumo[s])
+    )
+    if divergencias.empty:
+        st.success("Sigeo e balancete batem em todas as chaves.")
+        return
+
+    situacoes = st.multiselect("Situação", options=[s for s in conciliacao.SITUACOES if resumo[s]],
+                               key="conciliacao_situacoes")
+    if situacoes:
+        divergencias = divergencias[divergencias[conciliacao.COL_SITUACAO].isin(situacoes)]
+    # Mesmo orçamento de linhas da tabela de dados: o navegador não recebe milhares de divergências
+    n_linhas = ORCAMENTOS['tabela']['linhas']
+    with instrumentacao.span("st.dataframe", linhas=min(len(divergencias), n_linhas)):
+        st.dataframe(conciliacao.formatar_para_exibicao(divergencias.head(n_linhas)),
+                     use_container_width=True, hide_index=True)
+    if len(divergencias) > n_linhas:
+        st.caption(f"Mostrando {n_linhas} de {len(divergencias)} divergências (gere o arquivo completo com conciliacao.py).")
+
+if st.secrets.get("conciliacao", {}).get("sigeo"):
+    with st.expander("🧮 Conciliação Sigeo x Balancete", key="conciliacao_aberta",
+                     on_change=lambda: st.rerun('conciliacao')):
+        tabela_conciliacao(dados)
+
+# --- Painel de instrumentação (só admins: abra com ?admin=<chave_admin>) ---
+def eh_admin():
+    chave = config_instr.get("chave_admin")
+    return bool(chave) and st.query_params.get("admin") == chave
+
+def tabela_spans(registro):
+    return pd.DataFrame([{
+        'Estágio': "· " * s['profundidade'] + s['nome'],
+        'ms': s.get('ms'),
+        'Linhas': s.get('linhas'),
+        'Bytes': s.get('bytes'),
+        'Δ RSS (MB)': s.get('delta_rss_mb'),
+    } for s in registro['spans']])
+
+@st.fragment(key='instrumentacao')
+def painel_instrumentacao():
+    registros = instrumentacao.recentes()
+    st.button("Recarregar", key="instr_recarregar")  # reroda só este fragmento
+    if not registros:
+        st.caption("Nenhuma execução registrada ainda.")
+        return
+
+    # Execuções já finalizadas neste processo (todas as sessões), mais recente primeiro
+    recentes = registros[::-1][:50]
+    escolhido = st.selectbox(
+        "Execução", options=range(len(recentes)), key="instr_execucao",
+        format_func=lambda i: (f"{datetime.fromtimestamp(recentes[i]['quando']):%H:%M:%S} · "
+                               f"{recentes[i]['execucao']} · {recentes[i]['ms']:.0f} ms · "
+                               f"sessão {recentes[i].get('sessao', '-')}"),
     )
+    registro = recentes[escolhido]
+    st.dataframe(tabela_spans(registro), use_container_width=True, hide_index=True)
+    if registro['contadores']:
+        st.caption(" · ".join(f"{k}: {v}" for k, v in registro['contadores'].items()))
+
+    st.markdown("**Percentis por estágio (ms)**")
+    pct = pd.DataFrame.from_dict(instrumentacao.percentis(registros), orient='index')
+    st.dataframe(pct.sort_values('p95', ascending=False), use_container_width=True)
+
+    cache = get_cache_figuras().estatisticas()
+    st.caption(f"Cache de figuras: {cache['figuras']} figuras, {orcamento.formatar_bytes(cache['bytes'])}, "
+               f"{cache['acertos']} acertos / {cache['faltas']} faltas · "
+               f"aquecimento: {'em andamento' if aquecimento.duracao is None else f'{aquecimento.duracao:.2f} s'}"
+               f"{f' ({aquecimento.erro})' if aquecimento.erro else ''} · "
+               f"log JSON: {config_instr.get('log') or 'desligado'}")
+
+if instrumentacao.ativa() and eh_admin():
+    with st.expander("⏱️ Instrumentação (tempo e memória por estágio)"):
+        painel_instrumentacao()
+
+instrumentacao.finalizar(execucao_atual)
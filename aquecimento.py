@@ -0,0 +1,79 @@
+"""
+Pré-aquecimento da pilha de análise em segundo plano.
+
+O caminho de login só precisa do Streamlit e do gerenciador de cookies. Enquanto o
+formulário está na tela (ou enquanto a primeira carga de dados roda), uma thread
+importa pandas/pyarrow/Plotly/DuckDB e a camada de dados e monta uma figura mínima
+do Plotly Express, que na primeira chamada carrega templates e validadores. Só mexe
+em código: nenhum dado é lido antes da autenticação.
+
+Só leve a biblioteca padrão para o topo deste módulo: ele é importado antes do login.
+"""
+import importlib
+import threading
+import time
+
+# Na ordem em que o app precisa (pandas primeiro: quase todo o resto depende dele)
+MODULOS = [
+    "pandas",
+    "pyarrow",
+    "pyarrow.parquet",
+    "plotly.express",
+    "plotly.graph_objects",
+    "plotly.io",
+    "conversores",
+    "esquema",
+    "cubo",
+    "indice_filtros",
+    "orcamento",
+    "serie_temporal",
+    "cache_figuras",
+    "cache_compartilhado",
+    "consultas",
+    "snapshot_local",
+    "cliente_sheets",
+    "atualizador",
+    "validar_parser",
+    "conciliacao",
+    # Opcional (sem ele fica o backend pandas). O gspread fica de fora: só a thread
+    # do atualizador usa, e importá-lo (~0,3 s) aqui atrasaria o primeiro gráfico
+    "duckdb",
+]
+
+_lock = threading.Lock()
+_thread = None
+duracao = None   # segundos gastos no aquecimento (None enquanto não terminou)
+erro = None      # falha de import/aquecimento (o app importa de novo e mostra o erro de verdade)
+
+
+def _aquecer_plotly():
+    import pandas as pd
+    import plotly.express as px
+
+    px.bar(pd.DataFrame({'x': [1], 'y': [1]}), x='x', y='y').to_json()
+
+
+def aquecer():
+    """Importa a pilha de análise e aquece o Plotly Express (bloqueante)."""
+    global duracao, erro
+    inicio = time.perf_counter()
+    try:
+        for modulo in MODULOS:
+            try:
+                importlib.import_module(modulo)
+            except ImportError:
+                pass
+        _aquecer_plotly()
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+    duracao = time.perf_counter() - inicio
+
+
+def iniciar():
+    """Dispara `aquecer` numa thread de fundo, uma vez por processo (chamadas seguintes não fazem nada)."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=aquecer, name="cism-aquecimento", daemon=True)
+            _thread.start()
+    return _thread
@@ -0,0 +1,37 @@
+"""
+Utilitários de arquivo dos scripts de lote (processar_lote.py, analisar_schema.py):
+expansão das entradas da linha de comando e hash de conteúdo para as chaves de cache.
+Só biblioteca padrão: importar este módulo não puxa pandas/openpyxl.
+"""
+import glob
+import hashlib
+import os
+
+
+def listar_arquivos(entradas, extensoes):
+    """Expande diretórios e globs em uma lista ordenada e sem repetição de planilhas."""
+    arquivos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, f) for f in os.listdir(entrada)]
+        else:
+            candidatos = glob.glob(entrada)
+        for c in candidatos:
+            # Ignora os arquivos temporários de lock do Excel (~$arquivo.xlsx)
+            if c.lower().endswith(extensoes) and not os.path.basename(c).startswith('~$'):
+                arquivos.add(os.path.abspath(c))
+    return sorted(arquivos)
+
+
+def entradas_inexistentes(entradas):
+    """Entradas que não são diretório nem casam com nenhum caminho (nome errado, arquivo ausente)."""
+    return [e for e in entradas if not os.path.isdir(e) and not glob.glob(e)]
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """SHA-256 do conteúdo do arquivo (lido em blocos)."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
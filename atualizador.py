@@ -0,0 +1,122 @@
+import threading
+import time
+
+
+class Atualizador:
+    """
+    Stale-while-revalidate para o dataset do dashboard (um por processo).
+
+    Sempre serve o último dataset bom; uma thread de fundo recarrega os dados
+    `antecedencia` segundos antes de completar `intervalo` desde a última carga.
+    Se a recarga falhar, o dataset anterior continua no ar e o erro fica em `erro`.
+
+    `carregar()` retorna o dataset novo, ou (dataset, carregado_em) quando os dados
+    vêm prontos de outro lugar (ex.: versão publicada por outra réplica no cache
+    compartilhado) e a idade deve contar de quando foram buscados de fato.
+    `carregar_inicial()` (opcional) retorna (dataset, carregado_em) a partir de uma
+    fonte rápida e possivelmente velha, como o snapshot local, para não bloquear a
+    primeira sessão.
+    """
+
+    def __init__(self, carregar, carregar_inicial=None, intervalo=600, antecedencia=60):
+        self._carregar = carregar
+        self._carregar_inicial = carregar_inicial
+        self.intervalo = intervalo
+        self.antecedencia = antecedencia
+
+        self.dados = None
+        self.versao = 0
+        self.carregado_em = None   # time.time() da última carga bem-sucedida
+        self.duracao = None        # segundos gastos na última carga bem-sucedida
+        self.erro = None           # mensagem da última falha (None se a última deu certo)
+
+        self._lock_carga = threading.Lock()
+        self._lock_agendador = threading.Lock()
+        self._acordar = threading.Event()
+        self._agendador = None
+
+    # --- Consulta (usada pelas sessões) ---
+    @property
+    def idade(self):
+        """Segundos desde a última carga bem-sucedida (None se nunca carregou)."""
+        return None if self.carregado_em is None else time.time() - self.carregado_em
+
+    @property
+    def atualizando(self):
+        return self._lock_carga.locked()
+
+    def obter(self):
+        """
+        Dataset atual. Só bloqueia na primeira chamada do processo, e mesmo assim
+        tenta antes o `carregar_inicial` (ex.: snapshot local), revalidando em seguida.
+        Se a carga inicial falhar (snapshot corrompido, cache truncado...), o erro fica em
+        `erro` e a carga completa roda em seguida.
+        """
+        if self.dados is None:
+            with self._lock_carga:
+                if self.dados is None and self._carregar_inicial is not None:
+                    try:
+                        inicial = self._carregar_inicial()
+                    except Exception as e:
+                        self.erro = f"carga inicial: {e}"
+                        inicial = None
+                    if inicial is not None:
+                        self.dados, self.carregado_em = inicial
+                        # Se estiverem velhos, o agendador revalida logo em segundo plano
+                        self.versao += 1
+            if self.dados is None:
+                self._atualizar()
+        self._iniciar_agendador()
+        return self.dados
+
+    # --- Recarga ---
+    def atualizar_agora(self):
+        """Pede uma recarga em segundo plano (não bloqueia quem chamou nem as outras sessões)."""
+        self._iniciar_agendador()
+        self._acordar.set()
+
+    def _executar(self, funcao):
+        inicio = time.perf_counter()
+        try:
+            novos = funcao()
+        except Exception as e:
+            self.erro = str(e)
+            return False
+        if novos is None:
+            return False
+        carregado_em = time.time()
+        if isinstance(novos, tuple):
+            novos, carregado_em = novos
+        self.dados = novos
+        self.versao += 1
+        self.carregado_em = carregado_em
+        self.duracao = time.perf_counter() - inicio
+        self.erro = None
+        return True
+
+    def _atualizar(self):
+        # Uma recarga por vez; se já há uma em andamento, não empilha outra
+        if not self._lock_carga.acquire(blocking=self.dados is None):
+            return
+        try:
+            self._executar(self._carregar)
+        finally:
+            self._lock_carga.release()
+
+    def _iniciar_agendador(self):
+        # Sessões simultâneas: o lock garante uma thread agendadora só
+        with self._lock_agendador:
+            if self._agendador is None or not self._agendador.is_alive():
+                self._agendador = threading.Thread(target=self._loop, name="cism-atualizador", daemon=True)
+                self._agendador.start()
+
+    def _loop(self):
+        while True:
+            idade = self.idade if self.idade is not None else self.intervalo
+            espera = max(self.intervalo - self.antecedencia - idade, 0)
+            self._acordar.wait(timeout=espera)
+            self._acordar.clear()
+            self._atualizar()
+            if self.erro:
+                # Falhou: tenta de novo em 1 minuto em vez de martelar a API
+                self._acordar.wait(timeout=60)
@@ -0,0 +1,210 @@
+"""
+Suíte de benchmarks do dashboard e do parser, sobre dados sintéticos (gerar_dados.py).
+
+Mede tempo (melhor de N repetições) e pico de memória (tracemalloc, numa execução à parte) de:
+    cism.preparar_dados        pós-processamento do load_data (conversões + schema)
+    cism.cubo_indice           construção do cubo e do índice de filtros
+    filtros                    bloco de filtros (fatiar o cubo + ids do índice) em várias combinações
+    grafico.*                  KPIs e a agregação de cada gráfico (Sankey, Top Fontes, Composição, Evolução)
+    parser.processar_dataframe lógica V3 + limpeza sobre o balancete já em memória
+    parser.processar_relatorio leitura do .xlsx + parser (só até --max-xlsx linhas)
+    conciliacao                balancete processado x consolidado Sigeo sintético (conciliacao.py)
+
+Uso:
+    python benchmark.py --tamanhos 10000 100000 --saida bench.json
+    python benchmark.py --tamanhos 10000 100000 --base bench.json --limite 0.2   # falha (exit 1) se regredir
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import conciliacao
+import consultas
+import cubo
+import esquema
+import gerar_dados
+import indice_filtros
+import orcamento
+import serie_temporal
+import validar_parser
+
+DIR_DADOS = os.path.join(".cache_cism", "bench")
+
+# Diferenças abaixo disso são ruído de medição, não regressão
+TOLERANCIA_SEGUNDOS = 0.01
+TOLERANCIA_MB = 1.0
+
+
+def medir(funcao, repeticoes=5):
+    """(melhor tempo em s, pico de memória em MB) de `funcao()`; a saída impressa é descartada."""
+    tempos = []
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcao()
+        _atual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(tempos), pico / 2**20
+
+
+def _balancete_xlsx(n, seed):
+    os.makedirs(DIR_DADOS, exist_ok=True)
+    caminho = os.path.join(DIR_DADOS, f"balancete_{n}_{seed}.xlsx")
+    if not os.path.exists(caminho):
+        gerar_dados.gravar_excel(gerar_dados.gerar_balancete(n, seed=seed), caminho)
+    return caminho
+
+
+# --- Casos ---
+def casos_cism(n, seed):
+    """(nome, função) dos casos do dashboard para uma aba CISM de `n` linhas."""
+    bruto = gerar_dados.gerar_cism(n, seed=seed)
+    df = esquema.preparar_dados(bruto.copy())
+    cubo_df = cubo.construir_cubo(df)
+    indice = indice_filtros.IndiceFiltros(df, cubo.DIMENSOES)
+    backend = consultas.BackendPandas(df, cubo_df, indice)
+    orc = orcamento.ORCAMENTO_PADRAO
+
+    # Combinações típicas: sem filtro, um ano, duas fontes + status, um projeto
+    anos = esquema.opcoes_filtro(df, 'ano')
+    fontes = esquema.opcoes_filtro(df, 'Fonte')
+    combinacoes = [
+        {},
+        {'ano': anos[-1:]},
+        {'Fonte': fontes[:2], 'status': ['Pago']},
+        {'Projeto': esquema.opcoes_filtro(df, 'Projeto')[:1], 'ano': anos[-3:]},
+    ]
+
+    def filtros():
+        for filtro in combinacoes:
+            cubo.fatiar(cubo_df, filtro)
+            indice.ids(filtro)
+
+    q = backend.fatia({'ano': anos[-1:]})
+    return [
+        ("cism.preparar_dados", lambda: esquema.preparar_dados(bruto.copy())),
+        ("cism.cubo_indice", lambda: (cubo.construir_cubo(df), indice_filtros.IndiceFiltros(df, cubo.DIMENSOES))),
+        ("cism.serie_temporal", lambda: serie_temporal.SerieTemporal(cubo_df)),
+        ("filtros", filtros),
+        ("grafico.kpis", q.kpis),
+        ("grafico.sankey", lambda: orcamento.top_k(q.somar_por(['Fonte', 'Projeto']),
+                                                  {'Fonte': orc['sankey']['fontes'], 'Projeto': orc['sankey']['projetos']})),
+        ("grafico.top_fontes", lambda: orcamento.top_k(q.somar_por(['Fonte']), {'Fonte': orc['top_fontes']['barras']})),
+        ("grafico.composicao", lambda: orcamento.top_k(q.somar_por(['Projeto', 'Fonte']),
+                                                      {'Projeto': orc['composicao']['projetos'], 'Fonte': orc['composicao']['fontes']})),
+        ("grafico.evolucao", lambda: orcamento.ajustar_granularidade(q.serie_mensal(), orc['evolucao']['pontos'])),
+        ("grafico.evolucao_acumulado", lambda: orcamento.ajustar_granularidade(
+            backend.serie.serie(combinacoes[2]), orc['evolucao']['pontos'], {'Acumulado': 'last'})),
+    ]
+
+
+def casos_parser(n, seed, max_xlsx):
+    bruto = gerar_dados.gerar_balancete(n, seed=seed)
+    casos = [("parser.processar_dataframe", lambda: validar_parser.processar_dataframe(bruto.copy()))]
+    if n <= max_xlsx:
+        caminho = _balancete_xlsx(n, seed)
+        casos.append(("parser.processar_relatorio", lambda: validar_parser.processar_relatorio(caminho, "Planilha1")))
+    with contextlib.redirect_stdout(io.StringIO()):
+        relatorio = validar_parser.processar_dataframe(bruto.copy())
+    sigeo = conciliacao.preparar_sigeo(gerar_dados.gerar_sigeo(relatorio, seed=seed))
+    casos.append(("conciliacao", lambda: conciliacao.conciliar(relatorio, sigeo)))
+    return casos
+
+
+def rodar(tamanhos, seed=0, repeticoes=5, max_xlsx=200_000, somente=None):
+    resultados = []
+    for n in tamanhos:
+        for gerar_casos in (lambda: casos_cism(n, seed), lambda: casos_parser(n, seed, max_xlsx)):
+            for nome, funcao in gerar_casos():
+                if somente and not any(nome.startswith(s) for s in somente):
+                    continue
+                segundos, pico_mb = medir(funcao, repeticoes)
+                resultados.append({'caso': nome, 'linhas': n, 'segundos': round(segundos, 6), 'pico_mb': round(pico_mb, 2)})
+                print(f"{nome:<30} {n:>9} linhas {segundos * 1000:10.1f} ms {pico_mb:9.1f} MB", flush=True)
+    return resultados
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparar(resultados, base, limite):
+    """Lista de regressões (texto) em relação a `base`: tempo ou pico de memória acima de (1 + limite)x."""
+    anteriores = {(r['caso'], r['linhas']): r for r in base.get('resultados', [])}
+    regressoes = []
+    for r in resultados:
+        antes = anteriores.get((r['caso'], r['linhas']))
+        if antes is None:
+            continue
+        for campo, unidade, tolerancia in (('segundos', 's', TOLERANCIA_SEGUNDOS), ('pico_mb', 'MB', TOLERANCIA_MB)):
+            if r[campo] > antes[campo] * (1 + limite) and r[campo] - antes[campo] > tolerancia:
+                regressoes.append(f"{r['caso']} ({r['linhas']} linhas): {campo} {antes[campo]:.4g} -> "
+                                  f"{r[campo]:.4g} {unidade} (+{r[campo] / antes[campo] - 1:.0%})")
+    return regressoes
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, filtros, agregações e parser sobre dados sintéticos.")
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=[10_000, 100_000],
+                        help="Linhas geradas (ex.: 10000 100000 1000000 5000000)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Repetições por caso (vale o melhor tempo)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-xlsx", type=int, default=200_000,
+                        help="Maior tamanho para o caso com leitura de .xlsx (gerar o arquivo é lento)")
+    parser.add_argument("--casos", nargs="+", default=None, help="Só os casos com estes prefixos (ex.: grafico parser)")
+    parser.add_argument("--saida", default="benchmark_resultados.json", help="JSON com os resultados")
+    parser.add_argument("--base", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.2, help="Piora tolerada antes de falhar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resultados = rodar(args.tamanhos, seed=args.seed, repeticoes=args.repeticoes,
+                       max_xlsx=args.max_xlsx, somente=args.casos)
+    saida = {
+        'meta': {
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _commit_atual(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'repeticoes': args.repeticoes,
+        },
+        'resultados': resultados,
+    }
+
+    regressoes = []
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            regressoes = comparar(resultados, json.load(f), args.limite)
+        saida['regressoes'] = regressoes
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em '{args.saida}'.")
+
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima de {args.limite:.0%}:")
+        for r in regressoes:
+            print(f"  X {r}")
+        sys.exit(1)
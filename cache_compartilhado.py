@@ -0,0 +1,184 @@
+"""
+Cache em disco do dataset compartilhado entre processos (réplicas do Streamlit na mesma máquina
+ou com o mesmo volume montado).
+
+Cada versão é um conjunto de arquivos Arrow IPC sem compressão (`<frame>_<versao>.arrow`:
+frame tipado, cubo, relatório...) mais o ponteiro `atual.json` com o carimbo da versão.
+Os arquivos são abertos com memory-map: as páginas ficam no cache do sistema operacional,
+uma cópia só para todas as réplicas, e colunas numéricas sem nulos viram DataFrame sem cópia.
+
+Quem publica segura a trava de arquivo `atualizacao.lock`: numa rodada de atualização só uma
+réplica busca no Sheets; as outras esperam a trava e mapeiam a versão que ela publicou.
+"""
+import contextlib
+import json
+import os
+import re
+import time
+
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DIR_PADRAO = os.path.join(".cache_cism", "compartilhado")
+ARQUIVO_ATUAL = "atual.json"
+ARQUIVO_TRAVA = "atualizacao.lock"
+
+# Versões antigas mantidas em disco (réplicas que ainda não trocaram de versão leem delas)
+VERSOES_MANTIDAS = 2
+
+
+def _travar(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+
+
+def _destravar(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _json_valor(valor):
+    """Escalares do numpy (ex.: contagens em df.attrs) -> tipos nativos do JSON."""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    raise TypeError(f"Valor não serializável em df.attrs: {valor!r}")
+
+
+class CacheCompartilhado:
+    """
+    Versões do dataset ({nome: DataFrame}) publicadas em `diretorio`. Uma instância por
+    processo: `versao_local` é a versão que este processo está servindo.
+    """
+
+    def __init__(self, diretorio=DIR_PADRAO):
+        self.diretorio = diretorio
+        self.versao_local = None
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    @contextlib.contextmanager
+    def trava(self):
+        """Trava exclusiva entre processos (bloqueia até conseguir)."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(self._caminho(ARQUIVO_TRAVA), "a+b") as f:
+            _travar(f)
+            try:
+                yield
+            finally:
+                _destravar(f)
+
+    # --- Leitura ---
+    def publicado(self):
+        """Metadados da versão atual ({'versao', 'carregado_em', 'frames', ...}) ou None."""
+        try:
+            with open(self._caminho(ARQUIVO_ATUAL), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def abrir(self, meta):
+        """{nome: DataFrame} da versão `meta`, lidos por memory-map (sem copiar o arquivo para o heap)."""
+        frames = {}
+        for nome, arquivo in meta['frames'].items():
+            with pa.memory_map(self._caminho(arquivo)) as origem:
+                tabela = pa.ipc.open_file(origem).read_all()
+            df = tabela.to_pandas(split_blocks=True)
+            df.attrs.update(meta.get('attrs', {}).get(nome, {}))
+            frames[nome] = df
+        return frames
+
+    def abrir_atual(self):
+        """(frames, meta) da versão publicada, sem buscar nada; None se não houver (ou se sumiu no meio)."""
+        meta = self.publicado()
+        if meta is None:
+            return None
+        try:
+            frames = self.abrir(meta)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        self.versao_local = meta['versao']
+        return frames, meta
+
+    # --- Escrita ---
+    def publicar(self, frames, versao=None, **extras):
+        """
+        Grava os frames como versão nova e só então troca o ponteiro `atual.json`
+        (quem lê vê a versão velha inteira ou a nova inteira). Chame com a trava.
+        """
+        versao = versao or time.time_ns()
+        os.makedirs(self.diretorio, exist_ok=True)
+        arquivos = {}
+        for nome, df in frames.items():
+            arquivo = f"{nome}_{versao}.arrow"
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            tmp = self._caminho(f"{arquivo}.{os.getpid()}.tmp")
+            with pa.OSFile(tmp, "wb") as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+            os.replace(tmp, self._caminho(arquivo))
+            arquivos[nome] = arquivo
+
+        meta = {
+            'versao': versao,
+            'carregado_em': time.time(),
+            'frames': arquivos,
+            'attrs': {nome: df.attrs for nome, df in frames.items() if df.attrs},
+            **extras,
+        }
+        tmp = self._caminho(f"{ARQUIVO_ATUAL}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=_json_valor)
+        os.replace(tmp, self._caminho(ARQUIVO_ATUAL))
+        self._descartar_antigas()
+        return meta
+
+    def _descartar_antigas(self):
+        versoes = {}
+        for arquivo in os.listdir(self.diretorio):
+            m = re.fullmatch(r".+_(\d+)\.arrow", arquivo)
+            if m:
+                versoes.setdefault(int(m.group(1)), []).append(arquivo)
+        for versao in sorted(versoes)[:-VERSOES_MANTIDAS]:
+            for arquivo in versoes[versao]:
+                try:
+                    os.remove(self._caminho(arquivo))
+                except OSError:
+                    pass  # Windows: ainda mapeado por outra réplica; sai na próxima limpeza
+
+    # --- Carga coordenada ---
+    def carregar(self, buscar):
+        """
+        (frames, meta) da versão mais nova entre as réplicas.
+
+        Se já há versão publicada diferente da que este processo serve, só mapeia. Senão
+        (nenhuma versão, ou a publicada é a nossa e está sendo revalidada), disputa a
+        trava: quem ganha chama `buscar()` -> {nome: DataFrame} e publica; quem esperou
+        encontra a versão nova ao entrar e só mapeia.
+        """
+        meta = self.publicado()
+        if meta is None or meta['versao'] == self.versao_local:
+            with self.trava():
+                meta = self.publicado()
+                if meta is None or meta['versao'] == self.versao_local:
+                    inicio = time.perf_counter()
+                    frames = buscar()
+                    meta = self.publicar(frames, duracao=time.perf_counter() - inicio, pid=os.getpid())
+        frames = self.abrir(meta)
+        self.versao_local = meta['versao']
+        return frames, meta
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+import instrumentacao
+import orcamento
+
+
+def normalizar_filtros(filtros):
+    """
+    {dimensão: seleção} -> chave canônica: dimensões em ordem fixa, valores sem
+    repetição e ordenados, dimensões sem seleção de fora. Mesma fatia = mesma chave,
+    não importa a ordem em que o usuário clicou.
+    """
+    return tuple(
+        (dim, tuple(sorted({str(v) for v in selecao})))
+        for dim, selecao in sorted(filtros.items())
+        if selecao
+    )
+
+
+class CacheFiguras:
+    """
+    Figuras Plotly já serializadas (JSON), compartilhadas por todas as sessões do processo,
+    cada uma com os pontos contados ao montar (o JSON guarda os arrays numéricos como
+    {"dtype", "bdata"}, e a figura desserializada não dá mais a contagem por len).
+
+    Chave: (figura, filtros normalizados) dentro de uma versão do dataset. Quando chega
+    um pedido com versão mais nova, tudo da versão anterior é descartado de uma vez.
+    O total guardado respeita `limite_bytes`, expulsando as figuras usadas há mais tempo.
+    """
+
+    def __init__(self, limite_bytes=64 * 2**20):
+        self.limite_bytes = limite_bytes
+        self.versao = None
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+
+        self._figuras = OrderedDict()   # chave -> (JSON da figura, pontos) (ordem = uso, mais antiga primeiro)
+        self._lock = threading.Lock()
+
+    def _descartar_ate(self, limite):
+        while self._figuras and self.bytes > limite:
+            _chave, (spec, _pontos) = self._figuras.popitem(last=False)
+            self.bytes -= len(spec)
+
+    def obter(self, nome, versao, filtros, construir):
+        """
+        (figura, bytes do JSON, pontos) de `nome` para os filtros na versão `versao` do dataset.
+        Na falta, chama `construir()`, que pode devolver None quando não há o que
+        desenhar (resposta (None, 0, 0), não fica em cache).
+        """
+        chave = (nome, normalizar_filtros(filtros))
+        with self._lock:
+            if self.versao is None or versao > self.versao:
+                # Snapshot novo: as figuras da versão anterior não servem mais
+                self._figuras.clear()
+                self.bytes = 0
+                self.versao = versao
+            guardada = self._figuras.get(chave) if versao == self.versao else None
+            if guardada is not None:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+        if guardada is not None:
+            spec, pontos = guardada
+            instrumentacao.contar('cache_figuras.acertos')
+            with instrumentacao.span("plotly.desserializar", bytes=len(spec)):
+                return pio.from_json(spec, skip_invalid=True), len(spec), pontos
+        instrumentacao.contar('cache_figuras.faltas')
+
+        # Constrói fora do lock: outras sessões continuam servindo do cache
+        with instrumentacao.span("plotly.construir"):
+            fig = construir()
+        if fig is None:
+            return None, 0, 0
+        pontos = orcamento.contar_pontos(fig)
+        with instrumentacao.span("plotly.serializar") as s:
+            spec = fig.to_json()
+            s.anotar(bytes=len(spec))
+        with self._lock:
+            # Sessão ainda numa versão velha (ou figura maior que o orçamento): entrega sem guardar
+            if versao == self.versao and len(spec) <= self.limite_bytes and chave not in self._figuras:
+                self._figuras[chave] = (spec, pontos)
+                self.bytes += len(spec)
+                self._descartar_ate(self.limite_bytes)
+        return fig, len(spec), pontos
+
+    def estatisticas(self):
+        with self._lock:
+            return {'figuras': len(self._figuras), 'bytes': self.bytes,
+                    'acertos': self.acertos, 'faltas': self.faltas}
@@ -0,0 +1,106 @@
+"""
+Acesso ao Google Sheets compartilhado pelo processo inteiro:
+cliente gspread autenticado uma vez (token reaproveitado), planilha aberta uma vez,
+todas as faixas de uma carga em uma única chamada batch e backoff exponencial em erro de quota.
+"""
+import os
+import random
+import threading
+import time
+
+# Variável de ambiente que aponta para um .xlsx local usado no lugar do Google Sheets (ver sheets_falso.py)
+VAR_SHEETS_FALSO = "CISM_SHEETS_FALSO"
+
+# Erros que valem nova tentativa: quota (429) e instabilidades do lado do Google (5xx)
+STATUS_REPETIR = {429, 500, 502, 503, 504}
+
+# Segundos até a lista de abas ser relida: abas criadas/renomeadas aparecem sem reiniciar o processo
+TTL_ABAS = 600
+
+_lock = threading.Lock()
+_clientes = {}    # client_email -> gspread.Client
+_planilhas = {}   # (client_email, sheet_id) -> FonteSheets
+
+
+def _status_http(erro):
+    """Código HTTP de um erro do gspread (APIError.code) ou do Sheets falso."""
+    codigo = getattr(erro, 'code', None)
+    if codigo is None and getattr(erro, 'response', None) is not None:
+        codigo = getattr(erro.response, 'status_code', None)
+    return codigo
+
+
+def com_backoff(funcao, *args, tentativas=5, espera_inicial=1.0, espera_max=32.0, **kwargs):
+    """Chama `funcao` repetindo com backoff exponencial (+ jitter) em 429/5xx."""
+    for tentativa in range(tentativas):
+        try:
+            return funcao(*args, **kwargs)
+        except Exception as e:
+            if _status_http(e) not in STATUS_REPETIR or tentativa == tentativas - 1:
+                raise
+            espera = min(espera_inicial * 2 ** tentativa, espera_max)
+            time.sleep(espera + random.uniform(0, espera / 2))
+
+
+def citar_aba(aba):
+    """Nome de aba em notação A1 ('Minha Aba'), com aspas simples escapadas."""
+    return "'" + aba.replace("'", "''") + "'"
+
+
+class FonteSheets:
+    """
+    Planilha aberta + títulos das abas (relidos a cada `ttl_abas` segundos). `buscar(faixas)`
+    traz várias faixas A1 numa única requisição (values_batch_get) e devolve uma lista de
+    linhas por faixa. Funciona com um gspread.Spreadsheet ou com o `sheets_falso.PlanilhaFalsa`.
+    """
+
+    def __init__(self, planilha, ttl_abas=TTL_ABAS):
+        self.planilha = planilha
+        self.ttl_abas = ttl_abas
+        self._ler_abas()
+
+    def _ler_abas(self):
+        self._abas = [ws.title for ws in com_backoff(self.planilha.worksheets)]
+        self._abas_lidas_em = time.monotonic()
+
+    @property
+    def abas(self):
+        if time.monotonic() - self._abas_lidas_em > self.ttl_abas:
+            self._ler_abas()
+        return self._abas
+
+    def escolher_aba(self, preferida, padrao="CISM"):
+        return preferida if preferida in self.abas else padrao
+
+    def buscar(self, faixas):
+        resposta = com_backoff(self.planilha.values_batch_get, list(faixas))
+        return [faixa.get('values', []) for faixa in resposta.get('valueRanges', [])]
+
+
+def _chave(creds, sheet_id):
+    caminho_falso = os.environ.get(VAR_SHEETS_FALSO)
+    return (creds.get('client_email', '') if caminho_falso is None else caminho_falso, sheet_id)
+
+
+def obter_fonte(creds, sheet_id):
+    """
+    FonteSheets do processo para (conta de serviço, planilha): autentica e abre a
+    planilha só na primeira vez. Com CISM_SHEETS_FALSO definido, usa o Sheets falso local.
+    """
+    caminho_falso = os.environ.get(VAR_SHEETS_FALSO)
+    chave = _chave(creds, sheet_id)
+
+    with _lock:
+        if chave not in _planilhas:
+            if caminho_falso is not None:
+                import sheets_falso
+                planilha = sheets_falso.PlanilhaFalsa.de_excel(caminho_falso)
+            else:
+                import gspread
+                email = creds.get('client_email', '')
+                if email not in _clientes:
+                    _clientes[email] = gspread.service_account_from_dict(dict(creds))
+                planilha = com_backoff(_clientes[email].open_by_key, sheet_id)
+            _planilhas[chave] = FonteSheets(planilha)
+        return _planilhas[chave]
+
@@ -0,0 +1,299 @@
+"""
+Conciliação Sigeo x Balancete: compara o balancete achatado (`processar_relatorio` /
+`processar_lote`) com o relatório consolidado do Sigeo.
+
+Chave: (Projeto, Conta Corrente, Alínea) e, se os dois lados tiverem, o Período. Colunas
+de chave que o consolidado não traz (ex.: sem Conta Corrente) saem da chave e o balancete
+é somado no nível do consolidado.
+
+Cada coluna de chave vira um índice hash (pd.factorize) sobre os dois lados de uma vez;
+a normalização (código do projeto, espaços, "123.0") roda só nos valores distintos. Os
+códigos se combinam numa chave int64 e os totais por chave saem de np.bincount: sem merge
+linha a linha nem loops em Python, milhões de linhas em poucos segundos.
+
+Uso:
+    python conciliacao.py balancetes_consolidados.parquet "Relatório Sigeo .xlsx" --saida divergencias.xlsx
+    python conciliacao.py balancete.xlsx sigeo.csv --aba-balancete Planilha1 --tolerancia 1
+"""
+import argparse
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from conversores import converter_centavos, formatar_reais
+from validar_parser import processar_relatorio
+
+CHAVES = ["Projeto", "Conta Corrente", "Alínea"]
+COL_PERIODO = "Período"
+COLS_CONCILIADAS = ["Valor Concedido", "Valor Pago", "Saldo Projeto"]
+
+COL_SITUACAO = "Situação"
+DIVERGENTE = "Valor divergente"
+SO_BALANCETE = "Só no balancete"
+SO_SIGEO = "Só no Sigeo"
+PROJETO_SO_BALANCETE = "Projeto só no balancete"
+PROJETO_SO_SIGEO = "Projeto só no Sigeo"
+SITUACOES = [DIVERGENTE, SO_BALANCETE, SO_SIGEO, PROJETO_SO_BALANCETE, PROJETO_SO_SIGEO]
+
+# Cabeçalhos do consolidado (sem acento, minúsculos) -> nome usado no balancete
+_SINONIMOS = {
+    "projeto": "Projeto",
+    "cod projeto": "Projeto",
+    "codigo projeto": "Projeto",
+    "conta corrente": "Conta Corrente",
+    "conta": "Conta Corrente",
+    "alinea": "Alínea",
+    "valor concedido": "Valor Concedido",
+    "concedido": "Valor Concedido",
+    "valor pago": "Valor Pago",
+    "pago": "Valor Pago",
+    "saldo projeto": "Saldo Projeto",
+    "saldo do projeto": "Saldo Projeto",
+    "periodo": COL_PERIODO,
+    "competencia": COL_PERIODO,
+}
+
+
+def _sem_acento(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def _chave_cabecalho(nome):
+    return re.sub(r"[^a-z0-9]+", " ", _sem_acento(nome)).strip()
+
+
+# --- Normalização dos valores de chave (aplicada só aos valores distintos) ---
+def _sem_zeros_a_esquerda(texto):
+    # Códigos puramente numéricos: "000123", "123" e 123.0 (Excel leu como número) são o mesmo
+    return texto.str.replace(r"^0*(\d+?)(?:\.0)?$", r"\1", regex=True)
+
+
+def _normalizar_texto(distintos):
+    texto = distintos.astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.upper()
+    return _sem_zeros_a_esquerda(texto)
+
+
+def _normalizar_projeto(distintos):
+    """'000123 - Nome do projeto', '000123' e 123 viram o mesmo código; sem código, o texto normalizado."""
+    texto = distintos.astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.upper()
+    return _sem_zeros_a_esquerda(texto.str.replace(r"^(\d[\d./]*)\s*-.*$", r"\1", regex=True))
+
+
+_NORMALIZADORES = {"Projeto": _normalizar_projeto}
+
+
+# --- Leitura do consolidado do Sigeo ---
+def _achar_cabecalho(df_raw, max_linhas=20):
+    """Relatórios do Sigeo às vezes têm linhas de título antes do cabeçalho: acha a linha com 'Projeto'."""
+    for i, linha in enumerate(df_raw.head(max_linhas).itertuples(index=False)):
+        if any(_SINONIMOS.get(_chave_cabecalho(c)) == "Projeto" for c in linha if pd.notna(c)):
+            df = df_raw.iloc[i + 1:].reset_index(drop=True)
+            df.columns = [str(c).strip() if pd.notna(c) else f"Unnamed: {j}" for j, c in enumerate(linha)]
+            return df
+    return None
+
+
+def preparar_sigeo(df):
+    """
+    Consolidado do Sigeo (como lido da planilha/CSV) -> colunas com os nomes do balancete
+    e valores em centavos (Int64). Falha se não houver coluna de Projeto.
+    """
+    renomear = {c: _SINONIMOS[_chave_cabecalho(c)] for c in df.columns if _chave_cabecalho(c) in _SINONIMOS}
+    if "Projeto" not in renomear.values():
+        achado = _achar_cabecalho(df)
+        if achado is None:
+            raise ValueError(f"Coluna de Projeto não encontrada no relatório do Sigeo. Colunas: {list(df.columns)}")
+        return preparar_sigeo(achado)
+
+    # Primeira coluna de cada nome canônico (ex.: 'Conta' e 'Conta Corrente' no mesmo arquivo)
+    usadas = {}
+    for original, canonico in renomear.items():
+        usadas.setdefault(canonico, original)
+    df = df[list(usadas.values())].rename(columns={v: k for k, v in usadas.items()})
+    df = df[df["Projeto"].notna()].reset_index(drop=True)
+
+    for col in COLS_CONCILIADAS:
+        if col in df.columns and df[col].dtype != "Int64":
+            df[col], falhas = converter_centavos(df[col])
+            if falhas:
+                print(f"Aviso: {falhas} valores não convertidos em '{col}' (Sigeo).")
+    return df
+
+
+def ler_sigeo(caminho, aba=0):
+    """Lê o consolidado do Sigeo (.xlsx, .csv ou .parquet) e aplica `preparar_sigeo`."""
+    if caminho.lower().endswith(".parquet"):
+        df = pd.read_parquet(caminho)
+    elif caminho.lower().endswith(".csv"):
+        # Texto puro: "1.234,56" e códigos com zeros à esquerda chegam intactos
+        df = pd.read_csv(caminho, sep=None, engine="python", dtype=str)
+    else:
+        df = pd.read_excel(caminho, sheet_name=aba)
+    return preparar_sigeo(df)
+
+
+def ler_balancete(caminho, aba="Planilha1"):
+    """Balancete achatado: Parquet consolidado do processar_lote ou um .xlsx pelo processar_relatorio."""
+    if caminho.lower().endswith(".parquet"):
+        return pd.read_parquet(caminho)
+    return processar_relatorio(caminho, aba)
+
+
+# --- Conciliação ---
+def _indexar(balancete, sigeo, col):
+    """
+    (ids por linha dos dois lados concatenados, nº de ids) para a coluna `col`. Valores
+    que normalizam igual ('000123 - X' e '000123') recebem o mesmo id; nulos ficam com id próprio.
+    """
+    valores = pd.concat([balancete[col], sigeo[col]], ignore_index=True)
+    codigos, distintos = pd.factorize(valores)
+    normalizar = _NORMALIZADORES.get(col, _normalizar_texto)
+    ids_distintos, rotulos = pd.factorize(normalizar(pd.Series(distintos, dtype=object)))
+    ids = np.where(codigos >= 0, ids_distintos[codigos], len(rotulos))
+    return ids.astype(np.int64), len(rotulos) + 1
+
+
+def _somar(ids, valores, n):
+    """Soma por id em int64 (exata até ~R$ 90 trilhões por chave, limite do acumulador float64)."""
+    return np.rint(np.bincount(ids, weights=valores.fillna(0).to_numpy(dtype=np.float64), minlength=n)).astype(np.int64)
+
+
+def conciliar(balancete, sigeo, colunas=COLS_CONCILIADAS, tolerancia=0):
+    """
+    Compara os totais por chave e devolve a tabela de divergências (uma linha por chave com
+    problema): colunas de chave, `Situação` e, por coluna de valor, Balancete / Sigeo /
+    Diferença em centavos. `tolerancia` é a diferença (em centavos) aceita sem divergência.
+
+    df.attrs['resumo'] traz as chaves usadas, as colunas comparadas e as contagens por situação.
+    """
+    chaves = [c for c in CHAVES + [COL_PERIODO] if c in balancete.columns and c in sigeo.columns]
+    if "Projeto" not in chaves:
+        raise ValueError("Os dois lados precisam da coluna 'Projeto'.")
+    colunas = [c for c in colunas if c in balancete.columns and c in sigeo.columns]
+    if not colunas:
+        raise ValueError(f"Nenhuma coluna de valor em comum para conciliar (esperadas: {COLS_CONCILIADAS}).")
+
+    n_bal, n_total = len(balancete), len(balancete) + len(sigeo)
+    ids_por_chave = {col: _indexar(balancete, sigeo, col) for col in chaves}
+
+    # Chave composta: ids de cada coluna em base mista -> int64 -> id denso de 0 a K-1
+    composta = np.zeros(n_total, dtype=np.int64)
+    for ids, n in ids_por_chave.values():
+        composta = composta * n + ids
+    chave, unicas = pd.factorize(composta)
+    k = len(unicas)
+    lado_bal, lado_sig = chave[:n_bal], chave[n_bal:]
+
+    em_bal = np.bincount(lado_bal, minlength=k) > 0
+    em_sig = np.bincount(lado_sig, minlength=k) > 0
+
+    # Projeto de cada chave e presença do projeto em cada lado (projetos órfãos)
+    ids_projeto, n_projetos = ids_por_chave["Projeto"]
+    projeto_da_chave = np.empty(k, dtype=np.int64)
+    projeto_da_chave[chave] = ids_projeto
+    projeto_em_bal = (np.bincount(ids_projeto[:n_bal], minlength=n_projetos) > 0)[projeto_da_chave]
+    projeto_em_sig = (np.bincount(ids_projeto[n_bal:], minlength=n_projetos) > 0)[projeto_da_chave]
+
+    totais = {}
+    divergente = np.zeros(k, dtype=bool)
+    for col in colunas:
+        tot_bal = _somar(lado_bal, balancete[col], k)
+        tot_sig = _somar(lado_sig, sigeo[col], k)
+        divergente |= np.abs(tot_bal - tot_sig) > tolerancia
+        totais[col] = (tot_bal, tot_sig)
+
+    situacao = np.full(k, None, dtype=object)
+    situacao[em_bal & em_sig & divergente] = DIVERGENTE
+    situacao[em_bal & ~em_sig] = np.where(projeto_em_sig[em_bal & ~em_sig], SO_BALANCETE, PROJETO_SO_BALANCETE)
+    situacao[~em_bal & em_sig] = np.where(projeto_em_bal[~em_bal & em_sig], SO_SIGEO, PROJETO_SO_SIGEO)
+    problemas = np.flatnonzero(situacao != None)  # noqa: E711 (comparação elemento a elemento)
+
+    # Rótulos: valor original da primeira linha da chave (do balancete, quando existir)
+    primeira = np.full(k, n_total, dtype=np.int64)
+    np.minimum.at(primeira, chave, np.arange(n_total))
+    linhas = primeira[problemas]
+    do_bal = linhas < n_bal
+    saida = {}
+    for col in chaves:
+        rotulos = np.empty(len(linhas), dtype=object)
+        rotulos[do_bal] = balancete[col].iloc[linhas[do_bal]].to_numpy(dtype=object)
+        rotulos[~do_bal] = sigeo[col].iloc[linhas[~do_bal] - n_bal].to_numpy(dtype=object)
+        saida[col] = pd.Series(rotulos, dtype=object).astype("str")   # texto nos dois lados (Arrow/exibição)
+    saida[COL_SITUACAO] = situacao[problemas]
+    for col, (tot_bal, tot_sig) in totais.items():
+        bal = pd.array(tot_bal[problemas], dtype="Int64")
+        sig = pd.array(tot_sig[problemas], dtype="Int64")
+        bal[~em_bal[problemas]] = pd.NA
+        sig[~em_sig[problemas]] = pd.NA
+        saida[f"{col} (Balancete)"] = bal
+        saida[f"{col} (Sigeo)"] = sig
+        saida[f"{col} (Diferença)"] = pd.array(tot_bal[problemas] - tot_sig[problemas], dtype="Int64")
+
+    divergencias = pd.DataFrame(saida).sort_values(chaves, key=lambda s: s.astype(str), kind="stable")
+    divergencias = divergencias.reset_index(drop=True)
+    contagem = pd.Series(situacao[problemas]).value_counts()
+    divergencias.attrs['resumo'] = {
+        'chaves': chaves,
+        'colunas': colunas,
+        'chaves_comparadas': int(k),
+        'conciliadas': int(k - len(problemas)),
+        **{s: int(contagem.get(s, 0)) for s in SITUACOES},
+    }
+    return divergencias
+
+
+def resumo_por_projeto(divergencias):
+    """Uma linha por projeto com problema: quantas chaves em cada situação e a diferença total por coluna."""
+    if divergencias.empty:
+        return pd.DataFrame()
+    contagens = pd.crosstab(divergencias["Projeto"], divergencias[COL_SITUACAO])
+    diferencas = divergencias.groupby("Projeto")[[c for c in divergencias.columns if c.endswith("(Diferença)")]].sum()
+    return contagens.join(diferencas).reset_index()
+
+
+def formatar_para_exibicao(divergencias):
+    """Centavos -> "R$ 1.234,56" nas colunas de valor (dashboard e exportação)."""
+    return divergencias.assign(**{
+        col: formatar_reais(divergencias[col])
+        for col in divergencias.columns if col.endswith(("(Balancete)", "(Sigeo)", "(Diferença)"))
+    })
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concilia o relatório consolidado do Sigeo com o balancete.")
+    parser.add_argument("balancete", help="Parquet do processar_lote ou .xlsx do balancete")
+    parser.add_argument("sigeo", help="Relatório consolidado do Sigeo (.xlsx, .csv ou .parquet)")
+    parser.add_argument("--aba-balancete", default="Planilha1")
+    parser.add_argument("--aba-sigeo", default=0)
+    parser.add_argument("--tolerancia", type=int, default=0, help="Diferença aceita, em centavos")
+    parser.add_argument("--saida", default="divergencias.xlsx", help="Tabela de divergências (.xlsx ou .csv)")
+    args = parser.parse_args()
+
+    import time
+    inicio = time.perf_counter()
+    balancete = ler_balancete(args.balancete, args.aba_balancete)
+    sigeo = ler_sigeo(args.sigeo, args.aba_sigeo)
+    lidos = time.perf_counter()
+    divergencias = conciliar(balancete, sigeo, tolerancia=args.tolerancia)
+    fim = time.perf_counter()
+
+    resumo = divergencias.attrs['resumo']
+    print(f"Leitura: {lidos - inicio:.1f}s · conciliação: {fim - lidos:.2f}s "
+          f"({len(balancete)} linhas no balancete, {len(sigeo)} no Sigeo)")
+    print(f"Chave: {', '.join(resumo['chaves'])} · colunas: {', '.join(resumo['colunas'])}")
+    print(f"{resumo['chaves_comparadas']} chaves, {resumo['conciliadas']} conciliadas")
+    for situacao in SITUACOES:
+        print(f"  {situacao:<25} {resumo[situacao]}")
+
+    tabela = formatar_para_exibicao(divergencias)
+    if args.saida.lower().endswith(".csv"):
+        tabela.to_csv(args.saida, index=False, sep=";", encoding="utf-8-sig")
+    else:
+        with pd.ExcelWriter(args.saida) as escritor:
+            tabela.to_excel(escritor, sheet_name="Divergências", index=False)
+            resumo_por_projeto(divergencias).to_excel(escritor, sheet_name="Por projeto", index=False)
+    print(f"Divergências salvas em '{args.saida}'.")
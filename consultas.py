@@ -0,0 +1,383 @@
+"""
+Backends de consulta do dashboard: quem responde filtros, KPIs e agregações.
+
+- BackendDuckDB: SQL embutido (DuckDB) sobre arquivos Parquet locais. Filtros e
+  agrupamentos descem até a leitura do Parquet (só as colunas/row groups necessários),
+  roda em todos os núcleos e derrama para disco quando não cabe na memória: serve
+  para o histórico de vários anos (snapshots tipados do CISM + balancetes consolidados).
+- BackendPandas: o caminho em memória de sempre (cubo.py + indice_filtros.py). É o
+  padrão; o DuckDB só entra quando configurado (ver `criar_backend`) e, se não estiver
+  instalado ou falhar ao abrir os arquivos, fica o pandas.
+
+Os dois têm a mesma interface: `fatia(filtros)` devolve uma consulta com
+vazia() / kpis() / somar_por(colunas) / serie_mensal(), e o backend responde
+opcoes(dim), resumo(dim), contar(filtros), pagina(...) e tem_coluna(col).
+A série mensal (com acumulado, móveis e ano anterior) sai da série temporal
+pré-agregada do backend (serie_temporal.py) nos dois casos.
+"""
+import functools
+import glob
+import os
+import threading
+import weakref
+
+import pandas as pd
+
+import cubo
+import esquema
+import instrumentacao
+import serie_temporal
+
+try:
+    import duckdb
+except ImportError:  # dependência opcional: sem ela, fica o backend pandas
+    duckdb = None
+
+DIR_PARQUET = os.path.join(".cache_cism", "consultas")
+
+# Quantos Parquets tipados de versões anteriores manter (sessões ainda na versão velha leem deles)
+VERSOES_MANTIDAS = 2
+
+# Parquets tipados lidos por algum BackendDuckDB vivo do processo (caminho -> nº de backends):
+# a limpeza de versões antigas nunca apaga um deles
+_em_uso = {}
+_lock_em_uso = threading.Lock()
+
+
+def _instrumentada(metodo):
+    """Span 'consulta.<método>[colunas]' em volta de uma agregação, com as linhas devolvidas."""
+    @functools.wraps(metodo)
+    def envolvida(self, *args):
+        if not instrumentacao.ativa():
+            return metodo(self, *args)
+        nome = f"consulta.{metodo.__name__}"
+        if args:
+            nome += "[" + ",".join([args[0]] if isinstance(args[0], str) else args[0]) + "]"
+        with instrumentacao.span(nome) as s:
+            resultado = metodo(self, *args)
+            if isinstance(resultado, pd.DataFrame):
+                s.anotar(linhas=len(resultado))
+        return resultado
+    return envolvida
+
+
+# --- Backend pandas (em memória) ---
+class ConsultaPandas:
+    """Fatia do cubo em memória para um conjunto de filtros."""
+
+    def __init__(self, fatia, serie, filtros):
+        self.fatia = fatia
+        self.serie = serie
+        self.filtros = filtros
+
+    def vazia(self):
+        return self.fatia.empty
+
+    @_instrumentada
+    def kpis(self):
+        return cubo.kpis(self.fatia)
+
+    @_instrumentada
+    def somar_por(self, colunas):
+        return cubo.somar_por(self.fatia, colunas)
+
+    @_instrumentada
+    def serie_mensal(self):
+        return self.serie.serie(self.filtros)
+
+
+class BackendPandas:
+    nome = "pandas"
+
+    def __init__(self, df, cubo_df, indice, serie=None):
+        self.df = df
+        self.cubo = cubo_df
+        self.indice = indice
+        self.serie = serie if serie is not None else serie_temporal.SerieTemporal(cubo_df)
+
+    def fatia(self, filtros):
+        return ConsultaPandas(cubo.fatiar(self.cubo, filtros), self.serie, filtros)
+
+    def opcoes(self, dim):
+        return esquema.opcoes_filtro(self.df, dim)
+
+    def resumo(self, dim):
+        return self.indice.resumo(dim)
+
+    def contar(self, filtros):
+        return self.indice.contar(filtros)
+
+    def pagina(self, filtros, inicio, tamanho, colunas=None):
+        return self.indice.pagina(filtros, inicio, tamanho, colunas)
+
+    def tem_coluna(self, coluna):
+        return coluna in self.df.columns
+
+    @property
+    def colunas(self):
+        return list(self.df.columns)
+
+
+# --- Backend DuckDB (SQL sobre Parquet) ---
+def _citar(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _lista_sql(caminhos):
+    return "[" + ", ".join("'" + c.replace("'", "''") + "'" for c in caminhos) + "]"
+
+
+def _where(filtros, dims_existentes):
+    """Filtros {dim: [valores]} -> (cláusula WHERE com parâmetros, valores). Listas vazias = sem filtro."""
+    condicoes, params = [], []
+    for dim, valores in filtros.items():
+        if valores and dim in dims_existentes:
+            condicoes.append(f"{_citar(dim)} IN ({', '.join('?' * len(valores))})")
+            params.extend(v.item() if hasattr(v, 'item') else v for v in valores)
+    return ("WHERE " + " AND ".join(condicoes) if condicoes else ""), params
+
+
+def _e(where, condicao):
+    return f"{where} AND {condicao}" if where else f"WHERE {condicao}"
+
+
+class ConsultaDuckDB:
+    """Consulta preguiçosa: cada método vira um SELECT agregado com os filtros no WHERE."""
+
+    def __init__(self, backend, filtros):
+        self.backend = backend
+        self.filtros = filtros
+        self.where, self.params = _where(filtros, backend.colunas)
+
+    def vazia(self):
+        return not self.backend._executar(f"SELECT 1 FROM cism {self.where} LIMIT 1", self.params)
+
+    @_instrumentada
+    def kpis(self):
+        total, qtd_proj, registros = self.backend._executar(
+            f"SELECT COALESCE(SUM(Valor_Cent), 0)::BIGINT, COUNT(DISTINCT Projeto), COUNT(*) FROM cism {self.where}",
+            self.params,
+        )[0]
+        # Empate: a fonte que vem antes na ordem alfabética (mesmo critério do idxmax no cubo)
+        top = self.backend._executar(
+            f"SELECT Fonte, SUM(COALESCE(Valor_Cent, 0))::BIGINT AS v FROM cism {_e(self.where, 'Fonte IS NOT NULL')} "
+            "GROUP BY Fonte ORDER BY v DESC, Fonte LIMIT 1",
+            self.params,
+        )
+        top_fonte_nome = "-"
+        if top:
+            fracao = top[0][1] / total if total else float('nan')
+            top_fonte_nome = f"{top[0][0]} ({fracao:.0%})"
+        return total, qtd_proj, top_fonte_nome, registros
+
+    @_instrumentada
+    def somar_por(self, colunas):
+        colunas = [colunas] if isinstance(colunas, str) else list(colunas)
+        cols = ", ".join(_citar(c) for c in colunas)
+        nao_nulos = " AND ".join(f"{_citar(c)} IS NOT NULL" for c in colunas)
+        return self.backend._df(
+            f"SELECT {cols}, SUM(COALESCE(Valor_Cent, 0))::BIGINT AS Valor FROM cism {_e(self.where, nao_nulos)} "
+            f"GROUP BY {cols} ORDER BY {cols}",
+            self.params,
+        )
+
+    @_instrumentada
+    def serie_mensal(self):
+        if not self.backend.tem_coluna('Data_dt'):
+            return pd.DataFrame(columns=serie_temporal.COLUNAS)
+        return self.backend.serie_temporal().serie(self.filtros)
+
+
+class BackendDuckDB:
+    """
+    Views `cism` (Parquets tipados, ex.: snapshot atual + anos anteriores, unidos por nome
+    de coluna) e, se houver, `balancetes` (saída do processar_lote.py). Uma conexão por
+    backend; cada consulta usa um cursor próprio, então as sessões consultam em paralelo.
+    """
+    nome = "duckdb"
+
+    def __init__(self, parquets_cism, parquets_balancetes=(), memoria_max=None, dir_temp=None, serie=None):
+        if duckdb is None:
+            raise ImportError("duckdb não está instalado")
+        self.con = duckdb.connect(config={'preserve_insertion_order': True})
+        if memoria_max:
+            self.con.execute(f"SET memory_limit = '{memoria_max}'")
+        if dir_temp:
+            # Onde o DuckDB derrama agregações/ordenações que não cabem no memory_limit
+            self.con.execute(f"SET temp_directory = '{dir_temp}'")
+        self._lock = threading.Lock()
+
+        self.con.execute(
+            f"CREATE VIEW cism AS SELECT * FROM read_parquet({_lista_sql(parquets_cism)}, "
+            "union_by_name = true, filename = '_arquivo', file_row_number = true)"
+        )
+        if parquets_balancetes:
+            self.con.execute(
+                f"CREATE VIEW balancetes AS SELECT * FROM read_parquet({_lista_sql(parquets_balancetes)}, "
+                "union_by_name = true)"
+            )
+        descricao = self.con.execute("SELECT * FROM cism LIMIT 0").description
+        self.colunas = [c[0] for c in descricao if c[0] not in ('_arquivo', 'file_row_number')]
+        self._resumos = {}
+        self._serie = serie
+
+    def _cursor(self):
+        with self._lock:
+            return self.con.cursor()
+
+    def _executar(self, sql, params=()):
+        cur = self._cursor()
+        try:
+            return cur.execute(sql, list(params)).fetchall()
+        finally:
+            cur.close()
+
+    def _df(self, sql, params=()):
+        cur = self._cursor()
+        try:
+            return cur.execute(sql, list(params)).df()
+        finally:
+            cur.close()
+
+    def consultar(self, sql, params=()):
+        """SQL livre sobre as views `cism`/`balancetes` (para análises fora do dashboard)."""
+        return self._df(sql, params)
+
+    def fatia(self, filtros):
+        return ConsultaDuckDB(self, filtros)
+
+    def resumo(self, dim):
+        """{valor: (qtd_registros, total_centavos)} da dimensão (calculado uma vez por backend)."""
+        if dim not in self.colunas:
+            return {}
+        if dim not in self._resumos:
+            linhas = self._executar(
+                f"SELECT {_citar(dim)}, COUNT(*), SUM(COALESCE(Valor_Cent, 0))::BIGINT FROM cism "
+                f"WHERE {_citar(dim)} IS NOT NULL GROUP BY 1 ORDER BY 1"
+            )
+            self._resumos[dim] = {v: (n, total) for v, n, total in linhas}
+        return self._resumos[dim]
+
+    def opcoes(self, dim):
+        return list(self.resumo(dim))
+
+    def serie_temporal(self):
+        """
+        Série temporal sobre tudo o que a view `cism` enxerga (com o histórico): um GROUP BY
+        por dimensões e mês, feito uma vez por backend, na primeira vez que o gráfico pede.
+        """
+        if self._serie is None:
+            dims = [d for d in cubo.DIMENSOES if d in self.colunas]
+            cubo_sql = self._df(
+                f"SELECT {''.join(_citar(d) + ', ' for d in dims)}"
+                "CAST(last_day(Data_dt) AS TIMESTAMP) AS Mes, SUM(COALESCE(Valor_Cent, 0))::BIGINT AS Valor, "
+                "COUNT(*) AS Registros FROM cism WHERE Data_dt IS NOT NULL GROUP BY ALL"
+            )
+            self._serie = serie_temporal.SerieTemporal(cubo_sql, dims)
+        return self._serie
+
+    def contar(self, filtros):
+        where, params = _where(filtros, self.colunas)
+        return self._executar(f"SELECT COUNT(*) FROM cism {where}", params)[0][0]
+
+    def pagina(self, filtros, inicio, tamanho, colunas=None):
+        where, params = _where(filtros, self.colunas)
+        cols = ", ".join(_citar(c) for c in (colunas or self.colunas))
+        # Ordem estável: arquivo + posição da linha no arquivo (mesma ordem da planilha)
+        pagina = self._df(
+            f"SELECT {cols} FROM cism {where} ORDER BY _arquivo, file_row_number LIMIT ? OFFSET ?",
+            params + [int(tamanho), int(inicio)],
+        )
+        return pagina, self.contar(filtros)
+
+    def tem_coluna(self, coluna):
+        return coluna in self.colunas
+
+
+# --- Escolha do backend ---
+def _reservar(caminho, backend):
+    """Marca `caminho` como em uso enquanto `backend` existir."""
+    with _lock_em_uso:
+        _em_uso[caminho] = _em_uso.get(caminho, 0) + 1
+    weakref.finalize(backend, _liberar, caminho)
+
+
+def _liberar(caminho):
+    with _lock_em_uso:
+        _em_uso[caminho] -= 1
+        if not _em_uso[caminho]:
+            del _em_uso[caminho]
+
+
+def _versao_do_arquivo(caminho):
+    # cism_<versão>.parquet: a versão (e não o mtime) diz qual é a mais nova, mesmo com
+    # réplicas gravando fora de ordem
+    nome = os.path.basename(caminho)[len("cism_"):-len(".parquet")]
+    return int(nome) if nome.isdigit() else -1
+
+
+def gravar_parquet_tipado(df, versao, dir_parquet=DIR_PARQUET):
+    """
+    Grava o frame tipado do CISM desta versão e apaga as versões antigas além de
+    VERSOES_MANTIDAS, menos as que um backend deste processo ainda lê.
+    """
+    os.makedirs(dir_parquet, exist_ok=True)
+    destino = os.path.join(dir_parquet, f"cism_{versao}.parquet")
+    if os.path.exists(destino):
+        # Mesma versão já gravada por outra réplica (versões vêm do cache compartilhado)
+        return destino
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, destino)
+
+    antigos = sorted(glob.glob(os.path.join(dir_parquet, "cism_*.parquet")), key=_versao_do_arquivo)
+    with _lock_em_uso:
+        apagar = [c for c in antigos[:-VERSOES_MANTIDAS] if c not in _em_uso]
+    for caminho in apagar:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+    return destino
+
+
+def _expandir(padroes):
+    if isinstance(padroes, str):
+        padroes = [padroes]
+    return sorted({c for p in padroes for c in glob.glob(p)})
+
+
+def criar_backend(df, cubo_df, indice, versao, config=None, serie=None):
+    """
+    Backend conforme `config` (ex.: st.secrets['consultas']):
+        backend = "pandas" | "duckdb" | "auto" (padrão: pandas; auto = duckdb só com histórico)
+        historico = ["historico/cism_*.parquet"]   # anos anteriores, mesmo schema tipado
+        balancetes = "balancetes_consolidados.parquet"
+        memoria_max = "2GB", dir_temp = ".cache_cism/duckdb_tmp"
+    O pandas (cubo pré-agregado + índice de filtros) fica sem configuração; o DuckDB só com
+    backend = "duckdb" ou com "auto" e um histórico configurado (que não cabe no cubo em memória).
+    Se o DuckDB não der certo, volta para o pandas e registra o motivo em `erro_backend`.
+    `serie` (serie_temporal.SerieTemporal do cubo) é reaproveitada enquanto não há histórico.
+    """
+    config = dict(config or {})
+    escolha = config.get("backend", "pandas")
+    historico = _expandir(config.get("historico", []))
+    pandas_backend = BackendPandas(df, cubo_df, indice, serie)
+    if escolha == "pandas" or (escolha == "auto" and (duckdb is None or not historico)):
+        return pandas_backend
+
+    try:
+        atual = gravar_parquet_tipado(df, versao)
+        backend = BackendDuckDB(
+            [atual] + historico,
+            _expandir(config.get("balancetes", [])),
+            memoria_max=config.get("memoria_max"),
+            dir_temp=config.get("dir_temp"),
+            # Sem histórico a view `cism` é o próprio df: a série do cubo vale para ela
+            serie=None if historico else pandas_backend.serie,
+        )
+    except Exception as e:
+        pandas_backend.erro_backend = f"DuckDB indisponível ({e}); usando pandas"
+        return pandas_backend
+    _reservar(atual, backend)
+    return backend
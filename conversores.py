@@ -0,0 +1,203 @@
+"""
+Conversores vetorizados compartilhados (app.py e validar_parser.py) para
+valores monetários no formato brasileiro e datas dd/mm/aaaa.
+
+Dinheiro é representado em centavos inteiros (Int64) em todo o modelo de dados;
+a volta para "R$ 1.234,56" acontece só na exibição, via `formatar_reais`.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+FORMATO_DATA = "%d/%m/%Y"
+
+# Removidos antes de olhar o sinal: "R$" e espaços (inclusive o não-quebrável do Sheets).
+# Pontos de milhar saem depois; "-" e parênteses fora da posição de sinal tornam o valor inválido.
+_LIXO_MONETARIO = ["R$", " ", "\xa0"]
+# Depois da limpeza: inteiro com no máximo 2 casas decimais ("12,345" é erro de digitação, não centavo)
+_RE_NUMERO = r"^\d+(\.\d{1,2})?$"
+
+
+def _mascara_texto(series):
+    """Máscara das células que são texto (em colunas object podem vir números/datas do Excel)."""
+    tipo = pd.api.types.infer_dtype(series, skipna=True)
+    if tipo == "string":
+        return series.notna()
+    if tipo.startswith("mixed"):
+        try:
+            return series.str.len().notna()
+        except AttributeError:
+            pass
+    return pd.Series(False, index=series.index)
+
+
+def _reais_para_centavos(valores):
+    """
+    float (reais) -> Int64 (centavos). O arredondamento é exato para qualquer valor
+    com até 2 casas abaixo de ~R$ 90 trilhões (limite de precisão do float64).
+    """
+    return pd.Series(np.round(valores * 100), index=valores.index).astype("Int64")
+
+
+def converter_centavos(series):
+    """
+    Converte uma coluna de valores como "R$ 1.234,56", "(1.234,56)", "-R$ 10,00"
+    ou números já numéricos (vindos do Excel) em centavos inteiros (Int64),
+    numa única passada vetorizada. Células vazias viram <NA> sem contar como falha.
+
+    Retorna (serie_centavos, qtd_falhas).
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return _reais_para_centavos(pd.to_numeric(series, errors="coerce").astype("float64")), 0
+
+    eh_texto = _mascara_texto(series)
+    so_texto = series if eh_texto.all() else series.where(eh_texto)
+
+    # Parte texto feita com kernels do Arrow (sem loop Python por célula)
+    texto = pc.utf8_trim_whitespace(pa.array(so_texto, type=pa.string(), from_pandas=True))
+    vazio = pc.fill_null(pc.equal(texto, ""), True)
+
+    limpo = texto
+    for lixo in _LIXO_MONETARIO:
+        limpo = pc.replace_substring(limpo, lixo, "")
+
+    # Negativo contábil "(1.234,56)" ou sinal "-" na frente ("-R$ 10,00", "R$ -10,00"):
+    # só essas posições são tiradas; um "-" que sobrar no meio/fim falha na validação
+    parenteses = pc.and_(pc.starts_with(limpo, "("), pc.ends_with(limpo, ")"))
+    menos = pc.starts_with(limpo, "-")
+    negativo = pc.or_(parenteses, menos)
+    limpo = pc.if_else(
+        parenteses, pc.utf8_slice_codeunits(limpo, 1, -1),
+        pc.if_else(menos, pc.utf8_slice_codeunits(limpo, 1), limpo),
+    )
+    limpo = pc.replace_substring(pc.replace_substring(limpo, ".", ""), ",", ".")
+
+    # Valida com regex antes do cast (o cast sozinho aceitaria "12.345" e o arredondaria
+    # para centavos sem contar como falha) e anula o inválido
+    valido = pc.match_substring_regex(limpo, _RE_NUMERO)
+    valores = pc.cast(pc.if_else(valido, limpo, None), pa.float64())
+    valores = pc.if_else(pc.fill_null(negativo, False), pc.negate(valores), valores)
+
+    convertida = pd.Series(valores.to_numpy(zero_copy_only=False), index=series.index, dtype="float64")
+
+    # Células que já eram números (Excel) passam direto
+    if not eh_texto.all():
+        convertida = convertida.where(eh_texto, pd.to_numeric(series.where(~eh_texto), errors="coerce"))
+
+    falhas = convertida.isna() & series.notna() & ~vazio.to_numpy(zero_copy_only=False)
+    return _reais_para_centavos(convertida), int(falhas.sum())
+
+
+def _texto(valores):
+    return pc.cast(pa.array(valores), pa.string())
+
+
+def formatar_reais(centavos, simbolo=True, milhar=True):
+    """
+    Formata centavos (escalar ou Series) como "R$ 1.234,56", de forma vetorizada.
+    Com simbolo=False/milhar=False gera "1234,56" (usado na exportação CSV).
+    Valores nulos viram "".
+    """
+    escalar = np.ndim(centavos) == 0
+    serie = pd.Series([centavos] if escalar else centavos, dtype="Int64")
+    nulo = serie.isna().to_numpy()
+    v = serie.fillna(0).to_numpy(dtype="int64")
+
+    inteiro, frac = np.divmod(np.abs(v), 100)
+
+    if milhar:
+        # Monta os grupos de 3 dígitos de baixo para cima; só o grupo mais alto fica sem zeros à esquerda
+        resto = inteiro // 1000
+        grupo = _texto(inteiro % 1000)
+        texto = pc.if_else(resto > 0, pc.utf8_lpad(grupo, 3, "0"), grupo)
+        while (resto > 0).any():
+            acima = resto // 1000
+            grupo = _texto(resto % 1000)
+            grupo = pc.if_else(acima > 0, pc.utf8_lpad(grupo, 3, "0"), grupo)
+            texto = pc.if_else(resto > 0, pc.binary_join_element_wise(grupo, texto, "."), texto)
+            resto = acima
+    else:
+        texto = _texto(inteiro)
+
+    texto = pc.binary_join_element_wise(texto, pc.utf8_lpad(_texto(frac), 2, "0"), ",")
+    if simbolo:
+        texto = pc.binary_join_element_wise("R$", texto, " ")
+    texto = pc.if_else(v < 0, pc.binary_join_element_wise("-", texto, ""), texto)
+    texto = pc.if_else(nulo, "", texto)
+
+    if escalar:
+        return texto[0].as_py()
+    resultado = texto.to_pandas()
+    resultado.index = serie.index
+    return resultado
+
+
+def converter_data(series, formato=FORMATO_DATA):
+    """
+    Converte datas com caminho rápido no formato explícito (dd/mm/aaaa) e, só para o
+    que sobrar, o parser flexível com dayfirst=True. Datas já convertidas pelo Excel passam direto.
+
+    Retorna (serie_datetime, qtd_falhas).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, 0
+
+    eh_texto = _mascara_texto(series)
+    texto = series.where(eh_texto).astype("object").str.strip()
+    vazio = series.isna() | (texto == "")
+
+    datas = pd.to_datetime(texto, format=formato, errors="coerce")
+
+    # Fallback só para o que sobrou: ISO (aaaa-mm-dd), depois formatos livres
+    # com dayfirst e objetos datetime do Excel
+    resto = datas.isna() & ~vazio
+    if resto.any():
+        datas[resto] = pd.to_datetime(texto[resto], format="ISO8601", errors="coerce")
+        resto = datas.isna() & ~vazio
+    if resto.any():
+        datas[resto] = pd.to_datetime(
+            series[resto].astype("object"), format="mixed", dayfirst=True, errors="coerce"
+        )
+
+    falhas = datas.isna() & ~vazio
+    return datas, int(falhas.sum())
+
+
+# --- Benchmark: conversor vetorizado x antigo clean_currency via .apply ---
+if __name__ == "__main__":
+    import time
+
+    def clean_currency(x):
+        if isinstance(x, str):
+            x = x.replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
+        return pd.to_numeric(x, errors='coerce')
+
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    centavos = rng.integers(1, 10**9, n)
+    coluna = pd.Series(
+        [f"R$ {c // 100:,}".replace(",", ".") + f",{c % 100:02d}" for c in centavos]
+    )
+
+    t0 = time.perf_counter()
+    antigo = coluna.apply(clean_currency)
+    t_apply = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    novo, falhas = converter_centavos(coluna)
+    t_vet = time.perf_counter() - t0
+
+    assert (np.round(antigo * 100).astype("int64") == novo.astype("int64")).all()
+
+    # Sinal e valores malformados
+    casos = {"R$ -10,00": -1000, "-R$ 10,00": -1000, "(1.234,56)": -123456, "R$ 1.234,56": 123456,
+             "1-2": None, "R$ 1,5-": None, "(10": None, "--5": None,
+             "R$ 1,5": 150, "12,345": None, "1.234,567": None, "R$ 10,": None}
+    convertidos, falhas_casos = converter_centavos(pd.Series(list(casos)))
+    for esperado, obtido in zip(casos.values(), convertidos):
+        assert (esperado is None and pd.isna(obtido)) or obtido == esperado
+    assert falhas_casos == sum(v is None for v in casos.values())
+    print(f"{n:,} linhas | .apply: {t_apply:.2f}s | vetorizado: {t_vet:.2f}s "
+          f"({t_apply / t_vet:.1f}x) | falhas: {falhas}")
+
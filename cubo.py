@@ -0,0 +1,74 @@
+import pandas as pd
+
+# Dimensões dos filtros do dashboard (mesmos nomes das colunas da aba CISM)
+DIMENSOES = ['ano', 'Fonte', 'Projeto', 'status']
+
+
+def construir_cubo(df):
+    """
+    Agrega o DataFrame da aba CISM uma única vez por carga, com chave
+    (ano, Fonte, Projeto, status, Mes) e medidas Valor (soma, em centavos int64) e Registros (contagem).
+    Todos os KPIs e gráficos do dashboard saem de fatias deste cubo,
+    então o custo por interação depende do número de grupos, não de linhas.
+    """
+    dims = [d for d in DIMENSOES if d in df.columns]
+    if df.empty:
+        return pd.DataFrame(columns=dims + ['Mes', 'Valor', 'Registros'])
+
+    # Dimensões já vêm categóricas do esquema.tipar_cism: o groupby roda sobre os códigos
+    base = df[dims].copy()
+    # Centavos sem nulos em int64 puro: reduções inteiras e exatas
+    base['Valor'] = df['Valor_Cent'].fillna(0).astype('int64')
+    # Mes = último dia do mês (mesmo rótulo do antigo pd.Grouper(freq='M'))
+    if 'Data_dt' in df.columns:
+        base['Mes'] = df['Data_dt'].dt.to_period('M').dt.to_timestamp(how='end').dt.normalize()
+    else:
+        base['Mes'] = pd.NaT
+
+    # dropna=False: linhas sem data continuam contando nos totais
+    cubo = base.groupby(dims + ['Mes'], dropna=False, sort=False, observed=True).agg(
+        Valor=('Valor', 'sum'),
+        Registros=('Valor', 'size'),
+    ).reset_index()
+    return cubo
+
+
+def fatiar(cubo, filtros):
+    """Aplica os filtros {dimensão: [valores]} sobre o cubo. Listas vazias = sem filtro."""
+    mask = pd.Series(True, index=cubo.index)
+    for dim, valores in filtros.items():
+        if valores and dim in cubo.columns:
+            mask &= cubo[dim].isin(valores)
+    return cubo[mask]
+
+
+def kpis(fatia):
+    """Retorna (valor_total, qtd_projetos, top_fonte_nome, qtd_registros) da fatia."""
+    val_total = fatia['Valor'].sum()
+    # 'Projeto' é chave do cubo: projetos distintos = projetos com algum grupo na fatia
+    qtd_proj = fatia['Projeto'].nunique()
+
+    top_fonte_nome = "-"
+    if not fatia.empty:
+        grp_fonte = fatia.groupby('Fonte', observed=True)['Valor'].sum()
+        if not grp_fonte.empty:
+            top_fonte_nome = f"{grp_fonte.idxmax()} ({grp_fonte.max()/val_total:.0%})"
+
+    return val_total, qtd_proj, top_fonte_nome, int(fatia['Registros'].sum())
+
+
+def somar_por(fatia, colunas):
+    """Soma de Valor por uma ou mais dimensões (ex.: ['Fonte', 'Projeto'] para o Sankey)."""
+    return fatia.groupby(colunas, observed=True)['Valor'].sum().reset_index()
+
+
+def serie_mensal(fatia):
+    """Valor mensal contínuo (meses sem lançamento aparecem com 0), ignorando linhas sem data."""
+    com_data = fatia.dropna(subset=['Mes'])
+    if com_data.empty:
+        return pd.DataFrame(columns=['Mes', 'Valor'])
+
+    serie = com_data.groupby('Mes')['Valor'].sum()
+    meses = pd.period_range(serie.index.min(), serie.index.max(), freq='M')
+    meses = meses.to_timestamp(how='end').normalize()
+    return serie.reindex(meses, fill_value=0).rename_axis('Mes').reset_index()
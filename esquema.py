@@ -0,0 +1,87 @@
+import pandas as pd
+
+import conversores
+import instrumentacao
+
+# Colunas de dimensão (filtros) que viram categóricas com categorias já ordenadas
+COLS_CATEGORICAS = ['Fonte', 'Projeto', 'status']
+
+# Colunas de texto bruto que já têm cópia convertida (Valor -> Valor_Cent, Data -> Data_dt)
+COLS_BRUTAS = {'Valor': 'Valor_Cent', 'Data': 'Data_dt'}
+
+
+def _categorica_ordenada(series):
+    """Categórica com as categorias em ordem alfabética (a mesma das listas de filtro)."""
+    texto = series.astype(str)
+    return pd.Categorical(texto, categories=sorted(texto.unique()))
+
+
+def tipar_cism(df):
+    """
+    Passo de schema do DataFrame da aba CISM, depois da conversão de Valor/Data:
+    - Fonte/Projeto/status viram categóricas (isin e groupby rodam sobre os códigos inteiros);
+    - ano vira Int16 (ou categórica, se houver valores não numéricos);
+    - as colunas de texto bruto Valor/Data são descartadas quando a versão convertida existe.
+    """
+    df = df.drop(columns=[bruta for bruta, convertida in COLS_BRUTAS.items()
+                          if bruta in df.columns and convertida in df.columns])
+
+    for col in COLS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = _categorica_ordenada(df[col])
+
+    if 'ano' in df.columns:
+        ano_txt = df['ano'].astype(str).str.strip()
+        ano = pd.to_numeric(ano_txt, errors='coerce')
+        if ano.notna().sum() == (ano_txt != '').sum() and ano.dropna().between(1900, 2999).all():
+            df['ano'] = ano.astype('Int16')
+        else:
+            df['ano'] = _categorica_ordenada(df['ano'])
+
+    return df
+
+
+def opcoes_filtro(df, col):
+    """Lista ordenada de valores para o multiselect, sem varrer as linhas (sai das categorias)."""
+    if col not in df.columns:
+        return []
+    if isinstance(df[col].dtype, pd.CategoricalDtype):
+        return list(df[col].cat.categories)
+    return sorted(df[col].dropna().unique().tolist())
+
+
+def preparar_dados(df):
+    """
+    Pós-processamento do DataFrame bruto (texto) da aba CISM, vindo da planilha/snapshot:
+    Valor -> Valor_Cent, Data -> Data_dt e o schema compacto do `tipar_cism`.
+    As quantidades de valores não convertidos ficam em df.attrs['falhas_parse'].
+    """
+    if df.empty:
+        raise ValueError("A aba não tem linhas de dados.")
+
+    # --- LIMPEZA DOS NOMES DAS COLUNAS (Espaços invisíveis) ---
+    df.columns = [c.strip() for c in df.columns]
+
+    # Verifica 'Fonte'
+    if 'Fonte' not in df.columns:
+        raise ValueError(f"Coluna 'Fonte' não encontrada. Colunas: {list(df.columns)}")
+
+    # Limpeza Numérica e Data (conversores vetorizados compartilhados com o validar_parser)
+    falhas = {}
+    # Dinheiro em centavos inteiros (Int64): somas exatas, sem drift de float
+    if 'Valor' in df.columns:
+        with instrumentacao.span("converter.centavos", linhas=len(df)):
+            df['Valor_Cent'], falhas['Valor'] = conversores.converter_centavos(df['Valor'])
+    else:
+        df['Valor_Cent'] = pd.Series(0, index=df.index, dtype="Int64")
+
+    if 'Data' in df.columns:
+        with instrumentacao.span("converter.data", linhas=len(df)):
+            df['Data_dt'], falhas['Data'] = conversores.converter_data(df['Data'])
+
+    # Schema compacto: dimensões categóricas, ano Int16, sem as colunas de texto bruto
+    with instrumentacao.span("esquema.tipar", linhas=len(df)) as s:
+        df = tipar_cism(df)
+        s.anotar(bytes=int(df.memory_usage(deep=False).sum()))
+    df.attrs['falhas_parse'] = falhas
+    return df
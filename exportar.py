@@ -0,0 +1,220 @@
+"""
+Exportação em blocos do balancete processado: o parser em modo streaming (`iterar_relatorio`)
+entrega um bloco já limpo (centavos e datas) por vez e cada bloco vai direto para os destinos,
+sem juntar o resultado inteiro em memória. O pico de memória é o de um bloco, qualquer que
+seja o tamanho da planilha.
+
+Destinos:
+    SinkParquet("saida.parquet")   um arquivo, um row group por bloco; aparece completo no fim (escrita atômica)
+    SinkParquet("saida/")          diretório com uma parte por bloco, cada uma visível assim que é gravada:
+                                   quem lê (`ler_blocos`, pd.read_parquet, DuckDB) consome enquanto o parser roda
+    SinkCSV("saida.csv")           CSV brasileiro (';', vírgula decimal, utf-8-sig), como o de validação
+
+Uso:
+    python exportar.py balancete.xlsx --parquet balancete.parquet --csv balancete.csv
+    python exportar.py balancete.xlsx --aba Planilha1 --parquet partes/ --linhas-por-bloco 20000
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import instrumentacao
+from conversores import formatar_reais
+from validar_parser import COLS_MONETARIAS, SCHEMA_SAIDA, iterar_relatorio
+
+ARQUIVO_CONCLUIDO = "_concluido.json"
+_RE_PARTE = re.compile(r"^parte-(\d{5})\.parquet$")
+
+
+def para_csv_br(df):
+    """Centavos -> "1234,56" (sem símbolo nem milhar), o formato do CSV de validação."""
+    return df.assign(**{
+        col: formatar_reais(df[col], simbolo=False, milhar=False)
+        for col in COLS_MONETARIAS if col in df.columns
+    })
+
+
+class SinkParquet:
+    """
+    Grava blocos num Parquet. `destino` terminado em .parquet: um arquivo com um row group
+    por bloco (ParquetWriter num temporário, renomeado no `fechar`). Qualquer outro caminho
+    é um diretório com `parte-00000.parquet`, `parte-00001.parquet`... (cada parte gravada de
+    forma atômica) e o `_concluido.json` no fim. O schema é o `schema` informado (ex.: o
+    SCHEMA_SAIDA do parser, que vale também quando não chega bloco nenhum) ou o do primeiro bloco.
+    """
+
+    def __init__(self, destino, compressao="zstd", schema=None):
+        self.destino = destino
+        self.compressao = compressao
+        self.um_arquivo = destino.lower().endswith(".parquet")
+        self.schema = schema
+        self.blocos = 0
+        self.linhas = 0
+        self._writer = None
+        self._tmp = f"{destino}.{os.getpid()}.tmp"
+        if not self.um_arquivo:
+            os.makedirs(destino, exist_ok=True)
+            # Partes de uma exportação anterior não podem se misturar com as novas
+            for nome in os.listdir(destino):
+                if _RE_PARTE.match(nome) or nome == ARQUIVO_CONCLUIDO:
+                    os.remove(os.path.join(destino, nome))
+
+    def _tabela(self, df):
+        if self.schema is None:
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = tabela.schema
+            return tabela
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+    def escrever(self, df):
+        tabela = self._tabela(df)
+        if self.um_arquivo:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp, self.schema, compression=self.compressao)
+            self._writer.write_table(tabela, row_group_size=len(df) or None)
+        else:
+            parte = os.path.join(self.destino, f"parte-{self.blocos:05d}.parquet")
+            tmp = os.path.join(self.destino, f".parte-{self.blocos:05d}.{os.getpid()}.tmp")
+            pq.write_table(tabela, tmp, compression=self.compressao)
+            os.replace(tmp, parte)
+        self.blocos += 1
+        self.linhas += len(df)
+
+    def fechar(self):
+        if self.um_arquivo:
+            if self._writer is None:
+                # Nenhum bloco: arquivo vazio (com as colunas do schema, se houver), para quem
+                # espera o destino existir (ex.: cache do lote)
+                vazia = self.schema.empty_table() if self.schema is not None else pa.table({})
+                pq.write_table(vazia, self._tmp)
+            else:
+                self._writer.close()
+            os.replace(self._tmp, self.destino)
+            return
+        tmp = os.path.join(self.destino, f".{ARQUIVO_CONCLUIDO}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({'blocos': self.blocos, 'linhas': self.linhas}, f)
+        os.replace(tmp, os.path.join(self.destino, ARQUIVO_CONCLUIDO))
+
+    def descartar(self):
+        """Exportação interrompida: some com o temporário (as partes já gravadas ficam, sem o `_concluido`)."""
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, *_):
+        if tipo_erro is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+
+class SinkCSV:
+    """Acrescenta blocos a um CSV brasileiro (cabeçalho só no primeiro); renomeado no `fechar`."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.blocos = 0
+        self.linhas = 0
+        self._tmp = f"{destino}.{os.getpid()}.tmp"
+        self._arquivo = open(self._tmp, "w", encoding="utf-8-sig", newline="")
+        self._colunas = None
+
+    def escrever(self, df):
+        if self._colunas is None:
+            self._colunas = list(df.columns)
+        para_csv_br(df).to_csv(self._arquivo, columns=self._colunas, header=self.blocos == 0,
+                               index=False, sep=';', decimal=',')
+        self.blocos += 1
+        self.linhas += len(df)
+
+    def fechar(self):
+        self._arquivo.close()
+        os.replace(self._tmp, self.destino)
+
+    def descartar(self):
+        self._arquivo.close()
+        os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, *_):
+        if tipo_erro is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+
+@instrumentacao.execucao("exportar.relatorio")
+def exportar_relatorio(file_path, sheet_name, sinks, linhas_por_bloco=50_000):
+    """
+    Parser em streaming -> cada bloco limpo vai para todos os `sinks` (e é descartado em
+    seguida). Fecha os sinks no fim; se algo falhar, inclusive abrir o arquivo/aba, descarta
+    os temporários e levanta a exceção. Devolve o número de linhas exportadas.
+    """
+    linhas = 0
+    try:
+        for bloco in iterar_relatorio(file_path, sheet_name, linhas_por_bloco, levantar_erros=True):
+            with instrumentacao.span("exportar.bloco", linhas=len(bloco)):
+                for sink in sinks:
+                    sink.escrever(bloco)
+            linhas += len(bloco)
+    except BaseException:
+        for sink in sinks:
+            sink.descartar()
+        raise
+    for sink in sinks:
+        sink.fechar()
+    return linhas
+
+
+def ler_blocos(diretorio, esperar=True, intervalo=0.5, timeout=None):
+    """
+    Lê (yield) as partes de um SinkParquet em diretório na ordem, à medida que aparecem.
+    Com esperar=True fica aguardando novas partes até o `_concluido.json`; com esperar=False
+    devolve só o que já está gravado.
+    """
+    import pandas as pd
+
+    proxima, inicio = 0, time.monotonic()
+    while True:
+        # O `_concluido` é gravado depois da última parte: olhado antes, não perde parte nenhuma
+        concluido = os.path.exists(os.path.join(diretorio, ARQUIVO_CONCLUIDO))
+        parte = os.path.join(diretorio, f"parte-{proxima:05d}.parquet")
+        if os.path.exists(parte):
+            yield pd.read_parquet(parte)
+            proxima += 1
+            continue
+        if concluido or not esperar or (timeout is not None and time.monotonic() - inicio > timeout):
+            return
+        time.sleep(intervalo)
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o balancete processado em blocos (memória constante).")
+    parser.add_argument("arquivo", help="Balancete .xlsx")
+    parser.add_argument("--aba", default="Planilha1")
+    parser.add_argument("--parquet", default=None, help="Arquivo .parquet ou diretório de partes")
+    parser.add_argument("--csv", default=None, help="CSV brasileiro (';' e vírgula decimal)")
+    parser.add_argument("--linhas-por-bloco", type=int, default=50_000, help="Linhas brutas lidas por bloco")
+    args = parser.parse_args()
+
+    sinks = (([SinkParquet(args.parquet, schema=SCHEMA_SAIDA)] if args.parquet else [])
+             + ([SinkCSV(args.csv)] if args.csv else []))
+    if not sinks:
+        parser.error("informe ao menos um destino (--parquet e/ou --csv)")
+    inicio = time.perf_counter()
+    total = exportar_relatorio(args.arquivo, args.aba, sinks, args.linhas_por_bloco)
+    print(f"{total} linhas exportadas em {time.perf_counter() - inicio:.1f}s em {sinks[0].blocos} bloco(s): "
+          + ", ".join(s.destino for s in sinks))
@@ -0,0 +1,196 @@
+"""
+Gerador de dados sintéticos realistas para benchmarks e testes manuais.
+
+- Aba CISM: Fonte / Projeto / ano / status / Valor ("R$ 1.234,56") / Data (dd/mm/aaaa),
+  tudo texto como o Google Sheets entrega, com distribuição de fontes concentrada
+  (poucas fontes pagam quase tudo) e alguns valores vazios ou malformados.
+- Balancete Sigeo: título "PROJETOS VERBAS", linhas "PROJETO: ...", linhas de item com
+  Alínea / Valor Concedido (números do Excel ou texto "R$") e linhas "TOTAL: ...".
+- Consolidado Sigeo: totais por Projeto / Conta Corrente / Alínea do mesmo balancete já
+  processado, com divergências, linhas faltando e projetos órfãos plantados (conciliação).
+
+Uso:
+    python gerar_dados.py cism 100000 cism_sintetico.xlsx
+    python gerar_dados.py balancete 500000 balancete_sintetico.xlsx
+    python gerar_dados.py sigeo 500000 sigeo_sintetico.xlsx      # consolidado do balancete de mesma seed
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from conversores import FORMATO_DATA, formatar_reais
+from validar_parser import COLS_MONETARIAS
+
+# Limite de linhas de uma aba do Excel (cabeçalho incluso)
+MAX_LINHAS_EXCEL = 1_048_576
+
+STATUS = ["Pago", "Pendente", "Cancelado", "Em análise"]
+ALINEAS = ["33.90.14", "33.90.30", "33.90.33", "33.90.36", "33.90.39", "44.90.52"]
+DESCRICOES = ["Diárias", "Material de Consumo", "Passagens", "Serviços PF", "Serviços PJ", "Equipamentos"]
+
+COLS_BALANCETE = ["Conta Corrente", "Alínea", "Descrição"] + COLS_MONETARIAS + ["Vigência"]
+
+
+def _centavos(rng, n):
+    """Valores log-normais (muitos pequenos, poucos grandes), em centavos."""
+    return np.round(rng.lognormal(mean=11, sigma=1.6, size=n)).astype("int64")
+
+
+def _datas(rng, n, ano_inicio, ano_fim):
+    inicio = np.datetime64(f"{ano_inicio}-01-01")
+    dias = (np.datetime64(f"{ano_fim + 1}-01-01") - inicio).astype(int)
+    return pd.to_datetime(inicio + rng.integers(0, dias, n).astype("timedelta64[D]"))
+
+
+# --- Aba CISM ---
+def gerar_cism(n, seed=0, n_fontes=30, n_projetos=None, ano_inicio=2015, ano_fim=2025, taxa_sujeira=0.002):
+    """DataFrame da aba CISM com `n` linhas, só texto (como vem do Sheets)."""
+    rng = np.random.default_rng(seed)
+    n_projetos = n_projetos or int(min(max(n // 100, 20), 5000))
+
+    # Zipf: a Fonte 01 paga muito mais que a Fonte 30
+    fonte = np.minimum(rng.zipf(1.5, n), n_fontes) - 1
+    projeto = rng.integers(0, n_projetos, n)
+    # Textos montados uma vez por valor distinto e espalhados por índice (rápido até 5M+ linhas)
+    nomes_fonte = np.array([f"Fonte {i:02d}" for i in range(1, n_fontes + 1)], dtype=object)
+    nomes_projeto = np.array([f"Projeto {i:04d}" for i in range(1, n_projetos + 1)], dtype=object)
+    dias = pd.date_range(f"{ano_inicio}-01-01", f"{ano_fim}-12-31", freq="D")
+    dia = rng.integers(0, len(dias), n)
+
+    df = pd.DataFrame({
+        "Fonte": nomes_fonte[fonte],
+        "Projeto": nomes_projeto[projeto],
+        "ano": dias.year.astype(str).to_numpy(dtype=object)[dia],
+        "status": np.array(STATUS, dtype=object)[rng.choice(len(STATUS), n, p=[0.6, 0.25, 0.05, 0.1])],
+        "Valor": formatar_reais(pd.Series(_centavos(rng, n), dtype="Int64")),
+        "Data": dias.strftime(FORMATO_DATA).to_numpy(dtype=object)[dia],
+    })
+
+    # Sujeira de planilha real: células vazias, "-" e texto livre
+    if taxa_sujeira:
+        sujos = rng.random(n) < taxa_sujeira
+        df.loc[sujos, "Valor"] = rng.choice(["", "-", "a definir"], sujos.sum())
+        sujos = rng.random(n) < taxa_sujeira
+        df.loc[sujos, "Data"] = rng.choice(["", "s/ data"], sujos.sum())
+    return df
+
+
+# --- Balancete Sigeo ---
+def gerar_balancete(n, seed=0, itens_por_projeto=(1, 12)):
+    """
+    DataFrame bruto de um balancete (como o pd.read_excel leria, antes do parser) com
+    cerca de `n` linhas: blocos PROJETO / itens / TOTAL, precedidos do título da seção.
+    """
+    rng = np.random.default_rng(seed)
+    media = (itens_por_projeto[0] + itens_por_projeto[1]) / 2 + 2
+    n_projetos = max(int(n / media), 1)
+    itens = rng.integers(itens_por_projeto[0], itens_por_projeto[1] + 1, n_projetos)
+
+    # Tipo de cada linha: 0 = PROJETO, 1 = item, 2 = TOTAL
+    tipo = np.repeat(np.tile([0, 1, 2], n_projetos), np.column_stack([np.ones_like(itens), itens, np.ones_like(itens)]).ravel())
+    n_linhas = len(tipo)
+    eh_item = tipo == 1
+    n_itens = int(eh_item.sum())
+
+    conta = np.full(n_linhas, None, dtype=object)
+    conta[tipo == 0] = [f"PROJETO: {p:06d} - Projeto sintético {p}" for p in range(1, n_projetos + 1)]
+    conta[tipo == 2] = [f"TOTAL: {p:06d}" for p in range(1, n_projetos + 1)]
+    conta[eh_item] = rng.integers(1000, 99999, n_itens).astype(str)
+
+    df = pd.DataFrame({"Conta Corrente": conta})
+
+    def coluna_itens(valores):
+        col = np.full(n_linhas, np.nan, dtype=object)
+        col[eh_item] = valores
+        return col
+
+    # ~3% dos itens sem alínea e ~3% sem valor concedido (o parser descarta)
+    alinea = np.array(ALINEAS, dtype=object)[rng.integers(0, len(ALINEAS), n_itens)]
+    alinea[rng.random(n_itens) < 0.03] = np.nan
+    df["Alínea"] = coluna_itens(alinea)
+    df["Descrição"] = coluna_itens(np.array(DESCRICOES, dtype=object)[rng.integers(0, len(DESCRICOES), n_itens)])
+
+    for i, col in enumerate(COLS_MONETARIAS):
+        reais = _centavos(rng, n_itens) / 100
+        valores = reais.astype(object)
+        # Parte dos valores vem como texto "R$ 1.234,56" (célula formatada como texto no Sigeo)
+        como_texto = rng.random(n_itens) < 0.2
+        valores[como_texto] = formatar_reais(pd.Series(np.round(reais[como_texto] * 100).astype("int64"), dtype="Int64")).to_numpy()
+        valores[rng.random(n_itens) < (0.03 if i == 0 else 0.15)] = np.nan
+        df[col] = coluna_itens(valores)
+        if col == "Valor Concedido":
+            df.loc[tipo == 2, col] = 1.0  # linha TOTAL tem número na coluna de valor
+
+    df["Vigência"] = coluna_itens(_datas(rng, n_itens, 2024, 2027).to_numpy().astype("datetime64[us]").astype(object))
+
+    cabecalho = pd.DataFrame([
+        {"Conta Corrente": "PROJETOS VERBAS 2024"},
+        {"Conta Corrente": "123", "Alínea": "33.90.30", "Descrição": "antes do primeiro projeto", "Valor Concedido": 10.0},
+    ], columns=COLS_BALANCETE)
+    return pd.concat([cabecalho, df[COLS_BALANCETE]], ignore_index=True)
+
+
+# --- Consolidado Sigeo ---
+def gerar_sigeo(relatorio, seed=0, taxa_divergencia=0.01, taxa_faltante=0.005, projetos_orfaos=5):
+    """
+    Consolidado do Sigeo a partir de um balancete já processado (`processar_dataframe`):
+    totais por Projeto (só o código) / Conta Corrente / Alínea, em reais. Planta divergências
+    de valor, chaves que só existem no balancete e `projetos_orfaos` projetos só no Sigeo.
+    """
+    rng = np.random.default_rng(seed)
+    chaves = ["Projeto", "Conta Corrente", "Alínea"]
+    colunas = [c for c in ("Valor Concedido", "Valor Pago", "Saldo Projeto") if c in relatorio.columns]
+    df = relatorio.groupby(chaves, sort=False, observed=True)[colunas].sum().reset_index()
+    df["Projeto"] = df["Projeto"].astype(str).str.split(" - ").str[0]
+
+    df = df[rng.random(len(df)) >= taxa_faltante].reset_index(drop=True)
+    divergentes = rng.random(len(df)) < taxa_divergencia
+    df.loc[divergentes, colunas[0]] += rng.integers(1, 100_000, int(divergentes.sum()))
+
+    orfaos = pd.DataFrame({
+        "Projeto": [f"{900000 + i:06d}" for i in range(projetos_orfaos)],
+        "Conta Corrente": rng.integers(1000, 99999, projetos_orfaos).astype(str),
+        "Alínea": np.array(ALINEAS, dtype=object)[rng.integers(0, len(ALINEAS), projetos_orfaos)],
+        **{col: _centavos(rng, projetos_orfaos) for col in colunas},
+    })
+    df = pd.concat([df, orfaos], ignore_index=True)
+    for col in colunas:
+        df[col] = df[col].astype("Float64") / 100
+    return df
+
+
+def gravar_excel(df, caminho, aba="Planilha1"):
+    """Grava em .xlsx com o openpyxl em modo write-only (rápido e com pouca memória)."""
+    import openpyxl
+
+    if len(df) + 1 > MAX_LINHAS_EXCEL:
+        raise ValueError(f"{len(df)} linhas não cabem numa aba do Excel (máx. {MAX_LINHAS_EXCEL - 1}).")
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(aba)
+    ws.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None):
+        ws.append([None if (isinstance(v, float) and np.isnan(v)) else v for v in linha])
+    wb.save(caminho)
+    return caminho
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera planilhas sintéticas da aba CISM, de balancetes ou do consolidado Sigeo.")
+    parser.add_argument("tipo", choices=["cism", "balancete", "sigeo"])
+    parser.add_argument("linhas", type=int)
+    parser.add_argument("saida", help=".xlsx de saída")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aba", default=None, help="Nome da aba (padrão: CISM / Planilha1)")
+    args = parser.parse_args()
+
+    if args.tipo == "cism":
+        df = gerar_cism(args.linhas, seed=args.seed)
+    elif args.tipo == "balancete":
+        df = gerar_balancete(args.linhas, seed=args.seed)
+    else:
+        from validar_parser import processar_dataframe
+        df = gerar_sigeo(processar_dataframe(gerar_balancete(args.linhas, seed=args.seed)), seed=args.seed)
+    gravar_excel(df, args.saida, aba=args.aba or ("CISM" if args.tipo == "cism" else "Planilha1"))
+    print(f"{len(df)} linhas gravadas em '{args.saida}'.")
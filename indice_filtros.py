@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+class IndiceFiltros:
+    """
+    Índice invertido dos filtros (Ano / Fonte / Projeto / Status), construído uma vez por carga.
+
+    Para cada dimensão guarda os códigos inteiros de cada linha e, por valor, a lista de
+    linhas (ids ordenados por código + offsets). Qualquer combinação de filtros vira
+    uniões de listas de ids, interseções por lookup de código e um único `take` no final,
+    sem copiar o DataFrame inteiro. Contagens e totais por valor saem do mesmo índice.
+    """
+
+    def __init__(self, df, dims, col_valor='Valor_Cent'):
+        self.df = df
+        self.dims = {}
+
+        if col_valor in df.columns:
+            valor = df[col_valor].fillna(0).to_numpy(dtype='int64')
+        else:
+            valor = np.zeros(len(df), dtype='int64')
+
+        for dim in dims:
+            if dim not in df.columns:
+                continue
+            col = df[dim]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                codigos = col.cat.codes.to_numpy()
+                valores = list(col.cat.categories)
+            else:
+                codigos, uniq = pd.factorize(col, sort=True)
+                valores = uniq.tolist()
+            codigos = codigos.astype('int64')  # -1 = nulo (nunca selecionável)
+
+            ordem = np.argsort(codigos, kind='stable')
+            contagem = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+            # Nulos (-1) ficam no começo de `ordem`; offsets[i]:offsets[i+1] = linhas do valor i
+            offsets = np.concatenate([[0], np.cumsum(contagem)]) + (codigos < 0).sum()
+
+            # Totais exatos em centavos (reduceat em int64; grupos vazios zerados)
+            totais = np.zeros(len(valores), dtype='int64')
+            if len(ordem) and len(valores):
+                somas = np.add.reduceat(valor[ordem], np.minimum(offsets[:-1], len(ordem) - 1))
+                totais = np.where(contagem > 0, somas, 0)
+
+            self.dims[dim] = {
+                'valores': valores,
+                'posicao': {v: i for i, v in enumerate(valores)},
+                'codigos': codigos,
+                'ordem': ordem,
+                'offsets': offsets,
+                'contagem': contagem,
+                'totais': totais,
+            }
+
+    def ids(self, filtros):
+        """
+        Ids (ordenados) das linhas que passam nos filtros {dimensão: [valores]},
+        ou None quando nenhum filtro está ativo.
+        """
+        ativos = []
+        for dim, valores in filtros.items():
+            if valores and dim in self.dims:
+                d = self.dims[dim]
+                ativos.append((d, [d['posicao'][v] for v in valores if v in d['posicao']]))
+        if not ativos:
+            return None
+
+        # Começa pela dimensão mais seletiva: as demais só olham as linhas já escolhidas
+        ativos.sort(key=lambda a: a[0]['contagem'][a[1]].sum())
+        d, cods = ativos[0]
+        ids = np.concatenate(
+            [d['ordem'][d['offsets'][c]:d['offsets'][c + 1]] for c in cods] or [np.empty(0, dtype='int64')]
+        )
+        for d, cods in ativos[1:]:
+            selecionado = np.zeros(len(d['valores']) + 1, dtype=bool)  # última posição = nulo (-1)
+            selecionado[cods] = True
+            ids = ids[selecionado[d['codigos'][ids]]]
+
+        ids.sort()
+        return ids
+
+    def filtrar(self, filtros):
+        """DataFrame filtrado via um único `take` (ou o próprio DataFrame, se não há filtros)."""
+        ids = self.ids(filtros)
+        return self.df if ids is None else self.df.take(ids)
+
+    def contar(self, filtros):
+        """Quantidade de linhas que passam nos filtros."""
+        ids = self.ids(filtros)
+        return len(self.df) if ids is None else len(ids)
+
+    def pagina(self, filtros, inicio, tamanho, colunas=None):
+        """
+        (página, total): linhas [inicio, inicio + tamanho) do resultado filtrado, só com
+        `colunas` (todas se None). Só a página é copiada, não o resultado inteiro.
+        """
+        ids = self.ids(filtros)
+        total = len(self.df) if ids is None else len(ids)
+        fim = min(inicio + tamanho, total)
+        posicoes = np.arange(inicio, fim) if ids is None else ids[inicio:fim]
+        cols = slice(None) if colunas is None else [self.df.columns.get_loc(c) for c in colunas]
+        return self.df.iloc[posicoes, cols], total
+
+    def resumo(self, dim):
+        """{valor: (qtd_registros, total_centavos)} da dimensão, direto do índice."""
+        d = self.dims.get(dim)
+        if d is None:
+            return {}
+        return dict(zip(d['valores'], zip(d['contagem'].tolist(), d['totais'].tolist())))
@@ -0,0 +1,232 @@
+"""
+Instrumentação leve: spans nomeados (tempo + memória) e contadores (linhas/bytes)
+por execução do dashboard (rerun completo, rerun de fragmento ou carga de dados).
+
+Desligada (padrão), `span()` devolve sempre o mesmo objeto nulo: o custo é uma
+checagem de booleano por estágio. Ligada (CISM_INSTRUMENTACAO=1 ou `configurar`),
+cada execução vira um registro com a árvore de spans, guardado num buffer do
+processo (para o painel de admin) e, se houver arquivo de log, numa linha JSON.
+
+    with instrumentacao.execucao("carga", origem="sheets"):
+        with instrumentacao.span("sheets.buscar") as s:
+            linhas = ...
+            s.anotar(linhas=len(linhas))
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+VAR_ATIVO = "CISM_INSTRUMENTACAO"
+VAR_LOG = "CISM_INSTRUMENTACAO_LOG"
+
+_ativo = os.environ.get(VAR_ATIVO, "") not in ("", "0")
+_arquivo_log = os.environ.get(VAR_LOG) or None
+
+_lock = threading.Lock()
+_recentes = deque(maxlen=200)   # execuções finalizadas (mais recente no fim)
+_atual = contextvars.ContextVar("cism_execucao", default=None)
+
+
+def configurar(ativo=None, arquivo_log=None):
+    """Liga/desliga em tempo de execução (ex.: a partir de st.secrets['instrumentacao'])."""
+    global _ativo, _arquivo_log
+    if ativo is not None:
+        _ativo = bool(ativo)
+    if arquivo_log is not None:
+        _arquivo_log = arquivo_log or None
+
+
+def ativa():
+    return _ativo
+
+
+def _rss_mb():
+    """Memória residente do processo em MB (Linux: /proc; fora dele, o pico do getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# --- Spans ---
+class _SpanNulo:
+    """Span de quando a instrumentação está desligada: não mede nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, **contadores):
+        pass
+
+
+_NULO = _SpanNulo()
+
+
+class _Span:
+    def __init__(self, execucao, nome, contadores):
+        self.execucao = execucao
+        self.registro = {'nome': nome, **contadores}
+
+    def __enter__(self):
+        ex = self.execucao
+        self.registro['profundidade'] = len(ex.pilha)
+        self.registro['inicio_ms'] = round((time.perf_counter() - ex.inicio) * 1000, 3)
+        ex.spans.append(self.registro)
+        ex.pilha.append(self)
+        self._t0 = time.perf_counter()
+        self._rss0 = _rss_mb()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        rss = _rss_mb()
+        self.registro['ms'] = round((time.perf_counter() - self._t0) * 1000, 3)
+        self.registro['rss_mb'] = round(rss, 1)
+        self.registro['delta_rss_mb'] = round(rss - self._rss0, 1)
+        if tipo is not None:
+            self.registro['erro'] = f"{tipo.__name__}: {valor}"
+        self.execucao.pilha.pop()
+        return False
+
+    def anotar(self, **contadores):
+        """Contadores do estágio (ex.: linhas=..., bytes=...); somados se repetidos."""
+        for chave, valor in contadores.items():
+            self.registro[chave] = self.registro.get(chave, 0) + valor
+
+
+def span(nome, **contadores):
+    """Mede um estágio dentro da execução atual (ou não faz nada, se desligada / fora de execução)."""
+    if not _ativo:
+        return _NULO
+    execucao = _atual.get()
+    if execucao is None or execucao.finalizada:
+        return _NULO
+    return _Span(execucao, nome, contadores)
+
+
+def contar(chave, valor=1):
+    """Contador da execução atual (fora de spans), ex.: contar('cache_figuras.acertos')."""
+    if not _ativo:
+        return
+    execucao = _atual.get()
+    if execucao is not None and not execucao.finalizada:
+        execucao.contadores[chave] = execucao.contadores.get(chave, 0) + valor
+
+
+# --- Execuções ---
+class Execucao:
+    def __init__(self, nome, meta):
+        self.nome = nome
+        self.meta = meta
+        self.epoch = time.time()
+        self.inicio = time.perf_counter()
+        self.spans = []
+        self.pilha = []
+        self.contadores = {}
+        self.finalizada = False
+        self.ms = None
+
+    def para_dict(self):
+        return {
+            'execucao': self.nome,
+            'quando': round(self.epoch, 3),
+            'ms': self.ms,
+            'rss_mb': round(_rss_mb(), 1),
+            **self.meta,
+            'contadores': self.contadores,
+            'spans': self.spans,
+        }
+
+
+def iniciar(nome, **meta):
+    """Abre uma execução na thread/contexto atual (ex.: topo do app.py). None se desligada."""
+    if not _ativo:
+        return None
+    execucao = Execucao(nome, meta)
+    _atual.set(execucao)
+    return execucao
+
+
+def finalizar(execucao):
+    """Fecha a execução: guarda no buffer do processo e grava a linha no log JSON (se configurado)."""
+    if execucao is None or execucao.finalizada:
+        return
+    execucao.ms = round((time.perf_counter() - execucao.inicio) * 1000, 3)
+    execucao.finalizada = True
+    if _atual.get() is execucao:
+        _atual.set(None)
+    registro = execucao.para_dict()
+    with _lock:
+        _recentes.append(registro)
+        if _arquivo_log:
+            with open(_arquivo_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+
+class execucao:
+    """
+    Context manager/decorador: vira um span se já há uma execução aberta (ex.: fragmento
+    rodando dentro do rerun completo) ou abre e fecha uma execução própria (ex.: rerun
+    só do fragmento, carga na thread do atualizador).
+    """
+
+    def __init__(self, nome, **meta):
+        self.nome = nome
+        self.meta = meta
+
+    def __enter__(self):
+        self._span, self._propria = None, None
+        if not _ativo:
+            return _NULO
+        aberta = _atual.get()
+        if aberta is not None and not aberta.finalizada:
+            self._span = _Span(aberta, self.nome, {})
+            return self._span.__enter__()
+        self._propria = iniciar(self.nome, **self.meta)
+        return self._propria
+
+    def __exit__(self, *exc):
+        if self._span is not None:
+            self._span.__exit__(*exc)
+        elif self._propria is not None:
+            finalizar(self._propria)
+        return False
+
+    def __call__(self, funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with execucao(self.nome, **self.meta):
+                return funcao(*args, **kwargs)
+        return envolvida
+
+
+# --- Consulta (painel) ---
+def recentes(n=None):
+    with _lock:
+        registros = list(_recentes)
+    return registros if n is None else registros[-n:]
+
+
+def percentis(registros, qs=(0.5, 0.95, 0.99)):
+    """{nome do span: {'n', 'p50', 'p95', 'p99'}} em ms, sobre as execuções dadas (inclui o total de cada execução)."""
+    amostras = {}
+    for r in registros:
+        amostras.setdefault(f"[{r['execucao']}]", []).append(r['ms'])
+        for s in r['spans']:
+            if 'ms' in s:
+                amostras.setdefault(s['nome'], []).append(s['ms'])
+    resultado = {}
+    for nome, valores in amostras.items():
+        valores.sort()
+        resultado[nome] = {'n': len(valores)}
+        for q in qs:
+            resultado[nome][f"p{round(q * 100)}"] = valores[min(int(q * len(valores)), len(valores) - 1)]
+    return resultado
@@ -0,0 +1,182 @@
+"""
+Benchmark de partida a frio do dashboard: tempo até o formulário de login e até o primeiro
+gráfico, cada cenário num processo Python novo (como uma réplica recém-iniciada), pelo
+AppTest do Streamlit com o Sheets falso. O import do Streamlit fica de fora (o servidor
+já o tem carregado antes do primeiro script).
+
+Cenários:
+    login            sessão sem cookie: até o formulário de login estar pronto
+    grafico_frio     sessão logada, sem nada em disco (busca no Sheets falso)
+    grafico_replica  sessão logada, com a versão já publicada no cache compartilhado
+    login_e_grafico  formulário de login, --digitacao s "digitando" e o primeiro gráfico após entrar
+
+Uso:
+    python medir_inicio.py planilha.xlsx --aba CISM
+    python medir_inicio.py planilha.xlsx --app versao_antiga/app.py --repeticoes 5   # comparar antes/depois
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+CENARIOS = ["login", "grafico_frio", "grafico_replica", "login_e_grafico"]
+
+# Bibliotecas que o caminho de login não deveria carregar por conta própria
+PESADOS = ["numpy", "pandas", "pyarrow", "plotly", "duckdb", "openpyxl", "gspread"]
+
+
+class _Cookies(dict):
+    """Substitui o EncryptedCookieManager; `logado` decide se a sessão já passou do login."""
+    logado = False
+
+    def __init__(self, **_kwargs):
+        super().__init__(logged_in='True' if _Cookies.logado else 'False')
+
+    def ready(self):
+        return True
+
+    def save(self):
+        pass
+
+
+# Bibliotecas pesadas que o app importou até o formulário de login ficar pronto
+pesados_no_login = None
+_pesados_antes = None   # já carregadas pelo próprio AppTest (ex.: plotly), não contam
+
+
+def _vigiar_login():
+    """Anota os módulos pesados carregados no fim do caminho de login (antes do aquecimento começar)."""
+    import streamlit as st
+
+    global _pesados_antes
+    if _pesados_antes is None:
+        _pesados_antes = {m for m in PESADOS if m in sys.modules}
+
+    def registrar():
+        global pesados_no_login
+        if pesados_no_login is None:
+            pesados_no_login = [m for m in PESADOS if m in sys.modules and m not in _pesados_antes]
+
+    def vigiado(funcao):
+        def envolvida(*args, **kwargs):
+            registrar()
+            return funcao(*args, **kwargs)
+        envolvida.vigiado = True
+        return envolvida
+
+    if not getattr(st.stop, 'vigiado', False):
+        st.stop = vigiado(st.stop)
+    try:
+        import aquecimento
+    except ImportError:  # versão do app sem aquecimento
+        return
+    if not getattr(aquecimento.iniciar, 'vigiado', False):
+        aquecimento.iniciar = vigiado(aquecimento.iniciar)
+
+
+_ROTEIRO = '''
+import runpy, sys, types
+sys.path.insert(0, {aqui!r})
+sys.path.insert(0, {dir_app!r})
+import medir_inicio
+modulo = types.ModuleType('streamlit_cookies_manager')
+modulo.EncryptedCookieManager = medir_inicio._Cookies
+sys.modules['streamlit_cookies_manager'] = modulo
+medir_inicio._vigiar_login()
+runpy.run_path({app!r}, run_name='__main__')
+'''
+
+
+def _rodar_cenario(cenario, planilha, aba, app, digitacao):
+    """Roda um cenário neste processo (que deve ser novo) e devolve o resultado."""
+    from streamlit.testing.v1 import AppTest
+    import medir_inicio   # o mesmo módulo que o roteiro importa (este arquivo roda como __main__)
+
+    os.environ["CISM_SHEETS_FALSO"] = os.path.abspath(planilha)
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(_ROTEIRO.format(aqui=AQUI, dir_app=os.path.dirname(os.path.abspath(app)), app=os.path.abspath(app)))
+    at = AppTest.from_file(f.name, default_timeout=300)
+    at.secrets["cookies"] = {"secret_key": "medicao"}
+    at.secrets["sheets_config"] = {"sheet_id": "medicao", "sheet_name": aba}
+
+    def rodar(logado):
+        medir_inicio._Cookies.logado = logado
+        inicio = time.perf_counter()
+        at.run()
+        ms = (time.perf_counter() - inicio) * 1000
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if logado and not at.get("plotly_chart"):
+            raise RuntimeError("nenhum gráfico desenhado")
+        return ms
+
+    try:
+        if cenario == "login":
+            return {'ms': rodar(False), 'pesados_no_login': medir_inicio.pesados_no_login}
+        if cenario == "login_e_grafico":
+            ms_login = rodar(False)
+            time.sleep(digitacao)
+            return {'ms': rodar(True), 'ms_login': ms_login}
+        return {'ms': rodar(True)}
+    finally:
+        os.unlink(f.name)
+
+
+def _em_processo_novo(cenario, planilha, aba, app, digitacao, diretorio):
+    comando = [sys.executable, os.path.abspath(__file__), os.path.abspath(planilha), "--aba", aba,
+               "--app", os.path.abspath(app), "--digitacao", str(digitacao), "--cenario", cenario]
+    saida = subprocess.run(comando, cwd=diretorio, capture_output=True, text=True)
+    linhas = [l for l in saida.stdout.splitlines() if l.startswith("{")]
+    if saida.returncode != 0 or not linhas:
+        raise RuntimeError(f"{cenario}: {saida.stderr.strip().splitlines()[-1:] or saida.returncode}")
+    return json.loads(linhas[-1])
+
+
+def medir(planilha, aba="CISM", app=os.path.join(AQUI, "app.py"), repeticoes=3, digitacao=3.0):
+    """{cenário: [resultados]}; cada repetição começa de um diretório de trabalho vazio."""
+    resultados = {c: [] for c in CENARIOS}
+    for _ in range(repeticoes):
+        diretorio = tempfile.mkdtemp(prefix="cism_inicio_")
+        try:
+            # Ordem importa: o grafico_frio publica a versão que a réplica e o login_e_grafico encontram
+            for cenario in CENARIOS:
+                resultados[cenario].append(_em_processo_novo(cenario, planilha, aba, app, digitacao, diretorio))
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return resultados
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo até o login e até o primeiro gráfico em processos novos.")
+    parser.add_argument("planilha", help=".xlsx servido pelo Sheets falso")
+    parser.add_argument("--aba", default="CISM", help="Aba com os dados do CISM")
+    parser.add_argument("--app", default=os.path.join(AQUI, "app.py"), help="Versão do app a medir")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Rodadas (vale a mediana)")
+    parser.add_argument("--digitacao", type=float, default=3.0, help="Segundos entre o formulário e o login")
+    parser.add_argument("--saida", default=None, help="JSON com todos os resultados")
+    parser.add_argument("--cenario", choices=CENARIOS, help=argparse.SUPPRESS)  # uso interno: um cenário neste processo
+    args = parser.parse_args()
+    sys.path.insert(0, AQUI)
+
+    if args.cenario:
+        print(json.dumps(_rodar_cenario(args.cenario, args.planilha, args.aba, args.app, args.digitacao)))
+        sys.exit(0)
+
+    resultados = medir(args.planilha, aba=args.aba, app=args.app, repeticoes=args.repeticoes, digitacao=args.digitacao)
+    print(f"{'cenário':<18} {'mediana':>10} {'mínimo':>10}")
+    for cenario, medidas in resultados.items():
+        tempos = [m['ms'] for m in medidas]
+        print(f"{cenario:<18} {statistics.median(tempos):8.0f} ms {min(tempos):7.0f} ms")
+    print("Bibliotecas pesadas já carregadas no formulário de login: "
+          + (", ".join(resultados['login'][0]['pesados_no_login'] or []) or "nenhuma"))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,123 @@
+"""
+Mede o custo de cada interação do dashboard: tempo de servidor e bytes enviados
+ao navegador (soma das ForwardMsg que iriam pelo websocket).
+
+Roda o app em processo pelo AppTest do Streamlit, com o Sheets falso
+(sheets_falso.py) e uma sessão já logada, e simula a sequência típica de uso.
+
+Uso:
+    python medir_interacoes.py planilha.xlsx --aba CISM
+    python medir_interacoes.py planilha.xlsx --app versao_antiga/app.py   # comparar antes/depois
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+
+class _CookiesLogado(dict):
+    """Substitui o EncryptedCookieManager (componente de navegador) por uma sessão já logada."""
+
+    def __init__(self, **_kwargs):
+        super().__init__(logged_in='True')
+
+    def ready(self):
+        return True
+
+    def save(self):
+        pass
+
+
+def _valor_da_opcao(widget, rotulo):
+    """Valor original de uma opção do multiselect a partir do rótulo exibido ('2023 (12 · R$ ...)')."""
+    texto = rotulo.rsplit(" (", 1)[0] if rotulo.endswith(")") else rotulo
+    candidatos = [texto, int(texto)] if texto.lstrip("-").isdigit() else [texto]
+    for candidato in candidatos:
+        if widget.format_func(candidato) == rotulo:
+            return candidato
+    raise ValueError(f"Opção não reconhecida: {rotulo!r}")
+
+
+_ROTEIRO = '''
+import runpy, sys, types
+sys.path.insert(0, {aqui!r})
+import medir_interacoes
+modulo = types.ModuleType('streamlit_cookies_manager')
+modulo.EncryptedCookieManager = medir_interacoes._CookiesLogado
+sys.modules['streamlit_cookies_manager'] = modulo
+runpy.run_path({app!r}, run_name='__main__')
+'''
+
+
+def _instrumentar_runner(medicoes):
+    """Guarda, a cada execução do script, os bytes das mensagens geradas."""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    original = LocalScriptRunner.run
+
+    def run(self, *args, **kwargs):
+        arvore = original(self, *args, **kwargs)
+        msgs = self.forward_msgs()
+        medicoes.append((len(msgs), sum(m.ByteSize() for m in msgs)))
+        return arvore
+
+    LocalScriptRunner.run = run
+
+
+def medir(planilha, aba="CISM", app=os.path.join(AQUI, "app.py")):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["CISM_SHEETS_FALSO"] = os.path.abspath(planilha)
+    medicoes = []
+    _instrumentar_runner(medicoes)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(_ROTEIRO.format(aqui=AQUI, app=os.path.abspath(app)))
+    at = AppTest.from_file(f.name, default_timeout=120)
+    at.secrets["cookies"] = {"secret_key": "medicao"}
+    at.secrets["sheets_config"] = {"sheet_id": "medicao", "sheet_name": aba}
+
+    def passo(nome, acao):
+        inicio = time.perf_counter()
+        acao()
+        duracao = time.perf_counter() - inicio
+        if at.exception:
+            raise RuntimeError(f"{nome}: {at.exception[0].message}")
+        n_msgs, n_bytes = medicoes[-1]
+        print(f"{nome:<32} {duracao * 1000:9.1f} ms {n_bytes / 1024:10.1f} KiB {n_msgs:6d} msgs")
+
+    filtros = []
+
+    def filtro(posicao, n):
+        # Pela posição na linha de filtros (Ano, Fonte, Projeto, Status): vale também para versões sem `key`.
+        # Os widgets vêm da última execução completa: num rerun de fragmento a árvore só tem o fragmento.
+        def acao():
+            widget = filtros[posicao]
+            widget.set_value([_valor_da_opcao(widget, r) for r in widget.options[:n]]).run()
+        return acao
+
+    print(f"{'interação':<32} {'servidor':>12} {'payload':>14} {'msgs':>11}")
+    passo("carga inicial", at.run)
+    passo("rerun completo (dados quentes)", at.run)
+    filtros.extend(at.multiselect)
+    passo("filtro Ano (1 valor)", filtro(0, 1))
+    passo("filtro Fonte (2 valores)", filtro(1, 2))
+    passo("filtro Status (1 valor)", filtro(3, 1))
+    # Combinações já vistas (nesta ou em outra sessão): servidas pelo cache de figuras
+    passo("limpa Status (já visto)", filtro(3, 0))
+    passo("filtro Status de novo (já visto)", filtro(3, 1))
+    os.unlink(f.name)
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede tempo de servidor e payload por interação do dashboard.")
+    parser.add_argument("planilha", help=".xlsx servido pelo Sheets falso")
+    parser.add_argument("--aba", default="CISM", help="Aba com os dados do CISM")
+    parser.add_argument("--app", default=os.path.join(AQUI, "app.py"), help="Versão do app a medir")
+    args = parser.parse_args()
+    sys.path.insert(0, AQUI)
+    medir(args.planilha, aba=args.aba, app=args.app)
@@ -0,0 +1,147 @@
+"""
+Orçamento de payload: quanto cada widget do dashboard pode mandar ao navegador.
+
+Gráficos ficam com as top-K categorias + um balde "Outros", a série temporal sobe
+de mês para trimestre/ano quando passaria do número de pontos e a tabela é paginada.
+O limite de bytes é aplicado: figura acima dele é remontada com menos categorias/pontos
+(`dentro_do_orcamento`) e a página da tabela encolhe (`linhas_por_pagina`).
+Os limites de cada widget podem ser trocados em secrets.toml, ex.:
+
+    [orcamento.sankey]
+    projetos = 40
+    bytes = 300000
+"""
+
+ROTULO_OUTROS = "Outros"
+
+# Por widget: limites de categorias/pontos/linhas e de bytes (serializados para o navegador)
+ORCAMENTO_PADRAO = {
+    'sankey':     {'fontes': 10, 'projetos': 25, 'bytes': 150_000},
+    'top_fontes': {'barras': 15, 'bytes': 60_000},
+    'composicao': {'projetos': 25, 'fontes': 10, 'bytes': 250_000},
+    'evolucao':   {'pontos': 60, 'bytes': 60_000},
+    'tabela':     {'linhas': 200, 'bytes': 512_000},
+}
+
+# Granularidades da série, da mais fina para a mais grossa: (rótulo, frequência do período)
+GRANULARIDADES = [("Mês", "M"), ("Trimestre", "Q"), ("Ano", "Y")]
+
+
+def carregar_orcamentos(config=None):
+    """ORCAMENTO_PADRAO com os valores de `config` (ex.: st.secrets['orcamento']) por cima."""
+    config = config or {}
+    return {widget: {**padrao, **dict(config.get(widget, {}))} for widget, padrao in ORCAMENTO_PADRAO.items()}
+
+
+def escalar_limites(limites, fator, minimo=2):
+    """Limites de categorias/pontos ({nome: n}) multiplicados por `fator`, sem passar abaixo de `minimo`."""
+    return {nome: max(int(n * fator), minimo) for nome, n in limites.items()}
+
+
+def dentro_do_orcamento(construir, limite_bytes, tentativas=4):
+    """
+    Figura com construir(fator), começando em fator=1 (limites do orçamento). Enquanto o JSON
+    passar de `limite_bytes`, remonta com metade das categorias/pontos, até `tentativas` vezes
+    (a última fica, mesmo acima do limite: o relatório de payload mostra o ⚠️).
+    """
+    fator = 1.0
+    fig = construir(fator)
+    for _ in range(tentativas):
+        if fig is None or len(fig.to_json()) <= limite_bytes:
+            break
+        fator /= 2
+        fig = construir(fator)
+    return fig
+
+
+# --- Top-K + "Outros" ---
+def top_k(df, limites, valor='Valor'):
+    """
+    Mantém, em cada coluna de `limites` ({coluna: k}), as k-1 categorias de maior `valor`
+    e junta o resto em "Outros" (k categorias no máximo). Reagrega somando `valor`.
+    """
+    cortou = False
+    df = df.copy()
+    for coluna, k in limites.items():
+        totais = df.groupby(coluna, observed=True)[valor].sum()
+        if len(totais) <= k:
+            continue
+        manter = set(totais.nlargest(max(k - 1, 1)).index)
+        df[coluna] = df[coluna].astype(str).where(df[coluna].isin(manter), ROTULO_OUTROS)
+        cortou = True
+    if not cortou:
+        return df
+    return df.groupby(list(limites), observed=True, sort=False)[valor].sum().reset_index()
+
+
+def ordem_com_outros(df, coluna, valor='Valor', ascending=False):
+    """Categorias de `coluna` ordenadas por valor total, com "Outros" sempre no fim."""
+    ordem = df.groupby(coluna, observed=True)[valor].sum().sort_values(ascending=ascending).index
+    return [c for c in ordem if c != ROTULO_OUTROS] + ([ROTULO_OUTROS] if ROTULO_OUTROS in ordem else [])
+
+
+# --- Série temporal ---
+def ajustar_granularidade(serie, max_pontos, agregacoes=None):
+    """
+    Série mensal (Mes, Valor) -> (série, rótulo) na granularidade mais fina que caiba
+    em `max_pontos`: mês, trimestre ou ano. O rótulo de cada ponto é o fim do período.
+    `agregacoes` ({coluna: 'sum' | 'last'}, padrão {'Valor': 'sum'}) diz como cada coluna
+    sobe de granularidade: 'last' para acumulados e somas móveis (o valor no fim do período).
+    """
+    agregacoes = agregacoes or {'Valor': 'sum'}
+    rotulo = GRANULARIDADES[0][0]
+    for rotulo, freq in GRANULARIDADES:
+        if freq == "M":
+            agregada = serie
+        else:
+            periodo = serie['Mes'].dt.to_period(freq).dt.to_timestamp(how='end').dt.normalize()
+            agregada = serie.groupby(periodo.rename('Mes'))[list(agregacoes)].agg(agregacoes).reset_index()
+        if len(agregada) <= max_pontos:
+            return agregada, rotulo
+    return agregada, rotulo
+
+
+# --- Medição ---
+def contar_pontos(fig):
+    """
+    Pontos enviados numa figura Plotly: links no Sankey, x (ou y) nos demais traços.
+    Conte na figura recém-montada: numa vinda de pio.from_json os arrays numéricos são
+    dicts {"dtype", "bdata"} (o cache de figuras guarda a contagem junto do JSON).
+    """
+    pontos = 0
+    for trace in fig.data:
+        if trace.type == 'sankey':
+            pontos += len(trace.link.value) if trace.link.value is not None else 0
+        else:
+            eixo = trace.x if trace.x is not None else trace.y
+            pontos += len(eixo) if eixo is not None else 0
+    return pontos
+
+
+def bytes_tabela(df):
+    """Tamanho aproximado do DataFrame como o st.dataframe o envia (tabela Arrow)."""
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(df, preserve_index=False).nbytes
+
+
+def linhas_por_pagina(amostra, max_linhas, limite_bytes):
+    """
+    Linhas por página da tabela: `max_linhas`, ou menos se as colunas forem largas, com os
+    bytes por linha medidos numa amostra já formatada como será enviada. Pelo menos 1.
+    """
+    if amostra.empty:
+        return max_linhas
+    por_linha = bytes_tabela(amostra) / len(amostra)
+    return max(min(max_linhas, int(limite_bytes // por_linha)), 1)
+
+
+def formatar_bytes(n):
+    return f"{n / 1024:.1f} KiB" if n < 2**20 else f"{n / 2**20:.1f} MiB"
+
+
+def resumo_payload(bytes_enviados, pontos, limite_bytes, unidade="pontos"):
+    """Linha de relatório do widget; marca com ⚠️ quando passa do orçamento de bytes."""
+    alerta = " ⚠️ acima do orçamento" if bytes_enviados > limite_bytes else ""
+    return (f"📦 {formatar_bytes(bytes_enviados)} · {pontos} {unidade} "
+            f"(orçamento {formatar_bytes(limite_bytes)}){alerta}")
@@ -0,0 +1,139 @@
+"""
+Processamento em lote de balancetes Sigeo (vários arquivos/abas) em paralelo.
+
+Uso:
+    python processar_lote.py "exports/*.xlsx" --abas Planilha1 --saida balancetes.parquet
+    python processar_lote.py exports/ --abas "*" --workers 8
+
+Cada (arquivo, aba) processado fica em cache, com chave no hash do conteúdo do arquivo:
+rodar de novo numa pasta sem mudanças não reprocessa nada.
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import openpyxl
+import pandas as pd
+
+from arquivos import hash_arquivo, listar_arquivos
+from exportar import SinkParquet, exportar_relatorio
+from validar_parser import SCHEMA_SAIDA
+
+DIR_CACHE = os.path.join(".cache_cism", "balancetes")
+
+# Mude quando a lógica do processar_relatorio (ou a gravação do cache) mudar: invalida todo o cache.
+# 2: cache gravado em streaming pelo exportar.py, com o schema fixo do parser (Vigência em us)
+VERSAO_PARSER = 2
+
+EXTENSOES = ('.xlsx', '.xlsm')
+
+
+def extrair_periodo(caminho):
+    """
+    Período (AAAA-MM) a partir do nome do arquivo: aceita 2024-03, 03-2024, 202403, 03_2024...
+    Sem período no nome, usa o mês da última modificação do arquivo.
+    """
+    nome = os.path.basename(caminho)
+    m = re.search(r'(20\d{2})[-_. ]?(0[1-9]|1[0-2])(?!\d)', nome)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}"
+    m = re.search(r'(?<!\d)(0[1-9]|1[0-2])[-_. ](20\d{2})', nome)
+    if m:
+        return f"{m.group(2)}-{m.group(1)}"
+    return time.strftime('%Y-%m', time.localtime(os.path.getmtime(caminho)))
+
+
+def _caminho_cache(hash_conteudo, aba, dir_cache):
+    aba_segura = re.sub(r'[^\w.-]+', '_', aba)
+    return os.path.join(dir_cache, f"{hash_conteudo[:32]}_{aba_segura}_v{VERSAO_PARSER}.parquet")
+
+
+def _processar_tarefa(caminho, aba, destino):
+    """
+    Roda no worker: processa uma aba em streaming e grava no cache bloco a bloco (um row
+    group por bloco, escrita atômica); a memória do worker não cresce com o tamanho da planilha.
+    Arquivo/aba ilegível levanta exceção e nada é gravado: a próxima execução tenta de novo.
+    """
+    return exportar_relatorio(caminho, aba, [SinkParquet(destino, schema=SCHEMA_SAIDA)])
+
+
+def processar_lote(entradas, abas=("Planilha1",), saida="balancetes_consolidados.parquet",
+                   workers=None, dir_cache=DIR_CACHE):
+    """
+    Processa todos os balancetes encontrados em `entradas` e grava um Parquet consolidado
+    com as colunas de procedência 'Arquivo Origem', 'Aba' e 'Período'.
+    abas=("*",) processa todas as abas de cada arquivo. Retorna o DataFrame consolidado.
+    """
+    os.makedirs(dir_cache, exist_ok=True)
+    arquivos = listar_arquivos(entradas, EXTENSOES)
+    if not arquivos:
+        print("Nenhuma planilha encontrada nas entradas informadas.")
+        return pd.DataFrame()
+
+    # 1. Monta a lista de (arquivo, aba) e separa o que já está em cache
+    tarefas, pendentes = [], []
+    for caminho in arquivos:
+        h = hash_arquivo(caminho)
+        abas_arquivo = list(abas)
+        if "*" in abas_arquivo:
+            wb = openpyxl.load_workbook(caminho, read_only=True)
+            abas_arquivo = wb.sheetnames
+            wb.close()
+        for aba in abas_arquivo:
+            destino = _caminho_cache(h, aba, dir_cache)
+            tarefas.append((caminho, aba, destino))
+            if not os.path.exists(destino):
+                pendentes.append((caminho, aba, destino))
+
+    print(f"{len(arquivos)} arquivo(s), {len(tarefas)} aba(s): "
+          f"{len(tarefas) - len(pendentes)} em cache, {len(pendentes)} para processar.")
+
+    # 2. Processa as pendentes em paralelo (uma aba por processo)
+    if pendentes:
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(_processar_tarefa, *t): t for t in pendentes}
+            for futuro in as_completed(futuros):
+                caminho, aba, _destino = futuros[futuro]
+                try:
+                    print(f"  OK {os.path.basename(caminho)} [{aba}]: {futuro.result()} linhas")
+                except Exception as e:
+                    print(f"  X ERRO em {os.path.basename(caminho)} [{aba}]: {e}")
+        print(f"Processamento paralelo concluído em {time.perf_counter() - inicio:.1f}s.")
+
+    # 3. Consolida a partir do cache, com colunas de procedência
+    partes = []
+    for caminho, aba, destino in tarefas:
+        if not os.path.exists(destino):
+            continue
+        df = pd.read_parquet(destino)
+        if df.empty:
+            continue
+        df['Arquivo Origem'] = os.path.basename(caminho)
+        df['Aba'] = aba
+        df['Período'] = extrair_periodo(caminho)
+        partes.append(df)
+
+    if not partes:
+        print("Aviso: nenhum dado extraído das planilhas.")
+        return pd.DataFrame()
+
+    df_final = pd.concat(partes, ignore_index=True)
+    df_final.to_parquet(saida, index=False)
+    print(f"Consolidado salvo em '{saida}': {len(df_final)} linhas de {len(partes)} aba(s).")
+    return df_final
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Processa balancetes Sigeo em lote, em paralelo e com cache.")
+    parser.add_argument("entradas", nargs="+", help="Diretórios ou globs de planilhas (.xlsx)")
+    parser.add_argument("--abas", nargs="+", default=["Planilha1"], help='Abas a processar ("*" = todas)')
+    parser.add_argument("--saida", default="balancetes_consolidados.parquet", help="Parquet consolidado de saída")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--cache", default=DIR_CACHE, help="Diretório do cache por hash de conteúdo")
+    args = parser.parse_args()
+
+    processar_lote(args.entradas, abas=args.abas, saida=args.saida, workers=args.workers, dir_cache=args.cache)
@@ -0,0 +1,235 @@
+"""
+Série temporal pré-agregada do desembolso (gráfico "Desembolso no Tempo").
+
+Montada uma vez por carga a partir das linhas com data do cubo (cubo.py). Para cada
+valor de cada dimensão (ano, Fonte, Projeto, status) guarda um vetor denso com o total de
+cada mês, em centavos. Qualquer seleção sai de reduções sobre esses vetores, sem voltar
+às linhas do CISM:
+
+- sem filtro ou com filtro em uma dimensão: soma das linhas da matriz (valor x mês);
+- filtros em mais de uma dimensão: bincount por mês sobre os códigos dos grupos do cubo
+  (uma matriz por combinação completa de dimensões não caberia em memória: ~600 mil
+  grupos x 130 meses num CISM de 1 milhão de linhas).
+
+Da série mensal saem o acumulado, as somas móveis de 3 e 12 meses e a comparação com o
+mesmo mês do ano anterior. Na sincronização incremental (snapshot_local.py), `atualizar`
+devolve uma série nova com só o delta das linhas relidas: meses novos entram no fim do eixo.
+"""
+import numpy as np
+import pandas as pd
+
+import cubo
+
+# Colunas devolvidas por `SerieTemporal.serie`
+COLUNAS = ['Mes', 'Valor', 'Acumulado', 'Movel_3m', 'Movel_12m', 'Ano_anterior', 'Variacao_anual']
+
+
+def _meses_absolutos(mes):
+    """Timestamps de fim de mês -> número do mês (ano * 12 + mês - 1)."""
+    return (mes.dt.year * 12 + mes.dt.month - 1).to_numpy(np.int64)
+
+
+def _somar_por_mes(meses, pesos, n_meses):
+    # bincount soma em float64: exato para totais abaixo de 2**53 centavos
+    return np.rint(np.bincount(meses, weights=pesos, minlength=n_meses)).astype(np.int64)
+
+
+def _soma_movel(acumulado, janela):
+    movel = acumulado.copy()
+    movel[janela:] -= acumulado[:-janela]
+    return movel
+
+
+class SerieTemporal:
+    """
+    Totais mensais por valor de dimensão, sobre o eixo contínuo de meses [inicio, inicio + n_meses).
+    Imutável depois de montada: `atualizar` devolve outra (as sessões seguem lendo a antiga).
+    """
+
+    def __init__(self, cubo_df, dims=None):
+        dims = [d for d in (dims or cubo.DIMENSOES) if d in cubo_df.columns]
+        linhas = cubo_df[cubo_df['Mes'].notna()] if len(cubo_df) else cubo_df
+        meses = _meses_absolutos(linhas['Mes']) if len(linhas) else np.zeros(0, np.int64)
+        self.dims = dims
+        self.inicio = int(meses.min()) if len(meses) else 0
+        self.n_meses = int(meses.max()) - self.inicio + 1 if len(meses) else 0
+
+        # Grupos do cubo (sem o mês) como arrays: códigos por dimensão, mês relativo e medidas
+        self._mes = (meses - self.inicio).astype(np.int32)
+        self._valor = linhas['Valor'].to_numpy(np.float64)
+        self._registros = linhas['Registros'].to_numpy(np.float64)
+        self._codigos, self._rotulos, self._posicoes = {}, {}, {}
+        for dim in dims:
+            codigos, rotulos = pd.factorize(linhas[dim], use_na_sentinel=True)
+            self._codigos[dim] = codigos.astype(np.int32)
+            self._rotulos[dim] = list(rotulos)
+            self._posicoes[dim] = {v: i for i, v in enumerate(self._rotulos[dim])}
+        self._ano_do_mes = self._ano_igual_ao_mes(linhas, meses)
+        self._montar_matrizes()
+
+    def _ano_igual_ao_mes(self, linhas, meses):
+        """
+        'ano' de toda linha com data é o ano do mês? Então filtrar ano = recortar meses,
+        e o filtro de ano não obriga a descer para os grupos do cubo.
+        """
+        if 'ano' not in self.dims or not len(linhas):
+            return 'ano' in self.dims
+        ano = pd.to_numeric(linhas['ano'], errors='coerce').to_numpy(np.float64)
+        return bool(np.array_equal(ano, meses // 12))
+
+    def _montar_matrizes(self):
+        # Por dimensão: (valores x meses) de centavos e de registros; o total geral à parte
+        n = self.n_meses
+        self._total = (_somar_por_mes(self._mes, self._valor, n), _somar_por_mes(self._mes, self._registros, n))
+        self._matrizes = {}
+        for dim in self.dims:
+            codigos = self._codigos[dim]
+            k = len(self._rotulos[dim])
+            tem = codigos >= 0
+            chave = codigos[tem].astype(np.int64) * n + self._mes[tem]
+            self._matrizes[dim] = tuple(
+                _somar_por_mes(chave, medida[tem], k * n).reshape(k, n)
+                for medida in (self._valor, self._registros)
+            )
+
+    # --- Consulta ---
+    @property
+    def meses(self):
+        """Rótulos do eixo: último dia de cada mês (os mesmos do cubo)."""
+        inicio = pd.Period(year=self.inicio // 12, month=self.inicio % 12 + 1, freq='M')
+        return pd.period_range(inicio, periods=self.n_meses, freq='M').to_timestamp(how='end').normalize()
+
+    def _selecao(self, dim, valores):
+        """Posições (na matriz/códigos de `dim`) dos valores escolhidos; valores fora da série são ignorados."""
+        posicoes = self._posicoes[dim]
+        return np.array([posicoes[v] for v in valores if v in posicoes], dtype=np.int64)
+
+    def _mensal(self, filtros):
+        """(centavos, registros) por mês para filtros {dim: [valores]}, sem o recorte de ano."""
+        ativos = {d: v for d, v in filtros.items() if v and d in self._matrizes}
+        if not ativos:
+            return self._total
+        if len(ativos) == 1:
+            (dim, valores), = ativos.items()
+            sel = self._selecao(dim, valores)
+            return tuple(m[sel].sum(axis=0) for m in self._matrizes[dim])
+
+        # Várias dimensões: grupos do cubo que passam em todas, somados por mês
+        mask = np.ones(len(self._mes), dtype=bool)
+        for dim, valores in ativos.items():
+            escolhidos = np.zeros(len(self._rotulos[dim]) + 1, dtype=bool)   # última posição = código -1 (nulo)
+            escolhidos[self._selecao(dim, valores)] = True
+            mask &= escolhidos[self._codigos[dim]]
+        meses = self._mes[mask]
+        return (_somar_por_mes(meses, self._valor[mask], self.n_meses),
+                _somar_por_mes(meses, self._registros[mask], self.n_meses))
+
+    def serie(self, filtros):
+        """
+        Série contínua do primeiro ao último mês com lançamento na seleção (meses vazios com 0),
+        como cubo.serie_mensal, mais:
+            Acumulado                soma desde o primeiro mês da série
+            Movel_3m / Movel_12m     soma dos últimos 3 / 12 meses (incluindo o mês)
+            Ano_anterior             mesmo mês do ano anterior, com os mesmos filtros de Fonte/Projeto/status
+            Variacao_anual           (Valor - Ano_anterior) / |Ano_anterior|; NaN sem base no ano anterior
+        Com um filtro de ano, o Ano_anterior continua vindo do ano de antes (fora da seleção).
+        """
+        filtros = {d: v for d, v in filtros.items() if v}
+        anos = filtros.pop('ano', None) if self._ano_do_mes else None
+        valor, registros = self._mensal(filtros)
+        base = valor
+        if anos is not None:
+            absolutos = np.arange(self.inicio, self.inicio + self.n_meses)
+            no_ano = np.isin(absolutos // 12, np.array([int(a) for a in anos]))
+            valor, registros = np.where(no_ano, valor, 0), np.where(no_ano, registros, 0)
+
+        com_lancamento = np.flatnonzero(registros)
+        if not len(com_lancamento):
+            return pd.DataFrame(columns=COLUNAS)
+        ini, fim = com_lancamento[0], com_lancamento[-1] + 1
+
+        valor = valor[ini:fim]
+        acumulado = np.cumsum(valor)
+        anterior = np.zeros_like(base)
+        anterior[12:] = base[:-12]
+        anterior = anterior[ini:fim]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variacao = np.where(anterior != 0, (valor - anterior) / np.abs(anterior), np.nan)
+        return pd.DataFrame({
+            'Mes': self.meses[ini:fim],
+            'Valor': valor,
+            'Acumulado': acumulado,
+            'Movel_3m': _soma_movel(acumulado, 3),
+            'Movel_12m': _soma_movel(acumulado, 12),
+            'Ano_anterior': anterior,
+            'Variacao_anual': variacao,
+        })
+
+    # --- Atualização incremental ---
+    def atualizar(self, removidas, novas):
+        """
+        Nova série = esta - `removidas` + `novas` (cubos das linhas relidas na sincronização,
+        antes e depois). Só o delta passa pelos arrays: valores de dimensão novos ganham uma
+        linha na matriz e meses novos (ou anteriores ao início) estendem o eixo.
+        """
+        delta = pd.concat([
+            removidas.assign(Valor=-removidas['Valor'], Registros=-removidas['Registros']),
+            novas,
+        ], ignore_index=True)
+        delta = delta[delta['Mes'].notna()]
+        nova = object.__new__(SerieTemporal)
+        nova.__dict__.update(self.__dict__)
+        if delta.empty:
+            return nova
+
+        meses = _meses_absolutos(delta['Mes'])
+        atuais = [self.inicio, self.inicio + self.n_meses - 1] if self.n_meses else []
+        nova.inicio = int(min([meses.min()] + atuais[:1]))
+        nova.n_meses = int(max([meses.max()] + atuais[1:])) - nova.inicio + 1
+        deslocamento = self.inicio - nova.inicio
+
+        nova._codigos, nova._rotulos, nova._posicoes = {}, {}, {}
+        codigos_delta = {}
+        for dim in self.dims:
+            rotulos, posicoes = list(self._rotulos[dim]), dict(self._posicoes[dim])
+            valores = delta[dim].astype(object).where(delta[dim].notna(), None)
+            for v in valores.unique():
+                if v is not None and v not in posicoes:
+                    posicoes[v] = len(rotulos)
+                    rotulos.append(v)
+            codigos_delta[dim] = np.array([-1 if v is None else posicoes[v] for v in valores], dtype=np.int32)
+            nova._codigos[dim] = np.concatenate([self._codigos[dim], codigos_delta[dim]])
+            nova._rotulos[dim], nova._posicoes[dim] = rotulos, posicoes
+
+        mes_delta = (meses - nova.inicio).astype(np.int32)
+        valor_delta = delta['Valor'].to_numpy(np.float64)
+        registros_delta = delta['Registros'].to_numpy(np.float64)
+        nova._mes = np.concatenate([self._mes + deslocamento, mes_delta])
+        nova._valor = np.concatenate([self._valor, valor_delta])
+        nova._registros = np.concatenate([self._registros, registros_delta])
+        if self._ano_do_mes and 'ano' in self.dims:
+            incluidas = novas[novas['Mes'].notna()]
+            nova._ano_do_mes = nova._ano_igual_ao_mes(incluidas, _meses_absolutos(incluidas['Mes']))
+
+        # Matrizes: cópia no eixo estendido + só o delta somado por cima
+        n = nova.n_meses
+        fatia = slice(deslocamento, deslocamento + self.n_meses)
+
+        def estender(matriz, linhas):
+            estendida = np.zeros((linhas, n), dtype=np.int64)
+            estendida[:matriz.shape[0], fatia] = matriz
+            return estendida
+
+        total_valor, total_registros = (estender(m[None, :], 1)[0] for m in self._total)
+        nova._total = (total_valor + _somar_por_mes(mes_delta, valor_delta, n),
+                       total_registros + _somar_por_mes(mes_delta, registros_delta, n))
+        nova._matrizes = {}
+        for dim in self.dims:
+            k = len(nova._rotulos[dim])
+            tem = codigos_delta[dim] >= 0
+            chave = codigos_delta[dim][tem].astype(np.int64) * n + mes_delta[tem]
+            nova._matrizes[dim] = tuple(
+                estender(m, k) + _somar_por_mes(chave, medida[tem], k * n).reshape(k, n)
+                for m, medida in zip(self._matrizes[dim], (valor_delta, registros_delta))
+            )
+        return nova
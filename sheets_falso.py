@@ -0,0 +1,194 @@
+"""
+Stand-in local do Google Sheets para rodar o caminho de carga inteiro offline.
+
+Imita a parte da API do gspread.Spreadsheet que usamos (`worksheets()` e
+`values_batch_get()`), com o mesmo formato de resposta e o mesmo corte de
+linhas/células vazias no fim. Pode simular erros de quota (429).
+
+Uso no app: CISM_SHEETS_FALSO=/caminho/planilha.xlsx streamlit run app.py
+Verificação do cliente (backoff e batching): python sheets_falso.py
+"""
+import os
+import re
+import threading
+
+
+class ErroQuotaFalso(Exception):
+    """Mesmo contrato do gspread.exceptions.APIError que o backoff olha (`code`)."""
+
+    def __init__(self, code=429):
+        super().__init__(f"Quota exceeded (falso, HTTP {code})")
+        self.code = code
+
+
+class _AbaFalsa:
+    def __init__(self, title):
+        self.title = title
+
+
+def _coluna_para_indice(letras):
+    n = 0
+    for c in letras:
+        n = n * 26 + (ord(c) - 64)
+    return n
+
+
+def _como_exibido(valor):
+    """Célula do .xlsx -> texto como o Sheets em pt-BR exibe (FORMATTED_VALUE)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "VERDADEIRO" if valor else "FALSO"
+    if isinstance(valor, float) and not valor.is_integer():
+        return f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    if isinstance(valor, float):
+        return str(int(valor))
+    if hasattr(valor, "strftime"):
+        return valor.strftime("%d/%m/%Y")
+    return str(valor)
+
+
+def _aparar(linhas):
+    """Como a API do Sheets: sem células vazias no fim de cada linha nem linhas vazias no fim."""
+    aparadas = []
+    for linha in linhas:
+        linha = list(linha)
+        while linha and linha[-1] == "":
+            linha.pop()
+        aparadas.append(linha)
+    while aparadas and not aparadas[-1]:
+        aparadas.pop()
+    return aparadas
+
+
+class PlanilhaFalsa:
+    """Planilha em memória: {nome_da_aba: [[células como texto], ...]} (linha 1 = cabeçalho)."""
+
+    def __init__(self, abas, falhas_quota=0):
+        self.abas = {nome: [[str(c) for c in linha] for linha in linhas] for nome, linhas in abas.items()}
+        self.falhas_quota = falhas_quota   # próximas N chamadas respondem 429
+        self.requisicoes = 0               # chamadas à "API" (para conferir o batching)
+        self._lock = threading.Lock()
+        self._origem = None                # (caminho do .xlsx, mtime) quando veio de `de_excel`
+
+    @staticmethod
+    def _ler_excel(caminho):
+        import openpyxl
+
+        wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            return {
+                ws.title: [[_como_exibido(c) for c in linha] for linha in ws.iter_rows(values_only=True)]
+                for ws in wb.worksheets
+            }
+        finally:
+            wb.close()
+
+    @classmethod
+    def de_excel(cls, caminho):
+        """
+        Carrega todas as abas de um .xlsx como texto exibido em pt-BR (células vazias = "").
+        Se o arquivo for alterado depois, a próxima chamada à "API" relê (simula edições na planilha).
+        """
+        mtime = os.path.getmtime(caminho)
+        planilha = cls(cls._ler_excel(caminho))
+        planilha._origem = (caminho, mtime)
+        return planilha
+
+    def _recarregar_se_mudou(self):
+        caminho, mtime = self._origem
+        atual = os.path.getmtime(caminho)
+        if atual != mtime:
+            self.abas = self._ler_excel(caminho)
+            self._origem = (caminho, atual)
+
+    def _contar(self):
+        with self._lock:
+            if self._origem is not None:
+                self._recarregar_se_mudou()
+            self.requisicoes += 1
+            if self.falhas_quota > 0:
+                self.falhas_quota -= 1
+                raise ErroQuotaFalso()
+
+    def worksheets(self):
+        self._contar()
+        return [_AbaFalsa(nome) for nome in self.abas]
+
+    def _ler_faixa(self, faixa):
+        m = re.fullmatch(r"'((?:[^']|'')*)'(?:!(.*))?", faixa) or re.fullmatch(r"([^!]+)(?:!(.*))?", faixa)
+        aba, a1 = m.group(1).replace("''", "'"), m.group(2)
+        linhas = self.abas[aba]
+        if not a1:
+            return _aparar(linhas)
+
+        m = re.fullmatch(r"([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?", a1)
+        col_ini, lin_ini, col_fim, lin_fim = m.groups()
+        if m.group(3) is None and m.group(4) is None:
+            col_fim, lin_fim = col_ini, lin_ini
+
+        i0 = int(lin_ini) - 1 if lin_ini else 0
+        i1 = int(lin_fim) if lin_fim else len(linhas)
+        c0 = _coluna_para_indice(col_ini) - 1 if col_ini else 0
+        c1 = _coluna_para_indice(col_fim) if col_fim else None
+        return _aparar([linha[c0:c1] for linha in linhas[i0:i1]])
+
+    def values_batch_get(self, ranges):
+        self._contar()
+        return {
+            'spreadsheetId': 'falso',
+            'valueRanges': [
+                dict({'range': faixa}, **({'values': v} if (v := self._ler_faixa(faixa)) else {}))
+                for faixa in ranges
+            ],
+        }
+
+
+# --- Verificação offline do cliente (cliente_sheets.py) ---
+if __name__ == "__main__":
+    import tempfile
+    from unittest import mock
+
+    import cliente_sheets
+    import snapshot_local
+
+    def planilha_de_teste(falhas_quota=0):
+        cism = [["Fonte", "Projeto", "ano", "status", "Valor", "Data"]] + [
+            [f"Fonte {i % 3}", f"Projeto {i}", "2024", "Pago", f"R$ {i},00", "10/01/2024"] for i in range(300)]
+        relatorio = [["Conta Corrente", "Valor Pago"], ["1", "R$ 10,00"]]
+        return PlanilhaFalsa({"CISM": cism, "Relatório": relatorio}, falhas_quota=falhas_quota)
+
+    # Backoff exponencial: 2 respostas 429 -> 3 chamadas, esperas de ~1 s e ~2 s (+ jitter de até 50%)
+    planilha = planilha_de_teste(falhas_quota=2)
+    with mock.patch.object(cliente_sheets.time, "sleep") as dormir:
+        fonte = cliente_sheets.FonteSheets(planilha)
+    esperas = [c.args[0] for c in dormir.call_args_list]
+    assert planilha.requisicoes == 3, planilha.requisicoes
+    assert len(esperas) == 2 and 1 <= esperas[0] <= 1.5 and 2 <= esperas[1] <= 3, esperas
+
+    # Quota esgotada em todas as tentativas: o erro chega a quem chamou depois de `tentativas` chamadas
+    planilha.falhas_quota, planilha.requisicoes = 10, 0
+    with mock.patch.object(cliente_sheets.time, "sleep") as dormir:
+        try:
+            cliente_sheets.com_backoff(planilha.worksheets, tentativas=5)
+            raise AssertionError("ErroQuotaFalso não propagado")
+        except ErroQuotaFalso:
+            pass
+    assert planilha.requisicoes == 5 and dormir.call_count == 4, (planilha.requisicoes, dormir.call_count)
+
+    # Uma carga = uma requisição batch com as duas abas (CISM + relatório), completa ou incremental
+    planilha = planilha_de_teste()
+    fonte = cliente_sheets.FonteSheets(planilha)
+    caminho = os.path.join(tempfile.mkdtemp(prefix="cism_sheets_"), "cism_snapshot.parquet")
+    extras = [cliente_sheets.citar_aba("Relatório")]
+    for carga in ("completa", "incremental", "incremental com linha nova"):
+        if carga == "incremental com linha nova":
+            planilha.abas["CISM"].append(["Fonte 9", "Projeto 9", "2024", "Pago", "R$ 9,00", "11/01/2024"])
+        antes = planilha.requisicoes
+        df, valores_extras = snapshot_local.sincronizar(fonte, "CISM", caminho=caminho, faixas_extras=extras)
+        assert planilha.requisicoes - antes == 1, (carga, planilha.requisicoes - antes)
+        assert valores_extras and valores_extras[0][0] == ["Conta Corrente", "Valor Pago"], carga
+        assert len(df) == len(planilha.abas["CISM"]) - 1, (carga, len(df))
+        assert ('sync_base' in df.attrs) == (carga != "completa"), carga
+    print("OK: backoff em 429 (esperas " + ", ".join(f"{e:.2f}s" for e in esperas)
+          + ") e uma requisição batch por carga (CISM + relatório).")
@@ -0,0 +1,158 @@
+"""
+Simula várias réplicas do dashboard atualizando ao mesmo tempo contra o Sheets falso,
+para conferir o cache compartilhado (cache_compartilhado.py): a cada rodada só uma
+réplica deve buscar no Sheets (numa requisição só), e todas devem terminar servindo a
+mesma versão, mais nova que a da rodada anterior e com as linhas e o total da planilha.
+
+Entre as rodadas a planilha ganha linhas novas (o Sheets falso relê o .xlsx alterado).
+Sai com código 1 se alguma conferência falhar (serve de teste de regressão).
+
+Uso:
+    python simular_replicas.py --processos 4 --rodadas 3 --linhas 20000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+
+def _replica(n, diretorio, planilha, rodadas, barreira, resultados):
+    """Uma réplica: a cada rodada pede a versão mais nova ao cache, como o atualizador do app."""
+    sys.path.insert(0, AQUI)
+    os.environ["CISM_SHEETS_FALSO"] = planilha
+    import cache_compartilhado
+    import cliente_sheets
+    import cubo
+    import esquema
+    import snapshot_local
+
+    cache = cache_compartilhado.CacheCompartilhado(os.path.join(diretorio, "compartilhado"))
+    buscas = []
+
+    def buscar():
+        # Mesmo caminho do buscar_no_sheets do app (sem o relatório)
+        fonte = cliente_sheets.obter_fonte({}, "simulacao")
+        antes = fonte.planilha.requisicoes
+        df_raw, _extras = snapshot_local.sincronizar(
+            fonte, "CISM", caminho=os.path.join(diretorio, "cism_snapshot.parquet"))
+        df = esquema.preparar_dados(df_raw)
+        buscas.append(fonte.planilha.requisicoes - antes)
+        return {'df': df, 'cubo': cubo.construir_cubo(df)}
+
+    for rodada in range(rodadas):
+        barreira.wait()   # planilha da rodada pronta
+        inicio = time.perf_counter()
+        buscas.clear()
+        frames, meta = cache.carregar(buscar)
+        resultados.put({
+            'rodada': rodada,
+            'replica': n,
+            'buscou': bool(buscas),
+            'requisicoes': sum(buscas),
+            'versao': meta['versao'],
+            'linhas': len(frames['df']),
+            'total': int(frames['df']['Valor_Cent'].sum()),
+            'ms': (time.perf_counter() - inicio) * 1000,
+        })
+        barreira.wait()   # todas terminaram: a planilha pode mudar
+
+
+def _gravar_planilha(df, caminho):
+    import gerar_dados
+
+    tmp = f"{caminho}.tmp.xlsx"
+    gerar_dados.gravar_excel(df, tmp, aba="CISM")
+    os.replace(tmp, caminho)
+
+
+def simular(processos=4, rodadas=3, linhas=20_000, novas_por_rodada=500, diretorio=None):
+    """
+    Roda a simulação e devolve (resultados, esperados): um resultado por réplica e rodada e,
+    por rodada, as linhas e o total em centavos da planilha que as réplicas deveriam servir.
+    """
+    import pandas as pd
+    import conversores
+    import gerar_dados
+
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    else:
+        diretorio = tempfile.mkdtemp(prefix="cism_replicas_")
+    planilha = os.path.join(diretorio, "planilha.xlsx")
+    df = gerar_dados.gerar_cism(linhas, seed=0)
+    _gravar_planilha(df, planilha)
+
+    ctx = multiprocessing.get_context("spawn")
+    barreira = ctx.Barrier(processos + 1)
+    resultados = ctx.Queue()
+    replicas = [ctx.Process(target=_replica, args=(n, diretorio, planilha, rodadas, barreira, resultados))
+                for n in range(processos)]
+    for p in replicas:
+        p.start()
+
+    coletados, esperados = [], []
+    for rodada in range(rodadas):
+        if rodada:
+            # Linhas novas no fim da planilha (o que a sincronização incremental pega)
+            df = pd.concat([df, gerar_dados.gerar_cism(novas_por_rodada, seed=rodada)], ignore_index=True)
+            _gravar_planilha(df, planilha)
+        esperados.append({'linhas': len(df), 'total': int(conversores.converter_centavos(df['Valor'])[0].sum())})
+        barreira.wait()
+        barreira.wait()
+        coletados.extend(resultados.get() for _ in range(processos))
+    for p in replicas:
+        p.join()
+    return sorted(coletados, key=lambda r: (r['rodada'], r['replica'])), esperados
+
+
+def verificar(resultados, esperados):
+    """Lista de falhas da simulação (vazia = tudo certo)."""
+    falhas = []
+    versao_anterior = None
+    for rodada, esperado in enumerate(esperados):
+        da_rodada = [r for r in resultados if r['rodada'] == rodada]
+        buscaram = [r for r in da_rodada if r['buscou']]
+        if len(buscaram) != 1:
+            falhas.append(f"rodada {rodada}: {len(buscaram)} réplicas buscaram no Sheets")
+        for r in buscaram:
+            if r['requisicoes'] != 1:
+                falhas.append(f"rodada {rodada}: a busca fez {r['requisicoes']} requisições ao Sheets (esperada 1)")
+        versoes = {(r['versao'], r['linhas'], r['total']) for r in da_rodada}
+        if len(versoes) != 1:
+            falhas.append(f"rodada {rodada}: réplicas terminaram em versões diferentes")
+            continue
+        (versao, linhas, total), = versoes
+        if (linhas, total) != (esperado['linhas'], esperado['total']):
+            falhas.append(f"rodada {rodada}: {linhas} linhas / {total} centavos servidos, "
+                          f"planilha tem {esperado['linhas']} / {esperado['total']}")
+        if versao_anterior is not None and versao <= versao_anterior:
+            falhas.append(f"rodada {rodada}: versão {versao} não é mais nova que a da rodada anterior")
+        versao_anterior = versao
+    return falhas
+
+
+# --- PONTO DE PARTIDA DO SCRIPT ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Várias réplicas atualizando pelo cache compartilhado contra o Sheets falso.")
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--rodadas", type=int, default=3)
+    parser.add_argument("--linhas", type=int, default=20_000, help="Linhas da planilha na primeira rodada")
+    parser.add_argument("--novas", type=int, default=500, help="Linhas acrescentadas a cada rodada")
+    parser.add_argument("--dir", default=None, help="Diretório de trabalho (padrão: temporário)")
+    args = parser.parse_args()
+
+    resultados, esperados = simular(args.processos, args.rodadas, args.linhas, args.novas, args.dir)
+    print(f"{'rodada':>6} {'réplica':>7} {'buscou':>7} {'linhas':>8} {'ms':>9}  versão")
+    for r in resultados:
+        print(f"{r['rodada']:>6} {r['replica']:>7} {'sim' if r['buscou'] else '-':>7} "
+              f"{r['linhas']:>8} {r['ms']:>9.1f}  {r['versao']}")
+
+    falhas = verificar(resultados, esperados)
+    for f in falhas:
+        print(f"X {f}")
+    print("OK: uma busca (uma requisição) no Sheets por rodada, mesma versão em todas as réplicas." if not falhas else "")
+    sys.exit(1 if falhas else 0)
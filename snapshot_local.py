@@ -0,0 +1,203 @@
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cliente_sheets
+
+# --- Configurações do Snapshot ---
+DIR_CACHE = ".cache_cism"
+ARQUIVO_SNAPSHOT = os.path.join(DIR_CACHE, "cism_snapshot.parquet")
+# Aba de relatório (lida inteira a cada sincronização; o snapshot serve a carga inicial)
+ARQUIVO_RELATORIO = os.path.join(DIR_CACHE, "relatorio_snapshot.parquet")
+
+# Quantas linhas do final do snapshot são relidas a cada sincronização
+# (pega edições recentes nas últimas linhas, além das linhas novas)
+JANELA_REVISAO = 50
+
+# Colunas relidas inteiras a cada sincronização incremental (na mesma requisição) e comparadas
+# com o snapshot: edição nelas em qualquer linha acima do rabo força a leitura completa
+COLUNAS_VERIFICACAO = ("Valor", "status")
+
+# De tempos em tempos fazemos uma leitura completa para pegar edições nas demais colunas
+# em linhas antigas (o Sheets não informa quais linhas mudaram)
+INTERVALO_SYNC_COMPLETA = 1800
+
+_CHAVE_META = b"cism_snapshot"
+
+
+def _nome_coluna_excel(n):
+    """Converte índice 1-based de coluna para letra(s) no estilo A1 (1 -> A, 27 -> AA)."""
+    letras = ""
+    while n > 0:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _normalizar_linhas(linhas, n_colunas):
+    """Completa/corta as linhas para o número de colunas do cabeçalho (o Sheets corta vazios no fim)."""
+    return [(list(l) + [""] * n_colunas)[:n_colunas] for l in linhas]
+
+
+def ler_snapshot(caminho=ARQUIVO_SNAPSHOT):
+    """
+    Lê o snapshot local (memory-mapped). Retorna (header, linhas_df, meta)
+    ou (None, None, None) se não existir ou estiver corrompido.
+    As colunas ficam com nomes posicionais; use `montar_dataframe` para aplicar o header.
+    """
+    if not os.path.exists(caminho):
+        return None, None, None
+    try:
+        tabela = pq.read_table(caminho, memory_map=True)
+        meta = json.loads(tabela.schema.metadata[_CHAVE_META].decode("utf-8"))
+        return meta["header"], tabela.to_pandas(), meta
+    except Exception:
+        return None, None, None
+
+
+def gravar_snapshot(header, df_linhas, meta, caminho=ARQUIVO_SNAPSHOT):
+    """Grava o snapshot de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    meta = dict(meta, header=list(header), n_linhas=len(df_linhas))
+
+    tabela = pa.Table.from_pandas(df_linhas, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({_CHAVE_META: json.dumps(meta).encode("utf-8")})
+
+    tmp = f"{caminho}.{os.getpid()}.tmp"
+    pq.write_table(tabela, tmp)
+    os.replace(tmp, caminho)
+    return meta
+
+
+def _linhas_para_df(linhas, n_colunas):
+    # Nomes posicionais: o cabeçalho da planilha pode ter nomes repetidos/vazios
+    cols = [f"c{i}" for i in range(n_colunas)]
+    return pd.DataFrame(_normalizar_linhas(linhas, n_colunas), columns=cols, dtype=object)
+
+
+def montar_dataframe(header, df_linhas):
+    """Aplica o cabeçalho original da planilha sobre as colunas posicionais do snapshot."""
+    df = df_linhas.copy(deep=False)
+    df.columns = list(header)
+    return df
+
+
+def carregar_snapshot(caminho=ARQUIVO_SNAPSHOT, idade_max=None):
+    """
+    Retorna o DataFrame bruto do snapshot, sem tocar no Sheets.
+    Com `idade_max` (segundos), só retorna se a última sincronização for mais recente que isso.
+    Retorna None se não houver snapshot utilizável.
+    """
+    header, df_linhas, meta = ler_snapshot(caminho)
+    if header is None:
+        return None
+    if idade_max is not None and time.time() - meta.get("ultima_sync", 0) > idade_max:
+        return None
+    return montar_dataframe(header, df_linhas)
+
+
+def _faixas_verificacao(aba_a1, header, colunas, n_linhas):
+    """{posição da coluna: faixa A1} das `colunas` presentes no header, nas linhas 2..n_linhas+1."""
+    if not n_linhas:
+        return {}
+    nomes = [str(h).strip() for h in header]
+    posicoes = [nomes.index(c) for c in colunas if c in nomes]
+    return {
+        i: f"{aba_a1}!{_nome_coluna_excel(i + 1)}2:{_nome_coluna_excel(i + 1)}{n_linhas + 1}"
+        for i in posicoes
+    }
+
+
+def _coluna_igual(df_linhas, posicao, valores):
+    """Coluna relida do Sheets (uma célula por linha; vazias no fim vêm cortadas) = a do snapshot?"""
+    relida = [linha[0] if linha else "" for linha in valores]
+    relida += [""] * (len(df_linhas) - len(relida))
+    return relida == df_linhas[f"c{posicao}"].tolist()
+
+
+def sincronizar(fonte, aba, caminho=ARQUIVO_SNAPSHOT, forcar_completa=False, faixas_extras=(),
+                colunas_verificacao=COLUNAS_VERIFICACAO):
+    """
+    Sincroniza o snapshot local com a aba `aba` de `fonte` (cliente_sheets.FonteSheets)
+    e retorna (DataFrame bruto, valores_das_faixas_extras). O DataFrame tem todas as
+    colunas como texto, com o header original.
+
+    - Só o cabeçalho, o "rabo" da planilha (linhas novas + JANELA_REVISAO) e as
+      `colunas_verificacao` das linhas acima dele são baixados; o rabo é mesclado ao snapshot.
+    - Leitura completa quando: não há snapshot, o cabeçalho mudou, a planilha encolheu,
+      uma coluna de verificação difere do snapshot (edição numa linha antiga)
+      ou passou INTERVALO_SYNC_COMPLETA desde a última leitura completa.
+    - `faixas_extras` (ex.: a aba de relatório) vão na mesma requisição batch.
+
+    Em df.attrs: 'sync' (instante desta sincronização) e, se foi incremental, 'sync_base'
+    (a do snapshot estendido) e 'linhas_inalteradas' (linhas antes do rabo relido), para
+    quem mantém estruturas derivadas aplicar só o delta (serie_temporal.py).
+    """
+    agora = time.time()
+    header, df_linhas, meta = ler_snapshot(caminho)
+    faixas_extras = list(faixas_extras)
+    aba_a1 = cliente_sheets.citar_aba(aba)
+
+    precisa_completa = (
+        forcar_completa
+        or header is None
+        or agora - meta.get("ultima_sync_completa", 0) > INTERVALO_SYNC_COMPLETA
+    )
+
+    if not precisa_completa:
+        # Linha 1 = cabeçalho; linhas de dados começam na 2. Tudo numa requisição só.
+        inicio = max(len(df_linhas) - JANELA_REVISAO, 0)
+        faixa_rabo = f"{aba_a1}!A{inicio + 2}:{_nome_coluna_excel(len(header))}"
+        verificacao = _faixas_verificacao(aba_a1, header, colunas_verificacao, inicio)
+        resposta = fonte.buscar([f"{aba_a1}!1:1", faixa_rabo] + list(verificacao.values()) + faixas_extras)
+        header_atual = resposta[0][0] if resposta[0] else []
+        rabo = resposta[1]
+        colunas_relidas = resposta[2:2 + len(verificacao)]
+        extras = resposta[2 + len(verificacao):]
+        linhas_antigas = df_linhas.iloc[:inicio]
+
+        # Cabeçalho mudou, o rabo veio menor que a janela relida (linhas apagadas)
+        # ou alguma linha acima do rabo foi editada nas colunas de verificação
+        if (header_atual == header and len(rabo) >= len(df_linhas) - inicio
+                and all(_coluna_igual(linhas_antigas, i, valores)
+                        for i, valores in zip(verificacao, colunas_relidas))):
+            df_rabo = _linhas_para_df(rabo, len(header))
+            df_linhas = pd.concat([linhas_antigas, df_rabo], ignore_index=True)
+            gravar_snapshot(header, df_linhas, dict(meta, ultima_sync=agora), caminho)
+            df = montar_dataframe(header, df_linhas)
+            df.attrs.update(sync=agora, sync_base=meta.get("ultima_sync"), linhas_inalteradas=inicio)
+            return df, extras
+        # As extras já vieram; a leitura completa busca só a aba principal
+        resposta = fonte.buscar([aba_a1])
+    else:
+        resposta = fonte.buscar([aba_a1] + faixas_extras)
+        extras = resposta[1:]
+
+    # Leitura completa
+    data = resposta[0]
+    if not data:
+        return pd.DataFrame(), extras
+    header = data[0]
+    df_linhas = _linhas_para_df(data[1:], len(header))
+    gravar_snapshot(header, df_linhas, {"ultima_sync": agora, "ultima_sync_completa": agora}, caminho)
+    df = montar_dataframe(header, df_linhas)
+    df.attrs['sync'] = agora
+    return df, extras
+
+
+def gravar_linhas(linhas, caminho):
+    """Grava uma aba inteira (linha 1 = cabeçalho) como snapshot, para servir a carga inicial."""
+    if linhas:
+        gravar_snapshot(linhas[0], _linhas_para_df(linhas[1:], len(linhas[0])), {"ultima_sync": time.time()}, caminho)
+
+
+def linhas_para_dataframe(linhas):
+    """Valores de uma aba inteira (linha 1 = cabeçalho) -> DataFrame de texto."""
+    if not linhas:
+        return pd.DataFrame()
+    header = linhas[0]
+    return montar_dataframe(header, _linhas_para_df(linhas[1:], len(header)))
@@ -1,128 +1,257 @@
+import itertools
+
+import numpy as np
+import openpyxl
 import pandas as pd
+import pyarrow as pa
+
+import instrumentacao
+from conversores import converter_centavos, converter_data
+
+# Colunas de dinheiro do balancete, guardadas em centavos inteiros (Int64)
+COLS_MONETARIAS = [
+    'Valor Concedido', 'Valor Reservado', 'Valor Pago', '$ Executado',
+    'Aditivo/Anulação', 'Reman. Rec', 'Reman. Env', 'Lib. Recursos',
+    'Saldo Projeto', 'Saldo C.Cor'
+]
+
+# Colunas-chave que usaremos para checagem
+COL_PROJETO_CHECK = "Conta Corrente" 
+COL_ALINEA = "Alínea"
+COL_DESCRICAO = "Descrição"
+COL_VALOR_CONCEDIDO = "Valor Concedido"
+
+# Colunas do DataFrame final, na ordem de saída
+COLS_SAIDA = [
+    "Projeto", "Conta Corrente", "Alínea", "Descrição",
+    "Valor Concedido", "Valor Reservado", "Valor Pago", "$ Executado",
+    "Aditivo/Anulação", "Reman. Rec", "Reman. Env", "Lib. Recursos",
+    "Saldo Projeto", "Saldo C.Cor", "Vigência"
+]
+
+# Schema Arrow da saída gravada em Parquet (exportar.py / processar_lote.py): os mesmos
+# tipos do DataFrame de `processar_relatorio`, qualquer que seja o bloco (ou nenhum bloco)
+SCHEMA_SAIDA = pa.Schema.from_pandas(pd.DataFrame({
+    **{col: pd.Series(dtype="str") for col in COLS_SAIDA[:4]},
+    **{col: pd.Series(dtype="Int64") for col in COLS_SAIDA[4:-1]},
+    "Vigência": pd.Series(dtype="datetime64[us]"),
+}), preserve_index=False)
+
+# Mesmos marcadores de nulo padrão do pd.read_excel (usados no modo streaming)
+_NA_EXCEL = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
 
-def limpar_e_converter_monetario(series):
-    """Limpa e converte colunas monetárias (string 'R$ 1.000,00') para número."""
-    if series.dtype == 'object':
-        series = series.astype(str)
-        series = series.str.replace(r'[R$\s]+', '', regex=True) # Remove R$ e espaços
-        series = series.str.replace('.', '', regex=False)      # Remove . de milhar
-        series = series.str.replace(',', '.', regex=False)      # Troca , de decimal por .
-    return pd.to_numeric(series, errors='coerce')
+def _como_texto(df_raw, col):
+    """Equivalente vetorizado de str(row.get(col, "")).strip() (NaN vira "nan", como no str())."""
+    if col not in df_raw.columns:
+        return pd.Series("", index=df_raw.index, dtype=object)
+    return df_raw[col].astype(str).fillna("nan").str.strip()
 
-def processar_relatorio(file_path, sheet_name):
+
+def _extrair_linhas(df_raw, estado):
+    """
+    Núcleo vetorizado da Lógica V3 sobre um bloco de linhas brutas.
+    `estado` = {'projeto_atual': str, 'projeto_encontrado': bool} e é atualizado
+    no fim do bloco, para o modo streaming continuar de onde parou.
+    """
+    celula_A_str = _como_texto(df_raw, COL_PROJETO_CHECK)
+    celula_B_str = _como_texto(df_raw, COL_ALINEA)
+    celula_C_str = _como_texto(df_raw, COL_DESCRICAO)
+
+    # Junta as primeiras colunas em uma única string para busca
+    search_str = celula_A_str + " " + celula_B_str + " " + celula_C_str
+
+    # CASO 1: linhas de "PROJETO" -> nome propagado para as linhas seguintes (ffill)
+    eh_projeto = search_str.str.contains("PROJETO:", regex=False)
+    nome_projeto = search_str.str.partition("PROJETO:")[2].str.strip().where(eh_projeto)
+    projeto_atual = nome_projeto.ffill().fillna(estado['projeto_atual'])
+
+    # "Trava" da V3: ignora dados antes do primeiro projeto
+    projeto_encontrado = eh_projeto.cummax() | estado['projeto_encontrado']
+
+    # CASO 2: linhas de "TOTAL" ou título de seção
+    eh_total = celula_A_str.str.startswith("TOTAL:") | celula_A_str.str.startswith("PROJETOS VERBAS")
+
+    # CASO 3: dados válidos -> 'Alínea' e 'Valor Concedido' não podem ser vazios/NaN
+    tem_alinea = df_raw[COL_ALINEA].notna() if COL_ALINEA in df_raw.columns else False
+    tem_valor = df_raw[COL_VALOR_CONCEDIDO].notna() if COL_VALOR_CONCEDIDO in df_raw.columns else False
+    valida = ~eh_projeto & ~eh_total & projeto_encontrado & tem_alinea & tem_valor
+
+    if len(df_raw):
+        estado['projeto_atual'] = projeto_atual.iloc[-1]
+        estado['projeto_encontrado'] = bool(projeto_encontrado.iloc[-1])
+
+    linhas = df_raw[valida]
+    df_bloco = pd.DataFrame({
+        "Projeto": projeto_atual[valida],
+        "Conta Corrente": celula_A_str[valida],
+        "Alínea": celula_B_str[valida],  # Alínea não é NaN nas linhas válidas
+        "Descrição": celula_C_str[valida],
+    })
+    for col in COLS_SAIDA[4:]:
+        df_bloco[col] = linhas[col] if col in linhas.columns else None
+    return df_bloco.reset_index(drop=True)
+
+
+def _limpar_saida(df_final):
+    """Limpeza final (monetária em centavos e datas), aplicada ao resultado ou a cada bloco."""
+    for col in COLS_MONETARIAS:
+        if col in df_final.columns:
+            df_final[col], falhas = converter_centavos(df_final[col])
+            if falhas:
+                print(f"Aviso: {falhas} valores não convertidos em '{col}'.")
+
+    if 'Vigência' in df_final.columns:
+        df_final['Vigência'], falhas = converter_data(df_final['Vigência'])
+        if falhas:
+            print(f"Aviso: {falhas} datas não convertidas em 'Vigência'.")
+    return df_final
+
+
+@instrumentacao.execucao("parser.processar_relatorio")
+def processar_relatorio(file_path, sheet_name, streaming=False, linhas_por_bloco=50_000, levantar_erros=False):
     """
     Processa um arquivo Excel com formato de relatório, extraindo e "achatando"
     os dados de projeto e suas linhas de item.
+
+    Com streaming=True o arquivo é lido em blocos pelo openpyxl (read-only), sem
+    carregar a planilha inteira em memória (ver `iterar_relatorio`).
+    Com levantar_erros=True, arquivo/aba ilegível levanta a exceção em vez de só avisar
+    e devolver vazio (quem guarda o resultado em cache não pode confundir falha com aba vazia).
     """
+    if streaming:
+        with instrumentacao.span("parser.streaming") as s:
+            blocos = [b for b in iterar_relatorio(file_path, sheet_name, linhas_por_bloco, levantar_erros)
+                      if not b.empty]
+            s.anotar(linhas=sum(len(b) for b in blocos))
+        if not blocos:
+            print("Aviso: Nenhum dado de projeto foi extraído. Verifique os critérios de filtro.")
+            return pd.DataFrame()
+        return pd.concat(blocos, ignore_index=True)
+
     try:
         # ATUALIZADO: Removemos o 'dtype=str' para o pandas identificar
         # células vazias como NaN (Not a Number), e não como a string "nan".
-        df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=0)
+        with instrumentacao.span("parser.ler_excel") as s:
+            df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=0)
+            s.anotar(linhas=len(df_raw))
         df_raw.columns = [str(col).strip() for col in df_raw.columns]
 
     except FileNotFoundError:
         print(f"Erro: O arquivo '{file_path}' não foi encontrado.")
         print("Verifique se o script está na mesma pasta do arquivo Excel.")
+        if levantar_erros:
+            raise
         return pd.DataFrame()
     except Exception as e:
         print(f"Erro ao ler o arquivo Excel: {e}")
         print(f"Verifique se o nome da aba ('{sheet_name}') está correto.")
+        if levantar_erros:
+            raise
         return pd.DataFrame()
 
-    # Colunas-chave que usaremos para checagem
-    COL_PROJETO_CHECK = "Conta Corrente" 
-    COL_ALINEA = "Alínea"
-    COL_DESCRICAO = "Descrição"
-    COL_VALOR_CONCEDIDO = "Valor Concedido"
-    
-    dados_processados = []
-    projeto_atual = "N/A"
-    
-    # --- [NOVA LÓGICA V3] ---
-    # "Trava" para ignorar dados antes do primeiro projeto
-    projeto_encontrado = False 
-
-    print("Iniciando processamento linha a linha (Lógica Corrigida V3)...")
-
-    # Itera sobre cada linha do DataFrame lido
-    for index, row in df_raw.iterrows():
-        
-        # Converte as colunas de busca para string, tratando NaNs corretamente
-        celula_A_str = str(row.get(COL_PROJETO_CHECK, "")).strip()
-        celula_B_str = str(row.get(COL_ALINEA, "")).strip()
-        celula_C_str = str(row.get(COL_DESCRICAO, "")).strip()
-        
-        # Junta as primeiras colunas em uma única string para busca
-        search_str = f"{celula_A_str} {celula_B_str} {celula_C_str}"
-
-        # CASO 1: É uma linha de "PROJETO"?
-        if "PROJETO:" in search_str:
-            _pre, _sep, nome_projeto = search_str.partition("PROJETO:")
-            projeto_atual = nome_projeto.strip()
-            projeto_encontrado = True # Destrava o salvamento de dados
-            # print(f"--- Encontrado Projeto: {projeto_atual} ---") # (Descomente para debug)
-            continue 
-
-        # CASO 2: É uma linha de "TOTAL" ou um título de seção?
-        if celula_A_str.startswith("TOTAL:") or celula_A_str.startswith("PROJETOS VERBAS"):
-            continue 
-
-        # --- [NOVO FILTRO V3] ---
-        # Só processa se a "trava" estiver destravada
-        if not projeto_encontrado:
-            continue
-            
-        # CASO 3: É uma linha de dados válida?
-        # Critério: 'Alínea' (célula B) não pode ser vazia/NaN
-        # E 'Valor Concedido' (célula D) não pode ser vazio/NaN
-        # Usamos pd.notna() que funciona com NaNs reais
-        celula_B_val = row.get(COL_ALINEA)
-        celula_D_val = row.get(COL_VALOR_CONCEDIDO)
-        
-        if pd.notna(celula_B_val) and pd.notna(celula_D_val): 
-            
-            # Tenta extrair todas as colunas do cabeçalho original
-            linha_dados = {
-                "Projeto": projeto_atual,
-                "Conta Corrente": celula_A_str,
-                "Alínea": str(celula_B_val).strip(), # celula_B_str pode ser "nan"
-                "Descrição": celula_C_str,
-                "Valor Concedido": row.get("Valor Concedido"),
-                "Valor Reservado": row.get("Valor Reservado"),
-                "Valor Pago": row.get("Valor Pago"),
-                "$ Executado": row.get("$ Executado"),
-                "Aditivo/Anulação": row.get("Aditivo/Anulação"),
-                "Reman. Rec": row.get("Reman. Rec"),
-                "Reman. Env": row.get("Reman. Env"),
-                "Lib. Recursos": row.get("Lib. Recursos"),
-                "Saldo Projeto": row.get("Saldo Projeto"),
-                "Saldo C.Cor": row.get("Saldo C.Cor"),
-                "Vigência": row.get("Vigência")
-            }
-            dados_processados.append(linha_dados)
-    
-    print(f"Processamento concluído. {len(dados_processados)} linhas de dados extraídas.")
+    print("Iniciando processamento vetorizado (Lógica Corrigida V3)...")
+    return processar_dataframe(df_raw)
 
-    if not dados_processados:
+
+def processar_dataframe(df_raw):
+    """
+    Lógica V3 + limpeza sobre um relatório já carregado (Excel ou aba do Google Sheets).
+    Células vazias precisam estar como NaN (ver `normalizar_nulos`).
+    """
+    estado = {'projeto_atual': "N/A", 'projeto_encontrado': False}
+    with instrumentacao.span("parser.extrair", linhas=len(df_raw)):
+        df_final = _extrair_linhas(df_raw, estado)
+
+    print(f"Processamento concluído. {len(df_final)} linhas de dados extraídas.")
+
+    if df_final.empty:
         print("Aviso: Nenhum dado de projeto foi extraído. Verifique os critérios de filtro.")
         return pd.DataFrame()
 
-    # --- Criação e Limpeza do DataFrame Final ---
-    df_final = pd.DataFrame(dados_processados)
+    with instrumentacao.span("parser.limpar", linhas=len(df_final)):
+        return _limpar_saida(df_final)
 
-    # Aplica a limpeza final (monetária e datas)
-    cols_monetarias = [
-        'Valor Concedido', 'Valor Reservado', 'Valor Pago', 
-        '$ Executado', 'Saldo Projeto', 'Saldo C.Cor'
-    ]
-    for col in cols_monetarias:
-        if col in df_final.columns:
-            df_final[col] = limpar_e_converter_monetario(df_final[col])
 
-    if 'Vigência' in df_final.columns:
-        df_final['Vigência'] = pd.to_datetime(df_final['Vigência'], errors='coerce')
+def normalizar_nulos(df):
+    """Marcadores de nulo em texto ("", "N/A", "nan"...) viram NaN, como no pd.read_excel."""
+    return df.mask(df.isin(_NA_EXCEL) | df.isna(), np.nan)
 
-    return df_final
+
+def _cabecalho_excel(valores):
+    """Nomes de coluna como o pd.read_excel gera: 'Unnamed: i' para vazios e '.1', '.2' em repetidos."""
+    nomes, vistos = [], {}
+    for i, v in enumerate(valores):
+        nome = f"Unnamed: {i}" if v is None or str(v) == "" else str(v)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return [n.strip() for n in nomes]
+
+
+def _bloco_para_df(linhas, colunas):
+    """Bloco de tuplas do openpyxl -> DataFrame com as mesmas convenções do pd.read_excel."""
+    df = normalizar_nulos(pd.DataFrame(linhas, columns=colunas, dtype=object))
+    # Nas colunas usadas como texto, floats inteiros viram int (1234.0 -> "1234"), como no read_excel
+    for col in (COL_PROJETO_CHECK, COL_ALINEA, COL_DESCRICAO):
+        if col in df.columns:
+            numeros = pd.to_numeric(df[col].where(df[col].map(type) == float), errors='coerce')
+            inteiros = numeros.notna() & (numeros % 1 == 0)
+            if inteiros.any():
+                df.loc[inteiros, col] = numeros[inteiros].astype('int64').astype(object)
+    return df
+
+
+def iterar_relatorio(file_path, sheet_name, linhas_por_bloco=50_000, levantar_erros=False):
+    """
+    Modo streaming: lê a aba com openpyxl em modo read-only e devolve (yield) um
+    DataFrame limpo por bloco de `linhas_por_bloco` linhas brutas, carregando o
+    projeto atual de um bloco para o outro. A concatenação dos blocos é igual ao
+    resultado de `processar_relatorio`. `levantar_erros` como no `processar_relatorio`.
+    """
+    try:
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        ws = wb[sheet_name]
+        ws.reset_dimensions()
+    except FileNotFoundError:
+        print(f"Erro: O arquivo '{file_path}' não foi encontrado.")
+        if levantar_erros:
+            raise
+        return
+    except Exception as e:
+        print(f"Erro ao ler o arquivo Excel: {e}")
+        print(f"Verifique se o nome da aba ('{sheet_name}') está correto.")
+        if levantar_erros:
+            raise
+        return
+
+    try:
+        linhas = ws.iter_rows(values_only=True)
+        colunas = _cabecalho_excel(next(linhas, ()))
+        estado = {'projeto_atual': "N/A", 'projeto_encontrado': False}
+        total = 0
+
+        while True:
+            bloco = [
+                (list(l) + [None] * len(colunas))[:len(colunas)]
+                for l in itertools.islice(linhas, linhas_por_bloco)
+            ]
+            if not bloco:
+                break
+            df_bloco = _extrair_linhas(_bloco_para_df(bloco, colunas), estado)
+            total += len(df_bloco)
+            if not df_bloco.empty:
+                yield _limpar_saida(df_bloco)
+    finally:
+        wb.close()
+
+    print(f"Processamento concluído. {total} linhas de dados extraídas.")
 
 # --- PONTO DE PARTIDA DO SCRIPT ---
 if __name__ == "__main__":
@@ -136,24 +265,21 @@ if __name__ == "__main__":
     # ---------------------
 
     print(f"Processando arquivo: {file_name} (Aba: {sheet_name})...")
-    
-    df_processado = processar_relatorio(file_name, sheet_name)
-
-    if not df_processado.empty:
-        print("\n--- Processamento concluído com sucesso ---")
-        
-        print("\n--- Cabeçalho (head) do DataFrame resultante ---")
-        print(df_processado.head())
-        
-        print("\n--- Informações (info) do DataFrame resultante ---")
-        df_processado.info()
-        
-        # Salva em CSV para fácil validação
-        output_csv = "dados_processados_validacao.csv"
-        try:
-            df_processado.to_csv(output_csv, index=False, sep=';', decimal=',', encoding='utf-8-sig')
-            print(f"\nArquivo de validação salvo com sucesso em: '{output_csv}'")
-        except Exception as e:
-            print(f"\nErro ao salvar o CSV de validação: {e}")
+
+    # Em blocos, direto para o Parquet e o CSV de validação (centavos voltam para "1234,56"
+    # só no CSV): a planilha nunca fica inteira em memória (exportar.py)
+    from exportar import SinkCSV, SinkParquet, exportar_relatorio
+
+    output_parquet = "dados_processados.parquet"
+    output_csv = "dados_processados_validacao.csv"
+    try:
+        sinks = [SinkParquet(output_parquet, schema=SCHEMA_SAIDA), SinkCSV(output_csv)]
+        total = exportar_relatorio(file_name, sheet_name, sinks)
+    except Exception as e:
+        print(f"\nErro ao salvar os arquivos de saída: {e}")
     else:
-        print("\nO processamento não gerou dados. Verifique o nome da aba e o formato do arquivo.")
\ No newline at end of file
+        if total:
+            print("\n--- Processamento concluído com sucesso ---")
+            print(f"\nArquivos salvos com sucesso em: '{output_parquet}' e '{output_csv}'")
+        else:
+            print("\nO processamento não gerou dados. Verifique o nome da aba e o formato do arquivo.")
\ No newline at end of file